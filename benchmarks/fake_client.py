@@ -0,0 +1,163 @@
+# benchmarks/fake_client.py
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+def _usage(prompt: str, text: str) -> Any:
+    return SimpleNamespace(
+        prompt_token_count=len(prompt) // 4,
+        candidates_token_count=len(text) // 4,
+        total_token_count=(len(prompt) + len(text)) // 4,
+    )
+
+
+class FakeModels:
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+
+    def _html(self) -> str:
+        body = "<p>" + "x" * max(0, self._client.response_chars - 40) + "</p>"
+        return f"<!DOCTYPE html><html><body>{body}</body></html>"
+
+    def _structured(self) -> Dict[str, Any]:
+        return {
+            "title": "Fake title",
+            "author": "Fake author",
+            "content": ["x" * self._client.response_chars],
+        }
+
+    def _respond(self, prompt: str) -> str:
+        """Return a canned response shaped like the one the prompt asks for."""
+        # Batched prompts list their items as "### ARTICLE <id>" sections
+        ids = re.findall(r"### ARTICLE (\S+)", prompt)
+        if "<<<ARTICLE" in prompt:
+            return "\n".join(f"<<<ARTICLE {i}>>>\n{self._html()}" for i in ids)
+        if "keyed by article ID" in prompt:
+            return json.dumps({i: self._structured() for i in ids})
+        if "text-only HTML page" in prompt:
+            return self._html()
+        if "strict JSON format" in prompt:
+            structured = self._structured()
+            if '"raw_text"' in prompt:
+                structured["raw_text"] = "x" * self._client.response_chars
+            return json.dumps(structured)
+        return "x" * self._client.response_chars
+
+    def generate_content(self, model: str, contents: Any, **kwargs) -> Any:
+        self._client.maybe_fail()
+        prompt = contents if isinstance(contents, str) else str(contents[-1])
+        text = self._respond(prompt)
+        return SimpleNamespace(text=text, usage_metadata=_usage(prompt, text))
+
+
+class FakeAsyncModels:
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+
+    async def generate_content_stream(
+        self, model: str, contents: Any, **kwargs
+    ) -> AsyncIterator[Any]:
+        """Stream the canned response in `stream_chunk_chars` pieces."""
+        if self._client.latency:
+            await asyncio.sleep(self._client.latency)
+        self._client.maybe_fail(sleep=False)
+        prompt = contents if isinstance(contents, str) else str(contents[-1])
+        text = self._client.models._respond(prompt)
+        size = max(1, self._client.stream_chunk_chars)
+        pieces = [text[i : i + size] for i in range(0, len(text), size)] or [""]
+
+        async def chunks():
+            for i, piece in enumerate(pieces):
+                await asyncio.sleep(0)
+                # Like the real API, usage totals arrive with the last chunk
+                last = i == len(pieces) - 1
+                yield SimpleNamespace(
+                    text=piece, usage_metadata=_usage(prompt, text) if last else None
+                )
+
+        return chunks()
+
+
+class FakeFiles:
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+
+    def upload(self, file: Any, config: Optional[Dict[str, Any]] = None) -> Any:
+        self._client.maybe_fail(upload=True)
+        self._client.uploads += 1
+        return SimpleNamespace(
+            name=f"files/fake-{self._client.uploads}",
+            uri=f"fake://files/{self._client.uploads}",
+            mime_type=(config or {}).get("mime_type"),
+        )
+
+
+class FakeClient:
+    """Local stand-in for google.genai.Client with configurable latency and errors."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_code: int = 429,
+        response_chars: int = 200,
+        fail_first: int = 0,
+        seed: Optional[int] = None,
+        stream_chunk_chars: int = 64,
+    ):
+        """
+        Initialize the fake client.
+
+        Args:
+            latency: Seconds each call blocks (simulating network time)
+            error_rate: Probability that a call raises an API error
+            error_code: HTTP status of the simulated errors
+            response_chars: Approximate size of generated responses
+            fail_first: Number of initial calls that fail deterministically
+            seed: Seed for the error random generator
+            stream_chunk_chars: Size of each chunk of a streamed response
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.response_chars = response_chars
+        self.fail_first = fail_first
+        self.stream_chunk_chars = stream_chunk_chars
+        self.calls = 0
+        self.uploads = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = FakeModels(self)
+        self.files = FakeFiles(self)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self))
+
+    def maybe_fail(self, upload: bool = False, sleep: bool = True):
+        if self.latency and sleep:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            failing = self.calls <= self.fail_first or (
+                not upload and self._random.random() < self.error_rate
+            )
+        if failing:
+            from google.genai import errors
+
+            error_cls = (
+                errors.ServerError if self.error_code >= 500 else errors.ClientError
+            )
+            raise error_cls(
+                self.error_code,
+                {
+                    "error": {
+                        "code": self.error_code,
+                        "message": "fake",
+                        "status": "FAKE",
+                    }
+                },
+            )
@@ -0,0 +1,102 @@
+# benchmarks/ocr_accuracy.py
+"""Compare OCR on original scans with OCR on preprocessed scans.
+
+Runs the text extraction prompt against the real Gemini API for every image
+in artifacts/inputs, once as uploaded today and once after preprocessing
+with the IMAGE_* settings, and reports how similar the transcriptions are
+together with the upload bytes and prompt tokens each variant used.
+
+Usage:
+    python -m benchmarks.ocr_accuracy --output ocr_results.json
+"""
+
+import argparse
+import asyncio
+import difflib
+import glob
+import json
+import os
+import tempfile
+from typing import Any, Dict, List
+
+from config import INPUT_FOLDER
+from modules.ai_processor import AIProcessor
+from modules.image_preprocessor import ImagePreprocessor
+from modules.prompt_manager import PromptManager
+from modules.runtime import Runtime
+
+
+def spent(runtime: Runtime) -> Dict[str, float]:
+    """Upload bytes and prompt tokens used by a run."""
+    totals = {"upload_bytes": 0.0, "prompt_tokens": 0.0}
+    for record in runtime.metrics.snapshot():
+        if record["name"] == "upload_bytes_total":
+            totals["upload_bytes"] += record["value"]
+        elif record["name"] == "gemini_tokens_total" and record["labels"] == {
+            "kind": "prompt"
+        }:
+            totals["prompt_tokens"] += record["value"]
+    return totals
+
+
+async def transcribe(images: List[str], preprocess: bool, cache_dir: str):
+    """OCR every image with or without preprocessing; returns texts and counters."""
+    runtime = Runtime(
+        use_cache=False,
+        image_preprocessor=ImagePreprocessor(enabled=preprocess, cache_dir=cache_dir),
+    )
+    processor = AIProcessor(runtime)
+    prompt = PromptManager().get_content_extraction_prompt()
+    texts = await asyncio.gather(*(processor.ask_ai(prompt, image) for image in images))
+    totals = spent(runtime)
+    runtime.close()
+    return [text or "" for text in texts], totals
+
+
+async def compare(images: List[str]) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        original, original_totals = await transcribe(images, False, cache_dir)
+        shrunk, shrunk_totals = await transcribe(images, True, cache_dir)
+
+    articles = []
+    for image, before, after in zip(images, original, shrunk):
+        articles.append(
+            {
+                "image": os.path.basename(image),
+                # Character-level agreement with the full-resolution transcription
+                "similarity": difflib.SequenceMatcher(None, before, after).ratio(),
+                "original_chars": len(before),
+                "preprocessed_chars": len(after),
+            }
+        )
+    return {
+        "articles": articles,
+        "mean_similarity": (
+            sum(a["similarity"] for a in articles) / len(articles) if articles else 0.0
+        ),
+        "original": original_totals,
+        "preprocessed": shrunk_totals,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inputs", default=INPUT_FOLDER)
+    parser.add_argument("--output", default="ocr_results.json")
+    args = parser.parse_args()
+
+    images = sorted(glob.glob(os.path.join(args.inputs, "*.png")))
+    report = asyncio.run(compare(images))
+    for article in report["articles"]:
+        print(f"{article['image']:45s} similarity={article['similarity']:.3f}")
+    print(f"Mean similarity: {report['mean_similarity']:.3f}")
+    for variant in ("original", "preprocessed"):
+        print(f"{variant:12s} {report[variant]}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# benchmarks/run_benchmark.py
+"""Benchmark the article pipeline against a fake Gemini backend.
+
+Usage:
+    python -m benchmarks.run_benchmark --articles 50 --parallel 1 4 16
+"""
+
+import argparse
+import asyncio
+import functools
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from benchmarks.fake_client import FakeClient
+from config import INPUT_FOLDER, PIPELINE_STAGE_CONCURRENCY
+from main import ArticleProcessor
+from modules.discovery import discover
+from modules.image_preprocessor import ImagePreprocessor
+from modules.pipeline import parse_stage_concurrency
+from modules.rate_limiter import CallController, RetryPolicy
+from modules.runtime import Runtime
+from modules.work_queue import WorkQueue
+
+STAGES = (
+    "parse_metadata",
+    "deduplicate",
+    "extract_text",
+    "extract_structured",
+    "combine",
+    "generate_html",
+    "save",
+)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 in milliseconds."""
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    if len(samples) == 1:
+        value = samples[0] * 1000
+        return {"p50": value, "p95": value, "p99": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+    }
+
+
+def make_fixtures(directory: str, count: int) -> str:
+    """Copy the sample (png, xml) pairs into `count` distinct articles."""
+    pairs = [
+        (png, png[:-4] + ".xml")
+        for png in sorted(glob.glob(os.path.join(INPUT_FOLDER, "*.png")))
+        if os.path.exists(png[:-4] + ".xml")
+    ]
+    for i in range(count):
+        png, xml = pairs[i % len(pairs)]
+        name = f"bench-{i:05d}"
+        with (
+            open(png, "rb") as src,
+            open(os.path.join(directory, f"{name}.png"), "wb") as dst,
+        ):
+            # Trailing bytes after IEND keep the image valid but make every
+            # fixture unique, so upload reuse does not skew the numbers
+            dst.write(src.read() + str(i).encode())
+        shutil.copyfile(xml, os.path.join(directory, f"{name}.xml"))
+    return directory
+
+
+def instrument_stages(agent: Any, timings: Dict[str, List[float]]):
+    """Wrap the agent's stage methods to record per-stage latency."""
+    for stage in STAGES:
+        method = getattr(agent, stage)
+
+        @functools.wraps(method)
+        async def timed(ctx, _method=method, _samples=timings.setdefault(stage, [])):
+            start = time.perf_counter()
+            try:
+                return await _method(ctx)
+            finally:
+                _samples.append(time.perf_counter() - start)
+
+        setattr(agent, stage, timed)
+
+
+async def sample_threads(peak: List[int], stop: asyncio.Event):
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(0.01)
+
+
+async def run_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one benchmark configuration and return its measurements."""
+    client = FakeClient(
+        latency=config["latency"],
+        error_rate=config["error_rate"],
+        error_code=503,
+        response_chars=config["response_chars"],
+        seed=0,
+    )
+    with tempfile.TemporaryDirectory() as output_dir:
+        runtime = Runtime(
+            max_workers=max(4, config["parallel"] * 2),
+            client=client,
+            use_cache=False,
+            call_controller=CallController(retry=RetryPolicy(base_delay=0.01)),
+            # Preprocessed scans are cached per run so every config pays for them
+            image_preprocessor=ImagePreprocessor(
+                enabled=config.get("preprocess", False),
+                cache_dir=os.path.join(output_dir, "images"),
+            ),
+        )
+        processor = ArticleProcessor(
+            runtime,
+            output_path=output_dir,
+            batch_size=config.get("batch_size", 0),
+            fused=config.get("fused", False),
+            html_renderer=config.get("html_renderer", "local"),
+            streaming=config.get("streaming", False),
+            output_backend=config.get("output_backend", "files"),
+            dedup=config.get("dedup", False),
+            dedup_path=os.path.join(output_dir, "dedup.sqlite"),
+            chunk_tokens=config.get("chunk_tokens", 0),
+        )
+        timings: Dict[str, List[float]] = {}
+        instrument_stages(processor.agent, timings)
+
+        latencies: List[float] = []
+        peak_threads = [threading.active_count()]
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_threads(peak_threads, stop))
+
+        jobs = discover(config["input_dir"])
+        start = time.perf_counter()
+        if config["mode"] == "pipeline":
+            concurrency = parse_stage_concurrency(PIPELINE_STAGE_CONCURRENCY)
+            pipeline = processor.build_pipeline(concurrency)
+            summary = await pipeline.run(
+                jobs, processor.make_context, lambda r: latencies.append(r.elapsed)
+            )
+        else:
+            queue = WorkQueue(processor.process_job, workers=config["parallel"])
+            summary = await queue.run(jobs, lambda r: latencies.append(r.elapsed))
+        wall = time.perf_counter() - start
+
+        stop.set()
+        await sampler
+        processor.close()
+    runtime.close()
+
+    return {
+        **{k: v for k, v in config.items() if k != "input_dir"},
+        "articles": summary.total,
+        "failed": summary.failed,
+        "wall_seconds": wall,
+        "articles_per_second": summary.total / wall if wall else 0.0,
+        "article_latency_ms": percentiles(latencies),
+        # Only the stages the configured mode actually ran
+        "stage_latency_ms": {
+            stage: percentiles(samples) for stage, samples in timings.items() if samples
+        },
+        "ttft_ms": ttft_ms(runtime),
+        "upload_bytes": counter(runtime, "upload_bytes_total"),
+        "gemini_calls": client.calls,
+        "dedup_hits": counter(runtime, "dedup_hits_total"),
+        "peak_threads": peak_threads[0],
+        # ru_maxrss is reported in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def counter(runtime: Runtime, name: str) -> float:
+    """Total of a counter across its label sets."""
+    return sum(
+        record["value"]
+        for record in runtime.metrics.snapshot()
+        if record["name"] == name and record["type"] == "counter"
+    )
+
+
+def ttft_ms(runtime: Runtime) -> Dict[str, Dict[str, float]]:
+    """Time-to-first-token quantiles of streamed calls per kind, in milliseconds."""
+    ttft: Dict[str, Dict[str, float]] = {}
+    for record in runtime.metrics.snapshot():
+        if record["name"] == "gemini_ttft_seconds":
+            kind = ttft.setdefault(record["labels"].get("kind", "all"), {})
+            for q, value in record["quantiles"].items():
+                kind[f"p{float(q) * 100:g}"] = value * 1000
+    return ttft
+
+
+def _run_isolated(config: Dict[str, Any]) -> Dict[str, Any]:
+    return asyncio.run(run_config(config))
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(
+    configs: List[Dict[str, Any]],
+    run: Callable[[Dict[str, Any]], Dict[str, Any]] = _run_isolated,
+) -> Dict[str, Any]:
+    """Run each configuration in a fresh process so peak RSS is per configuration."""
+    results = []
+    for config in configs:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run, config).result()
+        results.append(result)
+        print(
+            f"{result['mode']:>8} parallel={result['parallel']:<3} "
+            f"{result['articles_per_second']:8.2f} articles/s  "
+            f"p95={result['article_latency_ms']['p95']:8.1f}ms  "
+            f"rss={result['peak_rss_mb']:.0f}MB threads={result['peak_threads']}"
+        )
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="Article Processor benchmark")
+    parser.add_argument("--articles", type=int, default=40)
+    parser.add_argument("--parallel", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per fake call"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--response-chars", type=int, default=2000)
+    parser.add_argument(
+        "--pipeline", action="store_true", help="Also benchmark the staged pipeline"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=0,
+        help="Pack up to this many articles into one combine/HTML call",
+    )
+    parser.add_argument(
+        "--fused", action="store_true", help="Use single-call fused extraction"
+    )
+    parser.add_argument("--html-renderer", choices=["local", "llm"], default="local")
+    parser.add_argument(
+        "--stream", action="store_true", help="Stream responses from the fake client"
+    )
+    parser.add_argument(
+        "--preprocess",
+        action="store_true",
+        help="Shrink scans before upload (IMAGE_* settings, needs Pillow)",
+    )
+    parser.add_argument(
+        "--output-backend",
+        choices=["files", "jsonl", "gzip", "sqlite"],
+        default="files",
+        help="Where article results are written",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Reuse results across fixtures copied from the same sample "
+        "(needs Pillow; the fixtures differ byte-wise)",
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=0,
+        help="Structure OCR text over this many tokens in concurrent parts "
+        "(compare with --response-chars)",
+    )
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as input_dir:
+        make_fixtures(input_dir, args.articles)
+        base = {
+            "input_dir": input_dir,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "response_chars": args.response_chars,
+            "batch_size": args.batch_size,
+            "fused": args.fused,
+            "html_renderer": args.html_renderer,
+            "streaming": args.stream,
+            "output_backend": args.output_backend,
+            "preprocess": args.preprocess,
+            "dedup": args.dedup,
+            "chunk_tokens": args.chunk_tokens,
+        }
+        configs = [{**base, "mode": "queue", "parallel": p} for p in args.parallel]
+        if args.pipeline:
+            configs.append({**base, "mode": "pipeline", "parallel": 0})
+
+        report = run_benchmarks(configs)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 import json
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# Unset variables are filled in from ENV_FILE (default: the .env file next to
+# this module; empty to skip). python-dotenv is only imported when it exists.
+ENV_FILE = os.getenv(
+    "ENV_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+)
+if ENV_FILE and os.path.isfile(ENV_FILE):
+    from dotenv import load_dotenv
+
+    load_dotenv(ENV_FILE)
 
 # Gemini API key
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -10,10 +17,157 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 # Model settings
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
 
+# Gemini quota and retry settings (0 disables the corresponding rate limit)
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "0"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "0"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+
+# Number of prompt/response messages kept per AIProcessor (0 disables history)
+AI_HISTORY_LIMIT = int(os.getenv("AI_HISTORY_LIMIT", "0"))
+
+# Size of the shared thread pool (0 picks a size based on the CPU count)
+RUNTIME_MAX_WORKERS = int(os.getenv("RUNTIME_MAX_WORKERS", "0"))
+
+# Per-stage worker counts used by the streaming pipeline (--pipeline)
+PIPELINE_STAGE_CONCURRENCY = os.getenv(
+    "PIPELINE_STAGE_CONCURRENCY", "parse=2,ocr=8,combine=4,html=4,save=2"
+)
+
+# Worker processes the article set is sharded across (each has its own event
+# loop and client); 1 runs everything in this process
+SHARD_PROCESSES = int(os.getenv("SHARD_PROCESSES", "1"))
+
+# Batched combine/HTML requests: up to GEMINI_BATCH_SIZE small articles (whose
+# input is at most GEMINI_BATCH_MAX_CHARS) share one Gemini call. A batch fills
+# from articles in flight at the same time, so pair it with enough parallelism
+# (or combine/html stage concurrency). 0 or 1 disables batching
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "0"))
+GEMINI_BATCH_MAX_CHARS = int(os.getenv("GEMINI_BATCH_MAX_CHARS", "4000"))
+GEMINI_BATCH_WAIT = float(os.getenv("GEMINI_BATCH_WAIT", "0.05"))
+
+# Fused mode sends the image and XML metadata in one request that returns the
+# structured JSON directly (HTML is rendered locally); FUSED_RAW_TEXT also asks
+# for the verbatim transcription so the _raw.txt output is still written
+FUSED_EXTRACTION = os.getenv("FUSED_EXTRACTION", "false").lower() == "true"
+FUSED_RAW_TEXT = os.getenv("FUSED_RAW_TEXT", "false").lower() == "true"
+
+# How step 4 builds the HTML page: "local" renders it from the structured JSON
+# with a deterministic template, "llm" asks Gemini. With HTML_LLM_FALLBACK the
+# local renderer hands content it cannot lay out (e.g. unparsable JSON) to Gemini
+HTML_RENDERER = os.getenv("HTML_RENDERER", "local").lower()
+HTML_LLM_FALLBACK = os.getenv("HTML_LLM_FALLBACK", "true").lower() == "true"
+
+# Stream Gemini responses: JSON is parsed and output files are written while
+# text is still arriving, and time-to-first-token is recorded
+GEMINI_STREAMING = os.getenv("GEMINI_STREAMING", "false").lower() == "true"
+
+# Where each article's results go: "files" writes one file per output, while
+# "jsonl", "gzip" (compressed JSON Lines) and "sqlite" append one record per
+# article to a store under processed_data/store. Store writes are group
+# committed: records saved while an fsync is in flight share the next one
+# (up to OUTPUT_SYNC_BATCH records)
+OUTPUT_BACKEND = os.getenv("OUTPUT_BACKEND", "files").lower()
+OUTPUT_SEGMENT_MB = int(os.getenv("OUTPUT_SEGMENT_MB", "256"))
+OUTPUT_SYNC_BATCH = int(os.getenv("OUTPUT_SYNC_BATCH", "32"))
+# _full.json repeats every other output; "files" runs can leave it out
+OUTPUT_FULL_JSON = os.getenv("OUTPUT_FULL_JSON", "true").lower() == "true"
+
+# Estimated token limit for a combine/fused prompt: longer OCR text and
+# metadata are trimmed to fit (0 disables the check)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "32000"))
+
+# Chunked combine for long articles: OCR text over COMBINE_CHUNK_TOKENS
+# (estimated) is split at paragraph boundaries, each part is structured by its
+# own concurrent request and the parts' "content" arrays are merged in order
+# (0 sends the whole text in one request)
+COMBINE_CHUNK_TOKENS = int(os.getenv("COMBINE_CHUNK_TOKENS", "0"))
+
+# Comma-separated XML paths to extract (e.g. "heading,author,mainContent");
+# empty extracts the whole document
+XML_METADATA_FIELDS = [
+    field.strip()
+    for field in os.getenv("XML_METADATA_FIELDS", "").split(",")
+    if field.strip()
+]
+
+# Where run metrics are exported (*.prom for Prometheus text, else JSON lines);
+# empty only prints the end-of-run summary
+METRICS_OUTPUT = os.getenv("METRICS_OUTPUT", "")
+
 # File paths
 ARTIFACTS_FOLDER = os.path.join(os.getcwd(), "artifacts")
 INPUT_FOLDER = os.path.join(ARTIFACTS_FOLDER, "inputs")
 PROCESSED_FOLDER = os.path.join(ARTIFACTS_FOLDER, "processed_data")
+CACHE_FOLDER = os.path.join(ARTIFACTS_FOLDER, "cache")
+MANIFEST_FILENAME = "manifest.jsonl"
+
+# Response cache settings (TTL in seconds, 0 disables expiry/size limits)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_PATH = os.path.join(CACHE_FOLDER, "responses.sqlite")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "50000"))
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Uploaded files are kept by Gemini for 48 hours; reuse handles slightly less
+UPLOAD_REGISTRY_PATH = os.path.join(CACHE_FOLDER, "uploads.sqlite")
+UPLOAD_TTL = float(os.getenv("UPLOAD_TTL", str(47 * 3600)))
+
+# Optional scan pre-processing before upload (needs Pillow: pip install
+# "genai-article-processor[images]"). Scans above IMAGE_TARGET_DPI (or with a
+# side longer than IMAGE_MAX_SIDE pixels) are downscaled, optionally converted
+# to grayscale and re-encoded as IMAGE_FORMAT (webp, jpeg or png). Pages taller
+# than 1.5x IMAGE_TILE_HEIGHT are cut into overlapping tiles (0 disables).
+# IMAGE_SOURCE_DPI is assumed for files that carry no DPI (0: size limit only)
+IMAGE_PREPROCESS = os.getenv("IMAGE_PREPROCESS", "false").lower() == "true"
+IMAGE_TARGET_DPI = int(os.getenv("IMAGE_TARGET_DPI", "200"))
+IMAGE_SOURCE_DPI = int(os.getenv("IMAGE_SOURCE_DPI", "0"))
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "3072"))
+IMAGE_GRAYSCALE = os.getenv("IMAGE_GRAYSCALE", "true").lower() == "true"
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "webp").lower()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_TILE_HEIGHT = int(os.getenv("IMAGE_TILE_HEIGHT", "0"))
+IMAGE_TILE_OVERLAP = int(os.getenv("IMAGE_TILE_OVERLAP", "64"))
+# Worker processes for pre-processing (0 uses the CPU count)
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "0"))
+IMAGE_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "images")
+
+# Input discovery walks INPUT_FOLDER recursively. Directory listings and file
+# hashes are kept in an on-disk index so later runs only re-read directories
+# and files that changed. INPUT_INCLUDE/INPUT_EXCLUDE are comma-separated glob
+# patterns matched against image paths relative to INPUT_FOLDER
+INPUT_INDEX_ENABLED = os.getenv("INPUT_INDEX_ENABLED", "true").lower() == "true"
+INPUT_INDEX_PATH = os.path.join(CACHE_FOLDER, "inputs.sqlite")
+INPUT_INCLUDE = [
+    p.strip() for p in os.getenv("INPUT_INCLUDE", "").split(",") if p.strip()
+]
+INPUT_EXCLUDE = [
+    p.strip() for p in os.getenv("INPUT_EXCLUDE", "").split(",") if p.strip()
+]
+
+# Near-duplicate detection (--dedup): an article whose image is within
+# DEDUP_MAX_DISTANCE bits (of a 64-bit perceptual hash) of an already processed
+# one, and whose normalized XML metadata is identical unless DEDUP_MATCH_XML is
+# false, reuses that article's results instead of calling Gemini. Without
+# Pillow only byte-identical images match. A duplicate of an article still in
+# flight waits up to DEDUP_WAIT seconds for it
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+DEDUP_INDEX_PATH = os.path.join(CACHE_FOLDER, "dedup.sqlite")
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "10"))
+DEDUP_MATCH_XML = os.getenv("DEDUP_MATCH_XML", "true").lower() == "true"
+DEDUP_WAIT = float(os.getenv("DEDUP_WAIT", "300"))
+
+# Service mode (main.py --serve): a long-running HTTP API in front of one warm
+# runtime. Up to SERVICE_QUEUE_SIZE submitted articles wait for
+# SERVICE_WORKERS workers (higher priority first); finished jobs are
+# remembered (status and results) up to SERVICE_RETAIN_JOBS
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "4"))
+SERVICE_QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "256"))
+SERVICE_RETAIN_JOBS = int(os.getenv("SERVICE_RETAIN_JOBS", "1000"))
+SERVICE_MAX_UPLOAD_MB = int(os.getenv("SERVICE_MAX_UPLOAD_MB", "64"))
+SERVICE_UPLOAD_FOLDER = os.path.join(ARTIFACTS_FOLDER, "uploads")
 
 # Response structure template
 RESPONSE_STRUCTURE = json.dumps(
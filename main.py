@@ -1,17 +1,445 @@
 import os
 import argparse
+import signal
 import time
 
 import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
 from modules.agent import ArticleProcessorAgent
-from config import INPUT_FOLDER, PROCESSED_FOLDER, RESPONSE_STRUCTURE
-from utils import UtilityManager
+from modules.article_context import ArticleContext, usable
+from modules.discovery import IMAGE_EXTENSIONS, InputIndex, discover
+from modules.html_processor import HTML_RENDER_VERSION
+from modules.manifest import PIPELINE_VERSION, Manifest
+from modules.metrics import Metrics
+from modules.output_store import OUTPUT_BACKENDS
+from modules.response_cache import hash_file
+from modules.pipeline import Stage, StagePipeline, parse_stage_concurrency
+from modules.runtime import Runtime
+from modules.sharding import parse_shard, select_shard
+from modules.startup import StartupProfile, import_costs
+from config import (
+    COMBINE_CHUNK_TOKENS,
+    DEDUP_ENABLED,
+    DEDUP_INDEX_PATH,
+    FUSED_EXTRACTION,
+    GEMINI_BATCH_SIZE,
+    GEMINI_MODEL,
+    GEMINI_STREAMING,
+    HTML_RENDERER,
+    INPUT_EXCLUDE,
+    INPUT_FOLDER,
+    INPUT_INCLUDE,
+    INPUT_INDEX_ENABLED,
+    MANIFEST_FILENAME,
+    METRICS_OUTPUT,
+    OUTPUT_BACKEND,
+    PIPELINE_STAGE_CONCURRENCY,
+    PROCESSED_FOLDER,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_STRUCTURE,
+    RUNTIME_MAX_WORKERS,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_WORKERS,
+    SHARD_PROCESSES,
+)
+from modules.work_queue import ArticleJob, WorkQueue, report_result
+from utils import delete_folder_if_exists
 
 
 class ArticleProcessor:
-    def __init__(self):
-        self.agent = ArticleProcessorAgent()
-        self.utility_manager = UtilityManager()
+    def __init__(
+        self,
+        runtime: Runtime,
+        manifest: Optional[Manifest] = None,
+        output_path: str = PROCESSED_FOLDER,
+        batch_size: int = GEMINI_BATCH_SIZE,
+        fused: bool = FUSED_EXTRACTION,
+        html_renderer: str = HTML_RENDERER,
+        streaming: bool = GEMINI_STREAMING,
+        output_backend: str = OUTPUT_BACKEND,
+        output_prefix: str = "outputs",
+        input_index: Optional[InputIndex] = None,
+        dedup: bool = DEDUP_ENABLED,
+        dedup_path: Optional[str] = DEDUP_INDEX_PATH,
+        chunk_tokens: int = COMBINE_CHUNK_TOKENS,
+    ):
+        self.runtime = runtime
+        self.input_index = input_index
+        self.output_path = output_path
+        self.agent = ArticleProcessorAgent(
+            runtime,
+            batch_size=batch_size,
+            fused=fused,
+            html_renderer=html_renderer,
+            streaming=streaming,
+            output_backend=output_backend,
+            output_prefix=output_prefix,
+            chunk_tokens=chunk_tokens,
+        )
+        self.utility_manager = self.agent.utility_manager
+        self.manifest = manifest
+        self.version = f"{PIPELINE_VERSION}:{self.agent.prompt.version}:{GEMINI_MODEL}"
+        if fused:
+            # Fused outputs differ from the multi-call pipeline's; never mix them
+            self.version += ":fused"
+        if html_renderer == "local":
+            self.version += f":html{HTML_RENDER_VERSION}"
+        if runtime.image_preprocessor.enabled:
+            # OCR ran on the shrunken scan; redo articles when its settings change
+            self.version += f":img{runtime.image_preprocessor.signature}"
+        if chunk_tokens and not fused:
+            # Long articles are structured in parts and merged
+            self.version += f":chunk{chunk_tokens}"
+        if dedup:
+            from modules.dedup import DedupIndex
+
+            # Only results produced by this same version are reused
+            self.agent.dedup_index = DedupIndex(
+                dedup_path,
+                version=self.version,
+                executor=runtime.executor,
+                metrics=runtime.metrics,
+            )
+        self.skipped = 0
+
+    def close(self):
+        self.agent.data_saver.close()
+        if self.agent.dedup_index is not None:
+            self.agent.dedup_index.close()
+
+    def make_context(self, job: ArticleJob) -> ArticleContext:
+        return ArticleContext(
+            job.image_path,
+            job.xml_path,
+            job.name,
+            RESPONSE_STRUCTURE,
+            self.output_path,
+        )
+
+    async def check_manifest(self, ctx: ArticleContext) -> bool:
+        """Fingerprint the inputs; returns False when the article can be skipped."""
+        if self.manifest is None:
+            return True
+
+        loop = asyncio.get_running_loop()
+        ctx.fingerprint = await loop.run_in_executor(
+            self.runtime.executor,
+            Manifest.fingerprint,
+            ctx.image_path,
+            ctx.xml_path,
+            self.version,
+            # Unchanged files are not re-read when the input index knows them
+            self.input_index.hash_file if self.input_index is not None else hash_file,
+        )
+        if self.manifest.is_current(ctx.image_name, ctx.fingerprint):
+            self.skipped += 1
+            entry = self.manifest.get(ctx.image_name) or {}
+            ctx.output_files = entry.get("outputs", [])
+            return False
+        return True
+
+    def record(self, ctx: ArticleContext, outputs: Dict[str, Any]):
+        """Record a finished article; one without usable results fails instead."""
+        if not usable(outputs):
+            # Not recorded, so an incremental run retries the article
+            raise RuntimeError(f"No usable results for '{ctx.image_name}'")
+        # Only recorded once every output file is on disk
+        if self.manifest is not None and ctx.fingerprint is not None:
+            self.manifest.record(ctx.image_name, ctx.fingerprint, ctx.output_files)
+
+    async def save_and_record(self, ctx: ArticleContext):
+        await self.agent.save(ctx)
+        self.record(ctx, ctx.to_dict())
+
+    async def process_job(self, job: ArticleJob) -> Dict[str, Any]:
+        """Process one article, skipping it when the manifest says it is current."""
+        ctx = self.make_context(job)
+        if not await self.check_manifest(ctx):
+            return ctx.result()
+
+        result = await self.agent.process_article(
+            job.image_path,
+            job.xml_path,
+            job.name,
+            RESPONSE_STRUCTURE,
+            self.output_path,
+        )
+        ctx.output_files = result["output_files"]
+        self.record(ctx, result)
+        return result
+
+    def build_pipeline(self, concurrency: Dict[str, int]) -> StagePipeline:
+        """Wrap the agent's stages with the manifest check and record steps."""
+        stages = self.agent.pipeline_stages(concurrency)
+        if self.manifest is not None:
+            stages.insert(
+                0, Stage("check", self.check_manifest, concurrency.get("check", 2))
+            )
+        stages[-1] = Stage(
+            "save", self.save_and_record, self.agent.save_concurrency(concurrency)
+        )
+        return StagePipeline(stages)
+
+
+def find_jobs(
+    name: str,
+    batch: bool,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    index: Optional[InputIndex] = None,
+) -> Iterable[ArticleJob]:
+    """Jobs for a tree of articles (batch mode) or for a single article."""
+    article_dir = os.path.join(INPUT_FOLDER, name)
+    if batch and os.path.isdir(article_dir):
+        # Stream articles through a fixed pool of workers
+        return discover(article_dir, include, exclude, index)
+
+    # Process single article
+    image_path = os.path.join(INPUT_FOLDER, f"{name}.png")
+    for extension in IMAGE_EXTENSIONS:
+        if os.path.exists(os.path.join(INPUT_FOLDER, f"{name}{extension}")):
+            image_path = os.path.join(INPUT_FOLDER, f"{name}{extension}")
+            break
+    return [ArticleJob(name, image_path, os.path.join(INPUT_FOLDER, f"{name}.xml"))]
+
+
+async def run_shard(options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Process the articles assigned to one shard with its own runtime and client.
+
+    Args:
+        options: Run options; "shards" lists (salt, index, count) filters
+            applied to the job stream, "manifest_log" is the file this
+            shard appends its manifest entries to and "shard_name" names
+            its output store segments
+
+    Returns:
+        Picklable report with counts, failures, cache stats and metric state
+    """
+    # Each article keeps up to two blocking calls in flight at once
+    runtime = Runtime(
+        max_workers=RUNTIME_MAX_WORKERS or max(4, options["parallel"] * 2),
+        use_cache=options["use_cache"],
+    )
+
+    # Only a directory of articles is discovered (and worth sampling metrics for)
+    discovering = options["batch"] and os.path.isdir(
+        os.path.join(INPUT_FOLDER, options["name"])
+    )
+    # Shard processes share one index; each reads the listings the others stored
+    input_index = (
+        InputIndex() if discovering and options.get("input_index", True) else None
+    )
+
+    # Incremental runs keep previous outputs and skip unchanged articles
+    manifest = None
+    if options["incremental"]:
+        manifest = Manifest(
+            os.path.join(PROCESSED_FOLDER, MANIFEST_FILENAME),
+            log_path=options.get("manifest_log"),
+        )
+
+    processor = ArticleProcessor(
+        runtime,
+        manifest,
+        batch_size=options.get("batch_size", GEMINI_BATCH_SIZE),
+        fused=options.get("fused", FUSED_EXTRACTION),
+        html_renderer=options.get("html_renderer", HTML_RENDERER),
+        streaming=options.get("streaming", GEMINI_STREAMING),
+        output_backend=options.get("output_backend", OUTPUT_BACKEND),
+        output_prefix="-".join(filter(None, ["outputs", options.get("shard_name")])),
+        input_index=input_index,
+        dedup=options.get("dedup", DEDUP_ENABLED),
+        chunk_tokens=options.get("chunk_tokens", COMBINE_CHUNK_TOKENS),
+    )
+
+    jobs = find_jobs(
+        options["name"],
+        options["batch"],
+        options.get("include", INPUT_INCLUDE),
+        options.get("exclude", INPUT_EXCLUDE),
+        input_index,
+    )
+    for salt, index, count in options.get("shards", []):
+        jobs = select_shard(jobs, index, count, salt)
+
+    # Periodically sample executor queue depth and thread count
+    sampler = (
+        asyncio.create_task(runtime.metrics.run_sampler()) if discovering else None
+    )
+
+    if options["pipeline"]:
+        concurrency = parse_stage_concurrency(PIPELINE_STAGE_CONCURRENCY)
+        pipeline = processor.build_pipeline(concurrency)
+        summary = await pipeline.run(jobs, processor.make_context, report_result)
+    else:
+        queue = WorkQueue(processor.process_job, workers=options["parallel"])
+        summary = await queue.run(jobs, report_result)
+
+    if sampler is not None:
+        sampler.cancel()
+    runtime.metrics.sample()
+
+    cache = runtime.response_cache
+    report = {
+        "succeeded": summary.succeeded,
+        "failed": summary.failed,
+        "skipped": processor.skipped,
+        "failures": [(f.job.name, str(f.error)) for f in summary.failures],
+        "cache_hits": cache.hits if cache is not None else None,
+        "cache_misses": cache.misses if cache is not None else None,
+        "metrics": runtime.metrics.state(),
+    }
+    processor.close()
+    if input_index is not None:
+        input_index.close()
+    runtime.close()
+    return report
+
+
+def _run_shard_process(options: Dict[str, Any]) -> Dict[str, Any]:
+    return asyncio.run(run_shard(options))
+
+
+async def run_sharded(options: Dict[str, Any], processes: int) -> List[Dict[str, Any]]:
+    """Split the articles across worker processes, each with its own event loop."""
+    # Only sharded runs pay for importing multiprocessing
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    # Spawned workers start clean instead of inheriting the parent's threads
+    context = multiprocessing.get_context("spawn")
+    machine = "-".join(str(index) for _, index, _ in options.get("shards", []))
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        futures = []
+        for index in range(processes):
+            shard_name = "-".join(filter(None, [machine, str(index)]))
+            shard_options = {
+                **options,
+                "shards": options.get("shards", []) + [("process", index, processes)],
+                "shard_name": shard_name,
+                "manifest_log": os.path.join(
+                    PROCESSED_FOLDER, f"{MANIFEST_FILENAME}.shard-{shard_name}"
+                ),
+            }
+            futures.append(
+                loop.run_in_executor(pool, _run_shard_process, shard_options)
+            )
+        return await asyncio.gather(*futures)
+
+
+async def serve(options: Dict[str, Any], host: str, port: int):
+    """
+    Run the HTTP service until interrupted, with one warm runtime and agent.
+
+    Args:
+        options: Run options as for run_shard; "parallel" is the number of
+            articles processed at once
+        host: Interface to listen on
+        port: TCP port to listen on
+    """
+    from modules.service import JobService, ServiceAPI
+
+    runtime = Runtime(
+        max_workers=RUNTIME_MAX_WORKERS or max(4, options["parallel"] * 2),
+        use_cache=options["use_cache"],
+    )
+    manifest = None
+    if options["incremental"]:
+        manifest = Manifest(os.path.join(PROCESSED_FOLDER, MANIFEST_FILENAME))
+    processor = ArticleProcessor(
+        runtime,
+        manifest,
+        batch_size=options.get("batch_size", GEMINI_BATCH_SIZE),
+        fused=options.get("fused", FUSED_EXTRACTION),
+        html_renderer=options.get("html_renderer", HTML_RENDERER),
+        streaming=options.get("streaming", GEMINI_STREAMING),
+        output_backend=options.get("output_backend", OUTPUT_BACKEND),
+        dedup=options.get("dedup", DEDUP_ENABLED),
+        chunk_tokens=options.get("chunk_tokens", COMBINE_CHUNK_TOKENS),
+    )
+    # Pay for client construction and cache opening before the first request
+    runtime.client
+    runtime.response_cache
+
+    service = JobService(
+        processor.process_job,
+        workers=options["parallel"],
+        executor=runtime.executor,
+        metrics=runtime.metrics,
+    )
+    api = ServiceAPI(service, runtime.executor, metrics=runtime.metrics)
+    server = await api.serve(host, port)
+    print(f"Serving on http://{host}:{port} with {service.workers} workers")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+    except (NotImplementedError, RuntimeError):
+        # Windows: only Ctrl+C stops the service
+        pass
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        # Articles already being processed are finished; queued ones are dropped
+        await service.stop()
+        await server.wait_closed()
+        processor.close()
+        runtime.close()
+        print(runtime.metrics.format_summary())
+
+
+def profile_startup(options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Report what a cold run pays before its first article.
+
+    Imports are measured in a fresh interpreter; the runtime's components are
+    then built one by one, the way a run builds them on first use.
+
+    Args:
+        options: Run options as for run_shard
+
+    Returns:
+        The profile report (also printed)
+    """
+    profile = StartupProfile()
+    profile.imports = import_costs("main")
+    with profile.phase("runtime"):
+        runtime = Runtime(
+            max_workers=RUNTIME_MAX_WORKERS or max(4, options["parallel"] * 2),
+            use_cache=options["use_cache"],
+        )
+    with profile.phase("processor"):
+        processor = ArticleProcessor(
+            runtime,
+            batch_size=options.get("batch_size", GEMINI_BATCH_SIZE),
+            fused=options.get("fused", FUSED_EXTRACTION),
+            html_renderer=options.get("html_renderer", HTML_RENDERER),
+            streaming=options.get("streaming", GEMINI_STREAMING),
+            output_backend=options.get("output_backend", OUTPUT_BACKEND),
+            dedup=options.get("dedup", DEDUP_ENABLED),
+            chunk_tokens=options.get("chunk_tokens", COMBINE_CHUNK_TOKENS),
+        )
+    if options.get("input_index", True):
+        with profile.phase("input index"):
+            InputIndex().close()
+    with profile.phase("response cache"):
+        runtime.response_cache
+    with profile.phase("upload registry"):
+        runtime.upload_registry
+    with profile.phase("call controller"):
+        runtime.call_controller
+    with profile.phase("gemini client"):
+        runtime.client
+    processor.close()
+    runtime.close()
+    profile.print_report()
+    return profile.report()
 
 
 async def main():
@@ -27,54 +455,197 @@ async def main():
         default=1,
         help="Number of articles to process in parallel",
     )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Keep previous outputs and only process new or changed articles",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Run each step as a separate stage with its own concurrency limit",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the Gemini response cache",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        type=str,
+        default=METRICS_OUTPUT,
+        help="Export run metrics to this file (*.prom for Prometheus text format)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=SHARD_PROCESSES,
+        help="Number of worker processes the articles are sharded across",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        metavar="INDEX/COUNT",
+        help="Only process this machine's share of the articles (e.g. 0/4)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=GEMINI_BATCH_SIZE,
+        help="Pack up to this many small articles into one combine/HTML request",
+    )
+    parser.add_argument(
+        "--fused",
+        # Switches default to their environment setting; --no-fused etc. override it
+        action=argparse.BooleanOptionalAction,
+        default=FUSED_EXTRACTION,
+        help="Extract structured JSON from the image and XML in one call "
+        "and render the HTML locally",
+    )
+    parser.add_argument(
+        "--html-renderer",
+        choices=["local", "llm"],
+        default=HTML_RENDERER,
+        help="Render HTML locally from the structured JSON or ask Gemini for it",
+    )
+    parser.add_argument(
+        "--stream",
+        action=argparse.BooleanOptionalAction,
+        default=GEMINI_STREAMING,
+        help="Stream Gemini responses into the JSON parser and output files",
+    )
+    parser.add_argument(
+        "--output-backend",
+        choices=list(OUTPUT_BACKENDS),
+        default=OUTPUT_BACKEND,
+        help="Write one file per output, or one record per article to a "
+        "JSON Lines, gzip or SQLite store",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        metavar="GLOB",
+        help="Only process images whose path under the input folder matches "
+        "(repeatable, e.g. '1920/*/*.png')",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        metavar="GLOB",
+        help="Skip images whose path under the input folder matches (repeatable)",
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="List and hash every input instead of reusing the input index",
+    )
+    parser.add_argument(
+        "--dedup",
+        action=argparse.BooleanOptionalAction,
+        default=DEDUP_ENABLED,
+        help="Reuse the results of earlier scans of the same article "
+        "(matched by perceptual image hash and XML metadata)",
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=COMBINE_CHUNK_TOKENS,
+        help="Structure OCR text longer than this many tokens in concurrent "
+        "parts and merge them (0: one request per article)",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a long-lived HTTP service that accepts articles",
+    )
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=SERVICE_WORKERS,
+        help="Articles the service processes at once",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report import and initialization costs instead of processing",
+    )
     args = parser.parse_args()
 
-    processor = ArticleProcessor()
-
-    # Cleanup
-    processor.utility_manager.delete_folder_if_exists(PROCESSED_FOLDER)
-
-    if args.parallel > 1 and os.path.isdir(os.path.join(INPUT_FOLDER, args.name)):
-        # Process multiple articles in parallel
-        article_dir = os.path.join(INPUT_FOLDER, args.name)
-        tasks = []
-
-        for file in os.listdir(article_dir):
-            if file.endswith(".png"):
-                base_name = file[:-4]  # Remove .png extension
-                image_path = os.path.join(article_dir, file)
-                xml_path = os.path.join(article_dir, f"{base_name}.xml")
-
-                if os.path.exists(xml_path):
-                    # Create a task for each article
-                    task = processor.agent.process_article(
-                        image_path,
-                        xml_path,
-                        args.name,
-                        RESPONSE_STRUCTURE,
-                        PROCESSED_FOLDER,
-                    )
-                    tasks.append(task)
-
-                    # Process in batches based on parallel argument
-                    if len(tasks) >= args.parallel:
-                        await asyncio.gather(*tasks)
-                        tasks = []
-                else:
-                    print("Associate XML file not found")
-
-        # Process any remaining tasks
-        if tasks:
-            await asyncio.gather(*tasks)
-    else:
-        # Process single article
-        await processor.agent.process_article(
-            os.path.join(INPUT_FOLDER, f"{args.name}.png"),
-            os.path.join(INPUT_FOLDER, f"{args.name}.xml"),
-            args.name,
-            RESPONSE_STRUCTURE,
-            PROCESSED_FOLDER,
+    # Cleanup (not with --shard: other machines write to the same output folder)
+    if not (args.incremental or args.serve or args.profile_startup or args.shard):
+        delete_folder_if_exists(PROCESSED_FOLDER)
+
+    options = {
+        "name": args.name,
+        "batch": args.parallel > 1 or args.pipeline or args.processes > 1,
+        "parallel": args.parallel,
+        "pipeline": args.pipeline,
+        "batch_size": args.batch_size,
+        "fused": args.fused,
+        "html_renderer": args.html_renderer,
+        "streaming": args.stream,
+        "output_backend": args.output_backend,
+        "include": args.include or INPUT_INCLUDE,
+        "exclude": args.exclude or INPUT_EXCLUDE,
+        "input_index": INPUT_INDEX_ENABLED and not args.no_index,
+        "dedup": args.dedup,
+        "chunk_tokens": args.chunk_tokens,
+        "incremental": args.incremental,
+        "use_cache": RESPONSE_CACHE_ENABLED and not args.no_cache,
+        "shards": [("machine", *args.shard)] if args.shard else [],
+        "shard_name": str(args.shard[0]) if args.shard else None,
+        # Machine shards never write the shared manifest itself
+        "manifest_log": os.path.join(
+            PROCESSED_FOLDER, f"{MANIFEST_FILENAME}.shard-{args.shard[0]}"
         )
+        if args.shard
+        else None,
+    }
+    if args.profile_startup:
+        profile_startup(options)
+        return
+    if args.serve:
+        await serve({**options, "parallel": args.workers}, args.host, args.port)
+        return
+    if args.processes > 1:
+        reports = await run_sharded(options, args.processes)
+    else:
+        reports = [await run_shard(options)]
+
+    metrics = Metrics()
+    for report in reports:
+        metrics.merge(report["metrics"])
+
+    succeeded = sum(r["succeeded"] for r in reports)
+    total = succeeded + sum(r["failed"] for r in reports)
+    skipped = sum(r["skipped"] for r in reports)
+    print(f"Processed {succeeded}/{total} articles ({skipped} unchanged and skipped).")
+    for report in reports:
+        for name, error in report["failures"]:
+            print(f"  - {name}: {error}")
+
+    if args.incremental and not args.shard:
+        # Fold the shard logs back into the main manifest. Machine shards
+        # leave theirs in place (every run reads them) since compacting the
+        # shared manifest would race with the other machines.
+        manifest = Manifest(os.path.join(PROCESSED_FOLDER, MANIFEST_FILENAME))
+        manifest.merge(manifest.shard_logs())
+
+    if reports[0]["cache_hits"] is not None:
+        hits = sum(r["cache_hits"] for r in reports)
+        misses = sum(r["cache_misses"] for r in reports)
+        print(f"Response cache: {hits} hits, {misses} misses.")
+
+    print(metrics.format_summary())
+    if args.metrics_out:
+        metrics.write(args.metrics_out)
+        print(f"Metrics written to {args.metrics_out}")
 
     end_time = time.perf_counter()  # ⏱ End timing
     elapsed_time = end_time - start_time
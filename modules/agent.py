@@ -1,35 +1,561 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import json
+import re
 from functools import partial
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
-from google.genai import Client
-from config import GEMINI_API_KEY
+from config import (
+    COMBINE_CHUNK_TOKENS,
+    FUSED_EXTRACTION,
+    FUSED_RAW_TEXT,
+    GEMINI_BATCH_MAX_CHARS,
+    GEMINI_BATCH_SIZE,
+    GEMINI_BATCH_WAIT,
+    GEMINI_STREAMING,
+    HTML_LLM_FALLBACK,
+    HTML_RENDERER,
+    OUTPUT_BACKEND,
+    OUTPUT_SYNC_BATCH,
+)
 from modules.ai_processor import AIProcessor
+from modules.article_context import ArticleContext
 from modules.data_saver import DataSaver
-from modules.html_processor import HTMLProcessor
-from modules.prompt_manager import PromptManager
+from modules.html_processor import HTMLProcessor, HTMLStreamSlicer
+from modules.pipeline import Stage, StageHandler
+from modules.prompt_manager import PromptManager, chunk_text
+from modules.rate_limiter import estimate_tokens
+from modules.request_batcher import RequestBatcher
+from modules.runtime import Runtime, get_default_runtime
 from utils import UtilityManager
 from modules.xml_parser import XMLParser
 
+if TYPE_CHECKING:
+    # Only --dedup runs load the index
+    from modules.dedup import DedupIndex
+
+# Separates the pages of a batched HTML response: "<<<ARTICLE <id>>>"
+BATCH_PAGE_MARKER = re.compile(r"^\s*<<<ARTICLE (\S+?)>>>\s*$", re.MULTILINE)
+
+# XML metadata fields that override the title/author of a chunked article
+METADATA_TITLE_FIELDS = ("heading", "title")
+METADATA_AUTHOR_FIELDS = ("author",)
+
+
+def _metadata_value(metadata: Any, fields: Tuple[str, ...]) -> Optional[str]:
+    """First non-empty text among the top-level metadata fields."""
+    if not isinstance(metadata, dict):
+        return None
+    for field in fields:
+        value = metadata.get(field)
+        if isinstance(value, str) and value.strip():
+            return " ".join(value.split())
+    return None
+
+
+def merge_chunks(
+    parts: List[Dict[str, Any]], chunks: List[str], metadata: Any
+) -> Dict[str, Any]:
+    """
+    Merge the structured parts of a chunked article, in part order.
+
+    Args:
+        parts: Structured JSON of each part
+        chunks: OCR text of each part; a part whose JSON has no usable
+            "content" keeps its text as plain paragraphs instead
+        metadata: Parsed XML metadata; its heading/author win over the parts'
+
+    Returns:
+        One structured article: "content" concatenated, other fields taken
+        from the first part that has a value
+    """
+    merged: Dict[str, Any] = {}
+    content: List[Any] = []
+    for part, chunk in zip(parts, chunks):
+        for key, value in part.items():
+            if key in ("content", "error", "raw_response"):
+                continue
+            if merged.get(key) in (None, "", [], {}):
+                merged[key] = value
+        paragraphs = part.get("content")
+        if not isinstance(paragraphs, list) or "error" in part:
+            paragraphs = [p.strip() for p in chunk.split("\n\n") if p.strip()]
+        # A part may repeat the paragraph the previous part ended with; only
+        # that boundary is deduplicated, so repeated paragraphs within a part
+        # (such as "* * *" separators) are kept
+        if paragraphs and content and paragraphs[0] == content[-1]:
+            paragraphs = paragraphs[1:]
+        content.extend(paragraphs)
+    merged["content"] = content
+
+    title = _metadata_value(metadata, METADATA_TITLE_FIELDS)
+    if title:
+        merged["title"] = title
+    author = _metadata_value(metadata, METADATA_AUTHOR_FIELDS)
+    if author:
+        merged["author"] = author
+    return merged
+
 
 class ArticleProcessorAgent:
     """An agentic approach to processing old article images and metadata."""
 
-    def __init__(self):
-        self.client = Client(api_key=GEMINI_API_KEY)
-        self.data_saver = DataSaver()
-        self.prompt = PromptManager()
-        self.ai_processor = AIProcessor()
-        self.html_processor = HTMLProcessor()
-        self.utility_manager = UtilityManager()
-        self.xml_parser = XMLParser()
-        self.extracted_data: Dict[str, Any] = {
-            "raw_image_text": None,
-            "xml_metadata": None,
-            "combined_content": None,
-            "html_content": None,
-        }
+    def __init__(
+        self,
+        runtime: Optional[Runtime] = None,
+        batch_size: int = GEMINI_BATCH_SIZE,
+        batch_max_chars: int = GEMINI_BATCH_MAX_CHARS,
+        fused: bool = FUSED_EXTRACTION,
+        fused_raw_text: bool = FUSED_RAW_TEXT,
+        html_renderer: str = HTML_RENDERER,
+        html_llm_fallback: bool = HTML_LLM_FALLBACK,
+        streaming: bool = GEMINI_STREAMING,
+        output_backend: str = OUTPUT_BACKEND,
+        output_prefix: str = "outputs",
+        dedup_index: Optional["DedupIndex"] = None,
+        chunk_tokens: int = COMBINE_CHUNK_TOKENS,
+    ):
+        # All components share one executor and one Gemini client
+        self.runtime = runtime or get_default_runtime()
+        self.data_saver = DataSaver(
+            self.runtime, output_backend, store_prefix=output_prefix
+        )
+        self.prompt = PromptManager(metrics=self.runtime.metrics)
+        self.ai_processor = AIProcessor(self.runtime)
+        self.html_processor = HTMLProcessor(self.ai_processor)
+        self.utility_manager = UtilityManager(executor=self.runtime.executor)
+        self.xml_parser = XMLParser(self.runtime)
+        self.metrics = self.runtime.metrics
+        self.fused = fused
+        self.fused_raw_text = fused_raw_text
+        if html_renderer not in ("local", "llm"):
+            raise ValueError(f"Unknown HTML renderer '{html_renderer}'")
+        self.html_renderer = html_renderer
+        self.html_llm_fallback = html_llm_fallback
+        self.streaming = streaming
+        # Longer OCR text is combined in parts (0: always in one request)
+        self.chunk_tokens = chunk_tokens
+        # Optional: near-duplicate scans reuse an earlier article's results
+        self.dedup_index = dedup_index
+
+        # Opt-in: small articles in flight together share combine/HTML calls
+        self.batch_max_chars = batch_max_chars
+        self.combine_batcher = None
+        self.html_batcher = None
+        if batch_size > 1:
+            self.combine_batcher = RequestBatcher(
+                self._combine_batch, batch_size, GEMINI_BATCH_WAIT
+            )
+            self.html_batcher = RequestBatcher(
+                self._html_batch, batch_size, GEMINI_BATCH_WAIT
+            )
+
+    async def extract_text(self, ctx: ArticleContext):
+        """Step 1: Extract the raw text from the article image."""
+        with self.metrics.span("stage_seconds", stage="ocr"):
+            prompt = self.prompt.get_content_extraction_prompt()
+            if self.streaming:
+                # The raw text file is written while the transcription streams in
+                ctx.raw_image_text = await self._stream_to_file(
+                    ctx, "raw_image_text", prompt, ctx.image_path
+                )
+            else:
+                ctx.raw_image_text = await self.ai_processor.ask_ai(
+                    prompt, ctx.image_path
+                )
+
+    async def parse_metadata(self, ctx: ArticleContext):
+        """Step 2: Parse the XML metadata."""
+        with self.metrics.span("stage_seconds", stage="parse"):
+            ctx.xml_metadata = await self.xml_parser.parse_xml_metadata(ctx.xml_path)
+
+    async def deduplicate(self, ctx: ArticleContext):
+        """Reuse the results of an earlier scan of the same article, if any.
+
+        Needs the parsed metadata. When no duplicate is found the article is
+        indexed as a canonical that later scans can reuse once it is saved.
+        """
+        assert self.dedup_index is not None
+        with self.metrics.span("stage_seconds", stage="dedup"):
+            loop = asyncio.get_running_loop()
+            from modules.dedup import xml_fingerprint
+
+            xml_hash = xml_fingerprint(ctx.xml_metadata)
+            image_key = await loop.run_in_executor(
+                self.runtime.executor,
+                self.dedup_index.image_key,
+                ctx.image_path,
+                xml_hash,
+            )
+            match = await self.dedup_index.match(
+                ctx.image_name, image_key, xml_hash, ctx.output_path
+            )
+        if match is None:
+            return
+        outputs = match["outputs"]
+        ctx.raw_image_text = outputs["raw_image_text"]
+        ctx.combined_content = outputs["combined_content"]
+        ctx.html_content = outputs["html_content"]
+        ctx.duplicate_of = {"name": match["name"], "distance": match["distance"]}
+
+    def _unless_duplicate(self, handler: StageHandler) -> StageHandler:
+        """Pipeline step that is skipped for duplicates and withdraws a failed
+        canonical, so its duplicates do not wait for it."""
+
+        async def step(ctx: ArticleContext) -> Optional[bool]:
+            if ctx.duplicate_of is not None:
+                return None
+            try:
+                return await handler(ctx)
+            except Exception:
+                if self.dedup_index is not None:
+                    self.dedup_index.release(ctx.image_name)
+                raise
+
+        return step
+
+    async def combine(self, ctx: ArticleContext):
+        """Step 3: Combine OCR text and metadata into structured JSON."""
+        with self.metrics.span("stage_seconds", stage="combine"):
+            text = ctx.raw_image_text or ""
+            if self.chunk_tokens and estimate_tokens(text) > self.chunk_tokens:
+                ctx.combined_content = await self._combine_chunked(ctx, text)
+                return
+
+            if self.combine_batcher is not None and self._fits_batch(
+                ctx.raw_image_text or "", ctx.xml_metadata or {}
+            ):
+                ctx.combined_content = await self.combine_batcher.submit(ctx)
+                if ctx.combined_content is not None:
+                    return
+                self.metrics.incr("batch_fallbacks_total", step="combine")
+
+            prompt = self.prompt.get_combined_prompt(
+                ctx.raw_image_text or "",
+                ctx.xml_metadata or {},
+                ctx.response_template,
+            )
+            if self.streaming:
+                # Parse the JSON object while the response is still streaming
+                parser = self.utility_manager.json_extractor.stream()
+                response = await self.ai_processor.ask_ai_stream(
+                    prompt, on_chunk=parser.feed
+                )
+                ctx.combined_content = (
+                    parser.result()
+                    if response
+                    else self.utility_manager.structure_json(response)
+                )
+                if response and "error" in ctx.combined_content:
+                    await self.ai_processor.forget(prompt)
+                return
+
+            combined_content = await self.ai_processor.ask_ai(prompt)
+            ctx.combined_content = await self._structure(prompt, combined_content)
+
+    async def _structure(
+        self, prompt: str, response: Optional[str], image_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Parse a JSON response; a rejected one is dropped from the cache."""
+        # Run JSON structuring in thread pool to avoid blocking
+        with self.metrics.span("structure_json_seconds"):
+            structured = await self.utility_manager.structure_json_async(response)
+        if response is not None and "error" in structured:
+            await self.ai_processor.forget(prompt, image_path)
+        return structured
+
+    async def _combine_chunked(self, ctx: ArticleContext, text: str) -> Dict[str, Any]:
+        """Structure a long article's parts concurrently, then merge them."""
+        chunks = chunk_text(text, self.chunk_tokens)
+        self.metrics.incr("combine_chunks_total", len(chunks))
+
+        async def structure(part: int) -> Dict[str, Any]:
+            prompt = self.prompt.get_chunk_prompt(
+                chunks[part],
+                ctx.xml_metadata or {},
+                ctx.response_template,
+                part + 1,
+                len(chunks),
+                max(self.chunk_tokens // 4, 1),
+            )
+            response = await self.ai_processor.ask_ai(prompt)
+            structured = await self._structure(prompt, response)
+            if "error" in structured:
+                self.metrics.incr("combine_chunk_failures_total")
+            return structured
+
+        parts = await asyncio.gather(*(structure(i) for i in range(len(chunks))))
+        return merge_chunks(list(parts), chunks, ctx.xml_metadata)
+
+    async def generate_html(self, ctx: ArticleContext):
+        """Step 4: Build the HTML page from the structured content.
+
+        The page is rendered locally unless the renderer is "llm", or the
+        content is unusable for the local renderer and the LLM fallback is on.
+        """
+        with self.metrics.span("stage_seconds", stage="html"):
+            loop = asyncio.get_running_loop()
+            if self.html_renderer == "local":
+                if not self.html_llm_fallback or self.html_processor.can_render(
+                    ctx.combined_content
+                ):
+                    ctx.html_content = await self._render_to_file(ctx)
+                    return
+                self.metrics.incr("html_llm_fallbacks_total")
+
+            html_content = None
+            if self.html_batcher is not None and self._fits_batch(
+                ctx.combined_content or {}
+            ):
+                html_content = await self.html_batcher.submit(ctx)
+                if html_content is None:
+                    self.metrics.incr("batch_fallbacks_total", step="html")
+
+            if html_content is None and self.streaming:
+                # Slice out the page and write it to disk as it streams in
+                slicer = HTMLStreamSlicer()
+                html_content = await self._stream_to_file(
+                    ctx,
+                    "html_content",
+                    self.prompt.get_html_prompt(ctx.combined_content or {}),
+                    slicer=slicer,
+                )
+                ctx.html_content = slicer.page() if html_content else html_content
+                return
+
+            if html_content is None:
+                html_content = await self.ai_processor.ask_ai(
+                    self.prompt.get_html_prompt(ctx.combined_content or {})
+                )
+
+            ctx.html_content = await loop.run_in_executor(
+                self.runtime.executor,
+                partial(self.html_processor.generate_html, html_content),
+            )
+
+    async def extract_structured(self, ctx: ArticleContext):
+        """Fused steps 1 & 3: structure the image and metadata in a single call.
+
+        Falls back to the separate OCR and combine calls when the response is
+        not usable JSON.
+        """
+        with self.metrics.span("stage_seconds", stage="extract"):
+            prompt = self.prompt.get_fused_prompt(
+                ctx.xml_metadata or {},
+                ctx.response_template,
+                include_raw_text=self.fused_raw_text,
+            )
+            response = await self.ai_processor.ask_ai(prompt, ctx.image_path)
+            structured = await self._structure(prompt, response, ctx.image_path)
+
+        if "error" in structured:
+            self.metrics.incr("fused_fallbacks_total")
+            await self.extract_text(ctx)
+            await self.combine(ctx)
+            return
+
+        raw_text = structured.pop("raw_text", None)
+        if self.fused_raw_text and isinstance(raw_text, str):
+            ctx.raw_image_text = raw_text
+        ctx.combined_content = structured
+
+    async def _render_to_file(self, ctx: ArticleContext) -> str:
+        """Render the page locally, writing each chunk to its output file.
+
+        The file is listed in ctx.output_files like a streamed response. Store
+        backends keep the article in one record, so there the page is only
+        rendered.
+        """
+        loop = asyncio.get_running_loop()
+        if self.data_saver.uses_store:
+            return await loop.run_in_executor(
+                self.runtime.executor,
+                self.html_processor.render_html,
+                ctx.combined_content,
+            )
+
+        chunks = self.html_processor.iter_html(ctx.combined_content)
+        writer = self.data_saver.open_text_stream(
+            self.data_saver.output_file(ctx.output_path, ctx.image_name, "html_content")
+        )
+        parts: List[str] = []
+        try:
+            while True:
+                chunk = await loop.run_in_executor(
+                    self.runtime.executor, next, chunks, None
+                )
+                if chunk is None:
+                    break
+                parts.append(chunk)
+                await writer.write(chunk)
+            ctx.output_files.append(await writer.commit())
+        except BaseException:
+            writer.abort()
+            raise
+        return "".join(parts)
+
+    async def _stream_to_file(
+        self,
+        ctx: ArticleContext,
+        field: str,
+        prompt: str,
+        image_path: Optional[str] = None,
+        slicer: Optional[HTMLStreamSlicer] = None,
+    ) -> Optional[str]:
+        """Stream a response into the article's output file for `field`.
+
+        The file is only published when the response completes; it is then
+        listed in ctx.output_files so the save step does not rewrite it.
+        Store backends keep the article in one record written by the save
+        step, so there the response is only streamed through the slicer.
+        """
+        if self.data_saver.uses_store:
+            response = await self.ai_processor.ask_ai_stream(
+                prompt, image_path, on_chunk=slicer.feed if slicer else None
+            )
+            if response and slicer is not None:
+                slicer.finish()
+            return response
+
+        writer = self.data_saver.open_text_stream(
+            self.data_saver.output_file(ctx.output_path, ctx.image_name, field)
+        )
+
+        async def write(text: str):
+            if slicer is not None:
+                text = slicer.feed(text)
+            if text:
+                await writer.write(text)
+
+        try:
+            response = await self.ai_processor.ask_ai_stream(
+                prompt, image_path, on_chunk=write
+            )
+            if response:
+                if slicer is not None:
+                    await writer.write(slicer.finish())
+                ctx.output_files.append(await writer.commit())
+                return response
+        except BaseException:
+            writer.abort()
+            raise
+        writer.abort()
+        return response
+
+    def _fits_batch(self, *parts: Any) -> bool:
+        """Only small articles are batched; long ones gain little and risk truncation."""
+        size = sum(len(p) if isinstance(p, str) else len(json.dumps(p)) for p in parts)
+        return size <= self.batch_max_chars
+
+    async def _combine_batch(
+        self, batch: List[ArticleContext]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Combine several articles in one call; None marks items to redo singly."""
+        if len(batch) == 1:
+            return [None]
+
+        self.metrics.incr("batched_requests_total", step="combine")
+        template = batch[0].response_template
+        prompt = self.prompt.get_batch_combined_prompt(
+            [
+                (str(i), ctx.raw_image_text or "", ctx.xml_metadata or {})
+                for i, ctx in enumerate(batch)
+            ],
+            template,
+        )
+        response = await self.ai_processor.ask_ai(prompt)
+        parsed = await self._structure(prompt, response)
+
+        # Every item must come back as an object with the template's fields
+        required = set(json.loads(template)) if template else set()
+        schema = self.utility_manager.json_extractor.schema
+        results: List[Optional[Dict[str, Any]]] = []
+        for i, ctx in enumerate(batch):
+            item = parsed.get(str(i))
+            valid = (
+                isinstance(item, dict)
+                and required <= item.keys()
+                and ctx.response_template == template
+            )
+            if valid and schema is not None:
+                # Same type repairs as a single-article response gets
+                item = schema.coerce(item)
+            results.append(item if valid else None)
+        return results
+
+    async def _html_batch(self, batch: List[ArticleContext]) -> List[Optional[str]]:
+        """Render several articles in one call; None marks items to redo singly."""
+        if len(batch) == 1:
+            return [None]
+
+        self.metrics.incr("batched_requests_total", step="html")
+        response = await self.ai_processor.ask_ai(
+            self.prompt.get_batch_html_prompt(
+                [(str(i), ctx.combined_content or {}) for i, ctx in enumerate(batch)]
+            )
+        )
+
+        pages: Dict[str, str] = {}
+        parts = BATCH_PAGE_MARKER.split(response or "")
+        for article_id, page in zip(parts[1::2], parts[2::2]):
+            pages[article_id] = page.strip()
+
+        return [
+            page if page and "<html" in page and "</html>" in page else None
+            for page in (pages.get(str(i)) for i in range(len(batch)))
+        ]
+
+    async def save(self, ctx: ArticleContext):
+        """Step 5: Save the results to the output folder."""
+        try:
+            with self.metrics.span("stage_seconds", stage="save"):
+                ctx.output_files = await self.data_saver.save_processed_data(
+                    ctx.output_path, ctx.to_dict(), ctx.image_name, ctx.output_files
+                )
+            if self.dedup_index is not None and ctx.duplicate_of is None:
+                await self.dedup_index.publish(ctx.image_name, ctx.to_dict())
+        except Exception:
+            # Like a failed step: duplicates waiting for this article go on alone
+            if self.dedup_index is not None:
+                self.dedup_index.release(ctx.image_name)
+            raise
+
+    def save_concurrency(self, concurrency: Dict[str, int]) -> int:
+        """Save stage workers; with a store each one mostly waits on a group
+        commit, so enough run at once to fill an fsync batch."""
+        workers = concurrency.get("save", 1)
+        if self.data_saver.uses_store:
+            workers = max(workers, OUTPUT_SYNC_BATCH)
+        return workers
+
+    def pipeline_stages(self, concurrency: Dict[str, int]) -> List[Stage]:
+        """Build the processing steps as independently scaled pipeline stages."""
+        if self.fused:
+            steps = [
+                Stage(
+                    "extract",
+                    self.extract_structured,
+                    concurrency.get("extract", concurrency.get("ocr", 1)),
+                ),
+                Stage("html", self.generate_html, concurrency.get("html", 1)),
+            ]
+        else:
+            steps = [
+                Stage("ocr", self.extract_text, concurrency.get("ocr", 1)),
+                Stage("combine", self.combine, concurrency.get("combine", 1)),
+                Stage("html", self.generate_html, concurrency.get("html", 1)),
+            ]
+        stages = [Stage("parse", self.parse_metadata, concurrency.get("parse", 1))]
+        if self.dedup_index is not None:
+            stages.append(Stage("dedup", self.deduplicate, concurrency.get("dedup", 2)))
+            steps = [
+                Stage(step.name, self._unless_duplicate(step.handler), step.concurrency)
+                for step in steps
+            ]
+        return [
+            *stages,
+            *steps,
+            Stage("save", self.save, self.save_concurrency(concurrency)),
+        ]
 
     async def process_article(
         self,
@@ -39,60 +565,61 @@ class ArticleProcessorAgent:
         response_template: str,
         output_path: str,
     ) -> Dict[str, Any]:
-        # Setup a thread pool for CPU-bound tasks
-        executor = ThreadPoolExecutor(max_workers=3)
-        loop = asyncio.get_event_loop()
-
-        print("Starting article processing in parallel...")
+        # Each call gets its own context so concurrent articles never share state
+        ctx = ArticleContext(
+            image_path, xml_path, image_name, response_template, output_path
+        )
 
-        # Step 1 & 2: Extract text from image and Parse XML metadata in parallel
-        print("Steps 1 & 2: Extracting text and parsing XML...")
+        print(f"Starting article processing for '{image_name}'...")
 
-        raw_image_task = self.ai_processor.ask_ai(
-            self.prompt.get_content_extraction_prompt(), image_path
-        )
+        if self.dedup_index is None:
+            return await self._process(ctx)
+        try:
+            print("Step 0: Parsing XML and looking for an earlier scan...")
+            await self.parse_metadata(ctx)
+            await self.deduplicate(ctx)
+            if ctx.duplicate_of is not None:
+                print(f"Reusing the results of '{ctx.duplicate_of['name']}'")
+                await self.save(ctx)
+                return ctx.result()
+            return await self._process(ctx, parsed=True)
+        except BaseException:
+            # Duplicates waiting for this article get processed themselves
+            self.dedup_index.release(ctx.image_name)
+            raise
 
-        xml_metadata_task = self.xml_parser.parse_xml_metadata(xml_path)
+    async def _process(
+        self, ctx: ArticleContext, parsed: bool = False
+    ) -> Dict[str, Any]:
+        """Run every step for an article; `parsed` skips the XML parsing."""
+        if self.fused:
+            # The metadata goes into the single multimodal request
+            if not parsed:
+                print("Step 1: Parsing XML...")
+                await self.parse_metadata(ctx)
+            print("Step 2: Extracting structured content from the image...")
+            await self.extract_structured(ctx)
+            print("Step 3: Generating HTML...")
+            await self.generate_html(ctx)
+            await self.save(ctx)
+            return ctx.result()
 
-        # Wait for both tasks to complete
-        raw_image_text, xml_metadata = await asyncio.gather(
-            raw_image_task, xml_metadata_task
+        # Step 1 & 2: Extract text from image and Parse XML metadata in parallel
+        print("Steps 1 & 2: Extracting text and parsing XML...")
+        await asyncio.gather(
+            self.extract_text(ctx), *([] if parsed else [self.parse_metadata(ctx)])
         )
 
-        self.extracted_data["raw_image_text"] = raw_image_text
-        self.extracted_data["xml_metadata"] = xml_metadata
-
         # Step 3: Combined content
         print("Step 3: Combined content...")
-        combined_content = await self.ai_processor.ask_ai(
-            self.prompt.get_combined_prompt(
-                self.extracted_data.get("raw_image_text", ""),
-                self.extracted_data.get("xml_metadata", ""),
-                response_template,
-            )
-        )
-
-        # Run JSON structuring in thread pool to avoid blocking
-        self.extracted_data[
-            "combined_content"
-        ] = await self.utility_manager.structure_json_async(combined_content)
+        await self.combine(ctx)
 
         # Step 4: Generate HTML
         print("Step 4: Generating HTML...")
-        html_content = await self.ai_processor.ask_ai(
-            self.prompt.get_html_prompt(
-                self.extracted_data.get("structured_content", "")
-            )
-        )
-
-        self.extracted_data["html_content"] = await loop.run_in_executor(
-            executor, partial(self.html_processor.generate_html, html_content)
-        )
+        await self.generate_html(ctx)
 
         # Step 5: Saving results
-        await self.data_saver.save_processed_data(
-            output_path, self.extracted_data, image_name
-        )
+        await self.save(ctx)
 
         # Return results
-        return self.extracted_data
+        return ctx.result()
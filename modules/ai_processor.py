@@ -1,65 +1,361 @@
 import asyncio
+import inspect
+import mimetypes
+import os
+import time
+from collections import deque
 from functools import partial
-from typing import Dict, List, Optional
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
 
-from google.genai import Client
-from config import GEMINI_API_KEY, GEMINI_MODEL
+from config import AI_HISTORY_LIMIT, GEMINI_MODEL
 from modules.prompt_manager import PromptManager
+from modules.rate_limiter import RetryExhaustedError, estimate_tokens, usage_tokens
+from modules.response_cache import hash_file
+from modules.runtime import Runtime, get_default_runtime
 
 
 class AIProcessor:
-    def __init__(self):
-        self.client = Client(api_key=GEMINI_API_KEY)
+    def __init__(
+        self,
+        runtime: Optional[Runtime] = None,
+        history_limit: int = AI_HISTORY_LIMIT,
+    ):
+        """
+        Initialize the AIProcessor.
+
+        Args:
+            runtime: Shared runtime providing the client and executor
+            history_limit: Number of messages to keep in the conversation
+                history; 0 disables history retention entirely
+        """
+        self.runtime = runtime or get_default_runtime()
         self.prompt = PromptManager()
-        self.conversation_history: List[Dict[str, str]] = []
+        self.history_limit = max(0, history_limit)
+        self.conversation_history: Deque[Dict[str, str]] = deque(
+            maxlen=self.history_limit
+        )
 
     def _add_to_history(self, role: str, content: str) -> None:
-        """Add a message to the conversation history."""
-        self.conversation_history.append({"role": role, "content": content})
-
-    def _upload_file(self, image_path: str):
-        """Helper method to upload a file - runs in executor."""
-        with open(image_path, "rb") as image_file:
-            return self.client.files.upload(
-                file=image_file, config={"mime_type": "image/png"}
+        """Add a message to the conversation history, if retention is enabled."""
+        if self.history_limit:
+            self.conversation_history.append({"role": role, "content": content})
+
+    @property
+    def client(self):
+        return self.runtime.client
+
+    @property
+    def cache(self):
+        return self.runtime.response_cache
+
+    @property
+    def metrics(self):
+        return self.runtime.metrics
+
+    def _record_usage(self, response: Any):
+        """Count the token usage reported by a generate_content response."""
+        metadata = getattr(response, "usage_metadata", None)
+        for kind in ("prompt", "candidates", "total"):
+            count = getattr(metadata, f"{kind}_token_count", None)
+            if count:
+                self.metrics.incr("gemini_tokens_total", count, kind=kind)
+
+    def _upload_file(self, image_path: str, image_hash: Optional[str] = None):
+        """Helper method to upload a file - runs in executor.
+
+        Images are uploaded at most once per validity window; later calls with
+        the same content reuse the registered file handle.
+        """
+
+        def upload():
+            self.metrics.incr("upload_bytes_total", os.path.getsize(image_path))
+            mime_type = mimetypes.guess_type(image_path)[0] or "image/png"
+            with open(image_path, "rb") as image_file:
+                return self.client.files.upload(
+                    file=image_file, config={"mime_type": mime_type}
+                )
+
+        return self.runtime.upload_registry.get_or_upload(
+            image_hash or hash_file(image_path), upload
+        )
+
+    def _image_key(self, image_hash: Optional[str]) -> Optional[str]:
+        """The part of a cache key that identifies the image the model saw."""
+        preprocessor = self.runtime.image_preprocessor
+        if image_hash and preprocessor.enabled:
+            # The model sees the preprocessed image, so its settings matter too
+            return preprocessor.cache_key(image_hash)
+        return image_hash
+
+    async def _lookup(
+        self, prompt: str, image_path: Optional[str]
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Hash the image and check the cache; returns (image hash, key, cached)."""
+        loop = asyncio.get_running_loop()
+
+        # Hash the image once; it keys both the cache and the upload registry
+        image_hash = None
+        if image_path:
+            image_hash = await loop.run_in_executor(
+                self.runtime.executor, hash_file, image_path
+            )
+
+        # Serve repeated prompts (and unchanged images) from the cache
+        cache = self.cache
+        if cache is None:
+            return image_hash, None, None
+        cache_key, cached = await loop.run_in_executor(
+            self.runtime.executor,
+            partial(cache.lookup, GEMINI_MODEL, prompt, self._image_key(image_hash)),
+        )
+        if cached is not None:
+            self.metrics.incr("cache_hits_total")
+            self._add_to_history("user", prompt)
+            self._add_to_history("model", cached)
+        else:
+            self.metrics.incr("cache_misses_total")
+        return image_hash, cache_key, cached
+
+    async def _contents(
+        self,
+        prompt: str,
+        image_path: Optional[str],
+        image_hash: Optional[str],
+        uploads: List[str],
+    ) -> Any:
+        """Request contents: the prompt, preceded by the uploaded image if any.
+
+        The image may be replaced by its preprocessed version or tiles; the
+        upload registry keys used are appended to `uploads`.
+        """
+        if not image_path or not image_hash:
+            return prompt
+        loop = asyncio.get_running_loop()
+        paths = await self.runtime.image_preprocessor.prepare(image_path, image_hash)
+        # Preprocessed files are named after their source hash and settings
+        keys = [image_hash if p == image_path else os.path.basename(p) for p in paths]
+        uploads.extend(keys)
+
+        async def upload(path: str, key: str) -> Any:
+            # Use loop.run_in_executor for file operations
+            upload_func = partial(self._upload_file, path, key)
+            return await self.runtime.call_controller.call(
+                lambda: loop.run_in_executor(self.runtime.executor, upload_func),
+                rate_limited=False,
+            )
+
+        files = await asyncio.gather(*map(upload, paths, keys))
+        return [*files, prompt]
+
+    async def _remember(self, prompt: str, text: Optional[str], cache_key, kind: str):
+        """Record a finished response in the history, metrics and cache."""
+        self._add_to_history("user", prompt)
+        if not text:
+            return
+        self.metrics.incr("response_chars_total", len(text), kind=kind)
+        self._add_to_history("model", text)
+        if self.cache is not None and cache_key is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.runtime.executor, partial(self.cache.set, cache_key, text)
+            )
+
+    async def forget(self, prompt: str, image_path: Optional[str] = None):
+        """Drop the cached response to a request whose answer the caller rejected.
+
+        Responses are cached as soon as they arrive; without this a malformed
+        answer would be replayed on every run until it expires.
+        """
+        cache = self.cache
+        if cache is None:
+            return
+        loop = asyncio.get_running_loop()
+        image_hash = None
+        if image_path:
+            image_hash = await loop.run_in_executor(
+                self.runtime.executor, hash_file, image_path
             )
+        key = cache.make_key(GEMINI_MODEL, prompt, self._image_key(image_hash))
+        await loop.run_in_executor(self.runtime.executor, cache.delete, key)
+
+    def _failed(self, error: Exception, uploads: List[str]):
+        """Count a failed call and drop the image handles it may have rejected."""
+        if isinstance(error, RetryExhaustedError):
+            self.metrics.incr("gemini_errors_total", type="retry_exhausted")
+        else:
+            self.metrics.incr("gemini_errors_total", type=type(error).__name__)
+        # A rejected file handle must not be reused on the next attempt
+        for key in uploads:
+            self.runtime.upload_registry.invalidate(key)
 
     async def ask_ai(
         self, prompt: str, image_path: Optional[str] = None
     ) -> Optional[str]:
-        """Ask Gemini a question with optional image input."""
+        """Ask Gemini a question with optional image input.
+
+        Transient errors (429/5xx, timeouts) are retried with backoff; if they
+        persist, RetryExhaustedError is raised. Other errors are reported and
+        None is returned.
+        """
+        uploads: List[str] = []
         try:
-            loop = asyncio.get_event_loop()
-            if image_path:
-                # Use loop.run_in_executor for file operations
-                upload_func = partial(self._upload_file, image_path)
-                file = await loop.run_in_executor(None, upload_func)
-
-                # Generate response with Image - run API call in executor
-                response_func = partial(
-                    self.client.models.generate_content,
-                    model=GEMINI_MODEL,
-                    contents=[file, prompt],
+            loop = asyncio.get_running_loop()
+            image_hash, cache_key, cached = await self._lookup(prompt, image_path)
+            if cached is not None:
+                return cached
+
+            contents = await self._contents(prompt, image_path, image_hash, uploads)
+
+            # Run the API call in the executor under the shared rate limit,
+            # adaptive concurrency limit and retry policy
+            response_func = partial(
+                self.client.models.generate_content,
+                model=GEMINI_MODEL,
+                contents=contents,
+            )
+            kind = "image" if image_path else "text"
+            self.metrics.incr("gemini_calls_total", kind=kind)
+            self.metrics.incr("prompt_chars_total", len(prompt), kind=kind)
+            with self.metrics.span("gemini_call_seconds", kind=kind):
+                response = await self.runtime.call_controller.call(
+                    lambda: loop.run_in_executor(self.runtime.executor, response_func),
+                    estimated_tokens=estimate_tokens(prompt, images=len(uploads)),
+                    usage=usage_tokens,
                 )
-                response = await loop.run_in_executor(None, response_func)
-            else:
-                # Generate response without Image
-                response_func = partial(
-                    self.client.models.generate_content,
-                    model=GEMINI_MODEL,
-                    contents=prompt,
+            self._record_usage(response)
+            await self._remember(prompt, response.text, cache_key, kind)
+            return response.text
+        except RetryExhaustedError as e:
+            # Surface persistent transient failures so the article is reported
+            # as failed (and retried on the next run) instead of saved empty
+            self._failed(e, uploads)
+            raise
+        except Exception as e:
+            self._failed(e, uploads)
+            print(f"Error communicating with Gemini: {e}")
+            return None
+
+    async def stream_ai(
+        self, prompt: str, image_path: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Ask Gemini with optional image input, yielding text as it is generated.
+
+        Opening the stream and waiting for the first chunk is retried like
+        ask_ai; once text has been yielded a failure propagates, since the
+        consumer has already seen part of the answer. Records time to first
+        token and generation speed.
+        """
+        image_hash, cache_key, cached = await self._lookup(prompt, image_path)
+        if cached is not None:
+            yield cached
+            return
+
+        kind = "image" if image_path else "text"
+        controller = self.runtime.call_controller
+        parts: List[str] = []
+        uploads: List[str] = []
+        try:
+            contents = await self._contents(prompt, image_path, image_hash, uploads)
+            estimated = estimate_tokens(prompt, images=len(uploads))
+            self.metrics.incr("gemini_calls_total", kind=kind)
+            self.metrics.incr("prompt_chars_total", len(prompt), kind=kind)
+
+            async def open_stream():
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=GEMINI_MODEL, contents=contents
                 )
-                response = await loop.run_in_executor(None, response_func)
+                iterator = stream.__aiter__()
+                try:
+                    return iterator, await iterator.__anext__()
+                except StopAsyncIteration:
+                    return iterator, None
 
-            # Add to conversation history
-            self._add_to_history("user", prompt)
-            if response.text:
-                self._add_to_history("model", response.text)
+            start = time.perf_counter()
+            # The slot stays taken until the whole response has been read, so
+            # streamed calls count against the concurrency limit throughout
+            iterator, chunk = await controller.call(
+                open_stream, estimated_tokens=estimated, hold=True
+            )
+            first_token = time.perf_counter()
+            self.metrics.observe("gemini_ttft_seconds", first_token - start, kind=kind)
 
-            return response.text
+            last = chunk
+            error: Optional[BaseException] = None
+            try:
+                while chunk is not None:
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        yield chunk.text
+                    last = chunk
+                    try:
+                        chunk = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        chunk = None
+            except BaseException as e:
+                # Throttling reported mid-stream lowers the limit too
+                error = e
+                raise
+            finally:
+                await controller.release(error)
+        except Exception:
+            # A rejected file handle must not be reused on the next attempt
+            for key in uploads:
+                self.runtime.upload_registry.invalidate(key)
+            raise
+
+        end = time.perf_counter()
+        self.metrics.observe("gemini_call_seconds", end - start, kind=kind)
+        # The final chunk carries the usage totals for the whole response
+        self._record_usage(last)
+        controller.limiter.settle(estimated, usage_tokens(last))
+        generated = getattr(
+            getattr(last, "usage_metadata", None), "candidates_token_count", None
+        )
+        if generated and end > first_token:
+            self.metrics.observe(
+                "gemini_tokens_per_second", generated / (end - first_token), kind=kind
+            )
+
+        await self._remember(prompt, "".join(parts), cache_key, kind)
+
+    async def ask_ai_stream(
+        self,
+        prompt: str,
+        image_path: Optional[str] = None,
+        on_chunk: Optional[Callable[[str], Any]] = None,
+    ) -> Optional[str]:
+        """Streaming counterpart of ask_ai that hands each chunk to `on_chunk`.
+
+        `on_chunk` may be a plain function or a coroutine function; it lets
+        consumers (JSON extraction, file writers) work while text is still
+        arriving. Errors are handled like ask_ai.
+        """
+        parts: List[str] = []
+        try:
+            async for text in self.stream_ai(prompt, image_path):
+                parts.append(text)
+                if on_chunk is not None:
+                    pending = on_chunk(text)
+                    if inspect.isawaitable(pending):
+                        await pending
+            return "".join(parts)
+        except RetryExhaustedError as e:
+            # stream_ai already dropped the image handle; only count the error
+            self._failed(e, [])
+            raise
         except Exception as e:
+            self._failed(e, [])
             print(f"Error communicating with Gemini: {e}")
             return None
 
-    def get_history(self):
-        return self.conversation_history
+    def get_history(self) -> List[Dict[str, str]]:
+        return list(self.conversation_history)
@@ -0,0 +1,48 @@
+# modules/article_context.py
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+def usable(outputs: Optional[Dict[str, Any]]) -> bool:
+    """True for results worth reusing: combined content without an "error"."""
+    if outputs is None:
+        return False
+    content = outputs.get("combined_content")
+    return content is not None and not (
+        isinstance(content, dict) and "error" in content
+    )
+
+
+@dataclass(slots=True)
+class ArticleContext:
+    """Per-article state passed through the pipeline stages."""
+
+    image_path: str
+    xml_path: str
+    image_name: str
+    response_template: str
+    output_path: str
+    raw_image_text: Optional[str] = None
+    xml_metadata: Optional[Dict[str, Any]] = None
+    combined_content: Optional[Dict[str, Any]] = None
+    html_content: Optional[str] = None
+    output_files: List[str] = field(default_factory=list)
+    fingerprint: Optional[Dict[str, str]] = None
+    # Set when the results were copied from an earlier scan of the same article
+    duplicate_of: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the extracted results in the shape expected by DataSaver."""
+        data = {
+            "raw_image_text": self.raw_image_text,
+            "xml_metadata": self.xml_metadata,
+            "combined_content": self.combined_content,
+            "html_content": self.html_content,
+        }
+        if self.duplicate_of is not None:
+            data["duplicate_of"] = self.duplicate_of
+        return data
+
+    def result(self) -> Dict[str, Any]:
+        """Return the extracted results together with the written file paths."""
+        return {**self.to_dict(), "output_files": self.output_files}
@@ -2,45 +2,181 @@ import asyncio
 from functools import partial
 import json
 import os
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    OUTPUT_BACKEND,
+    OUTPUT_FULL_JSON,
+    OUTPUT_SEGMENT_MB,
+    OUTPUT_SYNC_BATCH,
+)
+from modules.output_store import OUTPUT_BACKENDS, make_record, open_store
+from modules.request_batcher import RequestBatcher
+from modules.runtime import Runtime, get_default_runtime
+
+
+# File name suffix of each output, keyed by the ArticleContext field it holds
+OUTPUT_SUFFIXES = {
+    "raw_image_text": "_raw.txt",
+    "xml_metadata": "_xml_metadata.json",
+    "html_content": ".html",
+    "combined_content": "_combined_content.json",
+    "full": "_full.json",
+    "duplicate_of": "_duplicate_of.json",
+}
+
+
+class StreamingTextWriter:
+    """Writes text to a temporary file as it arrives, then atomically publishes it."""
+
+    def __init__(self, runtime: Runtime, filepath: str, buffer_chars: int = 65536):
+        self.runtime = runtime
+        self.filepath = filepath
+        self.tmp_path = f"{filepath}.tmp"
+        self.buffer_chars = buffer_chars
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._file = None
+
+    def _flush(self, text: str):
+        """Append buffered text - runs in executor."""
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+            self._file = open(self.tmp_path, "w", encoding="utf-8")
+        self._file.write(text)
+
+    async def _drain(self):
+        text, self._buffer, self._buffered = "".join(self._buffer), [], 0
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.runtime.executor, self._flush, text)
+
+    async def write(self, text: str):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_chars:
+            await self._drain()
+
+    def _publish(self):
+        self._file.close()
+        os.replace(self.tmp_path, self.filepath)
+
+    async def commit(self) -> str:
+        """Flush the remaining text and move the file into place."""
+        await self._drain()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.runtime.executor, self._publish)
+        return self.filepath
+
+    def abort(self):
+        """Discard a partially written file."""
+        if self._file is not None:
+            self._file.close()
+            os.remove(self.tmp_path)
+            self._file = None
 
 
 class DataSaver:
+    def __init__(
+        self,
+        runtime: Optional[Runtime] = None,
+        backend: str = OUTPUT_BACKEND,
+        write_full: bool = OUTPUT_FULL_JSON,
+        store_prefix: str = "outputs",
+    ):
+        """
+        Initialize the saver.
+
+        Args:
+            runtime: Shared runtime whose executor runs the blocking writes
+            backend: "files" for one file per output, or a store backend
+                ("jsonl", "gzip", "sqlite") holding one record per article
+            write_full: Also write the redundant _full.json ("files" only)
+            store_prefix: Segment name prefix, unique per writing process
+        """
+        if backend not in OUTPUT_BACKENDS:
+            raise ValueError(f"Unknown output backend '{backend}'")
+        self.runtime = runtime or get_default_runtime()
+        self.backend = backend
+        self.write_full = write_full
+        self.store_prefix = store_prefix
+        # One store and group-commit batcher per output folder
+        self._stores: Dict[str, Tuple[Any, RequestBatcher]] = {}
+        self._opening = asyncio.Lock()
+
+    @property
+    def uses_store(self) -> bool:
+        return self.backend != "files"
+
+    @staticmethod
+    def output_file(output_dir: str, filename: str, field: str) -> str:
+        """Path of the output file holding `field` for an article."""
+        return os.path.join(output_dir, f"{filename}{OUTPUT_SUFFIXES[field]}")
+
+    def open_text_stream(self, filepath: str) -> StreamingTextWriter:
+        """Writer for text that is produced incrementally (e.g. a streamed response)."""
+        return StreamingTextWriter(self.runtime, filepath)
+
     async def _save_json(self, filepath, data):
         """Save JSON data asynchronously."""
         loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: self._write_json(filepath, data))
+        await loop.run_in_executor(
+            self.runtime.executor, lambda: self._write_json(filepath, data)
+        )
+        return filepath
 
     def _write_json(self, filepath, data):
         """Helper method to write JSON - runs in executor."""
-        with open(filepath, "w", encoding="utf-8") as f:
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2)
+        # Atomic rename so an interrupted run never leaves a half-written file
+        os.replace(tmp_path, filepath)
 
     async def _save_text(self, filepath, text):
         """Save text data asynchronously."""
         loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: self._write_text(filepath, text))
+        await loop.run_in_executor(
+            self.runtime.executor, lambda: self._write_text(filepath, text)
+        )
+        return filepath
 
     def _write_text(self, filepath, text):
         """Helper method to write text - runs in executor."""
-        with open(filepath, "w", encoding="utf-8") as f:
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             f.write(text)
+        os.replace(tmp_path, filepath)
 
     async def save_processed_data(
-        self, output_dir: str, extracted_data: Dict[str, Any], filename: str
-    ):
-        """Save all processing results to files."""
+        self,
+        output_dir: str,
+        extracted_data: Dict[str, Any],
+        filename: str,
+        written: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Save all processing results to files and return the written paths.
+
+        Paths in `written` were already streamed to disk and are not rewritten.
+        """
+        written = list(written or [])
+        if self.uses_store:
+            return written + [
+                await self._store_record(output_dir, filename, extracted_data)
+            ]
+
         # Create directory
         loop = asyncio.get_event_loop()
         await loop.run_in_executor(
-            None, partial(os.makedirs, output_dir, exist_ok=True)
+            self.runtime.executor, partial(os.makedirs, output_dir, exist_ok=True)
         )
 
         save_tasks = []
 
         # Save RAW text
-        if extracted_data["raw_image_text"]:
-            structured_content_path = os.path.join(output_dir, f"{filename}_raw.txt")
+        structured_content_path = self.output_file(
+            output_dir, filename, "raw_image_text"
+        )
+        if extracted_data["raw_image_text"] and structured_content_path not in written:
             save_tasks.append(
                 self._save_text(
                     structured_content_path, extracted_data["raw_image_text"]
@@ -49,24 +185,22 @@ class DataSaver:
 
         # Save XML content
         if extracted_data["xml_metadata"]:
-            xml_metadata_path = os.path.join(
-                output_dir, f"{filename}_xml_metadata.json"
-            )
+            xml_metadata_path = self.output_file(output_dir, filename, "xml_metadata")
             save_tasks.append(
                 self._save_json(xml_metadata_path, extracted_data["xml_metadata"])
             )
 
         # Save HTML content
-        if extracted_data["html_content"]:
-            html_path = os.path.join(output_dir, f"{filename}.html")
+        html_path = self.output_file(output_dir, filename, "html_content")
+        if extracted_data["html_content"] and html_path not in written:
             save_tasks.append(
                 self._save_text(html_path, extracted_data["html_content"])
             )
 
         # Save combined content
         if extracted_data["combined_content"]:
-            combined_content__path = os.path.join(
-                output_dir, f"{filename}_combined_content.json"
+            combined_content__path = self.output_file(
+                output_dir, filename, "combined_content"
             )
             save_tasks.append(
                 self._save_json(
@@ -74,17 +208,74 @@ class DataSaver:
                 )
             )
 
+        # Link to the canonical article the results were copied from
+        if extracted_data.get("duplicate_of"):
+            save_tasks.append(
+                self._save_json(
+                    self.output_file(output_dir, filename, "duplicate_of"),
+                    extracted_data["duplicate_of"],
+                )
+            )
+
         # Save full processing data
-        full_data_path = os.path.join(output_dir, f"{filename}_full.json")
-        # Filter out any non-serializable data
-        serializable_data = {}
-        for key, value in extracted_data.items():
-            if isinstance(value, (dict, list, str, int, float, bool, type(None))):
-                serializable_data[key] = value
+        if self.write_full:
+            full_data_path = self.output_file(output_dir, filename, "full")
+            # Filter out any non-serializable data
+            serializable_data = {}
+            for key, value in extracted_data.items():
+                if isinstance(value, (dict, list, str, int, float, bool, type(None))):
+                    serializable_data[key] = value
 
-        save_tasks.append(self._save_json(full_data_path, serializable_data))
+            save_tasks.append(self._save_json(full_data_path, serializable_data))
 
         # Wait for all save operations to complete
-        await asyncio.gather(*save_tasks)
+        return written + list(await asyncio.gather(*save_tasks))
+
+    async def _store_record(
+        self, output_dir: str, filename: str, extracted_data: Dict[str, Any]
+    ) -> str:
+        """Append the article to the output folder's store once it is durable."""
+        entry = self._stores.get(output_dir)
+        if entry is None:
+            # Concurrent first saves wait for a single open, then batch together
+            async with self._opening:
+                entry = self._stores.get(output_dir)
+                if entry is None:
+                    loop = asyncio.get_running_loop()
+                    store = await loop.run_in_executor(
+                        self.runtime.executor,
+                        partial(
+                            open_store,
+                            self.backend,
+                            output_dir,
+                            self.store_prefix,
+                            OUTPUT_SEGMENT_MB << 20,
+                        ),
+                    )
+                    batcher = RequestBatcher(
+                        partial(self._write_batch, store),
+                        OUTPUT_SYNC_BATCH,
+                        # Records saved during an fsync share the next one
+                        eager=True,
+                    )
+                    entry = self._stores[output_dir] = (store, batcher)
+        return await entry[1].submit(make_record(filename, extracted_data))
+
+    async def _write_batch(
+        self, store: Any, records: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Write a group of records with a single fsync (or transaction)."""
+        metrics = self.runtime.metrics
+        metrics.incr("output_batches_total", backend=self.backend)
+        metrics.incr("output_records_total", len(records), backend=self.backend)
+        loop = asyncio.get_running_loop()
+        with metrics.span("output_sync_seconds", backend=self.backend):
+            return await loop.run_in_executor(
+                self.runtime.executor, store.write_batch, records
+            )
 
-        return f"Results saved to {output_dir}"
+    def close(self):
+        """Close the stores opened by this saver."""
+        for store, _ in self._stores.values():
+            store.close()
+        self._stores.clear()
@@ -0,0 +1,354 @@
+# modules/dedup.py
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    DEDUP_INDEX_PATH,
+    DEDUP_MATCH_XML,
+    DEDUP_MAX_DISTANCE,
+    DEDUP_WAIT,
+)
+from modules.article_context import usable
+from modules.image_preprocessor import HAS_PILLOW
+from modules.metrics import Metrics
+from modules.output_store import OutputReader
+from modules.response_cache import hash_file
+
+# Outputs copied from the canonical article to its duplicates
+REUSED_FIELDS = ("raw_image_text", "combined_content", "html_content")
+
+
+def dhash(image_path: str, size: int = 8) -> int:
+    """
+    64-bit difference hash of an image - runs in the executor.
+
+    The image is shrunk to (size + 1) x size grayscale pixels and each bit
+    records whether a pixel is brighter than its right neighbour, so rescans
+    at another resolution or with slightly different crops or exposure
+    differ in only a few bits.
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        # Lets the JPEG decoder skip most of the work for large scans
+        image.draft("L", (size * 16, size * 16))
+        pixels = image.convert("L").resize((size + 1, size)).tobytes()
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            bits = (bits << 1) | (left > pixels[row * (size + 1) + col + 1])
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.casefold().split())
+    if isinstance(value, dict):
+        normalized = {k: _normalize(v) for k, v in value.items()}
+        return {k: v for k, v in normalized.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def xml_fingerprint(metadata: Any) -> str:
+    """Hash of the parsed XML metadata, ignoring case, spacing and empty fields.
+
+    Missing, unparsable or empty metadata gives "" (no XML evidence).
+    """
+    normalized = _normalize(metadata or {})
+    if normalized in (None, "", [], {}):
+        return ""
+    canonical = json.dumps(normalized, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes under the Hamming distance.
+
+    A lookup within a small distance only visits the branches whose edge
+    distance can still lead to a match, instead of comparing every entry.
+    """
+
+    def __init__(self):
+        # Node: [hash, names, {distance: child node}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, key: int, name: str):
+        self.size += 1
+        if self._root is None:
+            self._root = [key, [name], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(name)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [name], {}]
+                return
+            node = child
+
+    def search(self, key: int, max_distance: int) -> List[Tuple[int, str]]:
+        """(distance, name) of every entry within `max_distance`, nearest first."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance:
+                found.extend((distance, name) for name in node[1])
+            # Triangle inequality: matches can only sit under these edges
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(found)
+
+
+class DedupIndex:
+    """Finds earlier scans of the same clipping so their results can be reused.
+
+    Each processed (canonical) article is indexed by a perceptual hash of its
+    image and a fingerprint of its normalized XML metadata. A new article is a
+    duplicate when an indexed image is within `max_distance` bits and, with
+    `match_xml`, the metadata fingerprints are equal. Without Pillow, images
+    are compared by content hash (exact copies only).
+
+    The index is kept in SQLite and loaded at start-up; articles being
+    processed in this process are matched too, their duplicates waiting for
+    the canonical results.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEDUP_INDEX_PATH,
+        version: str = "",
+        max_distance: int = DEDUP_MAX_DISTANCE,
+        match_xml: bool = DEDUP_MATCH_XML,
+        wait: float = DEDUP_WAIT,
+        executor: Optional[Executor] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        """
+        Initialize the index.
+
+        Args:
+            path: SQLite file holding the index; None keeps it in memory only
+            version: Pipeline version; canonicals from other versions are ignored
+            max_distance: Largest Hamming distance between duplicate image hashes
+            match_xml: Also require identical normalized XML metadata
+            wait: Seconds a duplicate waits for an in-flight canonical
+            executor: Thread pool for hashing and index I/O (None: the loop's default)
+            metrics: Registry counting hits and misses
+        """
+        self.version = version
+        self.max_distance = max_distance
+        self.match_xml = match_xml
+        self.wait = wait
+        self.executor = executor
+        self.metrics = metrics
+        # name -> (image key, xml fingerprint, output folder)
+        self._entries: Dict[str, Tuple[str, str, str]] = {}
+        self._tree = BKTree()
+        self._exact: Dict[str, List[str]] = {}
+        # Canonicals still being processed -> their outputs once saved
+        self._pending: Dict[str, asyncio.Future] = {}
+        # One reader per output folder, so store segments are indexed once
+        self._readers: Dict[str, OutputReader] = {}
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db: Optional[sqlite3.Connection] = sqlite3.connect(
+            path or ":memory:", check_same_thread=False, timeout=30
+        )
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS canonicals ("
+            "name TEXT PRIMARY KEY, image_key TEXT NOT NULL, xml_hash TEXT NOT NULL, "
+            "output_dir TEXT NOT NULL, version TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT name, image_key, xml_hash, output_dir FROM canonicals "
+            "WHERE version = ?",
+            (version,),
+        )
+        for name, image_key, xml_hash, output_dir in rows:
+            self._add(name, image_key, xml_hash, output_dir)
+
+    def image_key(self, image_path: str, xml_hash: Optional[str] = None) -> str:
+        """
+        Key an image is matched by.
+
+        Args:
+            image_path: The article's image
+            xml_hash: Its xml_fingerprint(); with `match_xml` an empty one means
+                there is no XML evidence, so only byte-identical images match
+
+        Returns:
+            Perceptual hash ("d:<hex>"), or content hash ("s:<hex>") without
+            Pillow or XML evidence
+        """
+        exact = self.match_xml and xml_hash == ""
+        if HAS_PILLOW and not exact:
+            try:
+                return f"d:{dhash(image_path):016x}"
+            except Exception:
+                # Not readable by Pillow; only exact copies can match
+                pass
+        return f"s:{hash_file(image_path)}"
+
+    def _add(self, name: str, image_key: str, xml_hash: str, output_dir: str):
+        self._entries[name] = (image_key, xml_hash, output_dir)
+        if image_key.startswith("d:"):
+            self._tree.add(int(image_key[2:], 16), name)
+        else:
+            self._exact.setdefault(image_key, []).append(name)
+
+    def candidates(
+        self, name: str, image_key: str, xml_hash: str
+    ) -> List[Tuple[int, str]]:
+        """(distance, name) of the indexed articles this one duplicates, nearest first."""
+        if image_key.startswith("d:"):
+            found = self._tree.search(int(image_key[2:], 16), self.max_distance)
+        else:
+            found = [(0, other) for other in self._exact.get(image_key, [])]
+        matches, seen = [], {name}
+        for distance, other in found:
+            entry = self._entries.get(other)
+            if other in seen or entry is None:
+                continue
+            seen.add(other)
+            # The tree keeps entries of articles since re-indexed under another image
+            if image_key.startswith("d:"):
+                if not entry[0].startswith("d:") or (
+                    hamming(int(entry[0][2:], 16), int(image_key[2:], 16)) != distance
+                ):
+                    continue
+            elif entry[0] != image_key:
+                continue
+            if self.match_xml and entry[1] != xml_hash:
+                continue
+            matches.append((distance, other))
+        return matches
+
+    def _read_outputs(self, name: str, output_dir: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            reader = self._readers.get(output_dir)
+            if reader is None:
+                reader = self._readers[output_dir] = OutputReader(output_dir)
+        record = reader.get(name)
+        if not usable(record):
+            return None
+        return {field: record.get(field) for field in REUSED_FIELDS}
+
+    def _forget(self, name: str):
+        self._entries.pop(name, None)
+        with self._lock:
+            assert self._db is not None
+            self._db.execute("DELETE FROM canonicals WHERE name = ?", (name,))
+            self._db.commit()
+
+    async def match(
+        self, name: str, image_key: str, xml_hash: str, output_dir: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find the canonical article an article duplicates.
+
+        Args:
+            name: Article name
+            image_key: Result of image_key() for its image
+            xml_hash: Result of xml_fingerprint() for its metadata
+            output_dir: Folder the article's outputs are saved to
+
+        Returns:
+            {"name", "distance", "outputs"} of the canonical article, or None;
+            the article then becomes a canonical itself and must be
+            published() once saved, or released() if it fails
+        """
+        loop = asyncio.get_running_loop()
+        for distance, other in self.candidates(name, image_key, xml_hash):
+            pending = self._pending.get(other)
+            if pending is not None:
+                try:
+                    outputs = await asyncio.wait_for(asyncio.shield(pending), self.wait)
+                except asyncio.TimeoutError:
+                    outputs = None
+                source = "inflight"
+            else:
+                outputs = await loop.run_in_executor(
+                    self.executor, self._read_outputs, other, self._entries[other][2]
+                )
+                if outputs is None:
+                    # The canonical's outputs are gone (e.g. a cleaned output folder)
+                    await loop.run_in_executor(self.executor, self._forget, other)
+                source = "index"
+            if outputs is not None:
+                if self.metrics is not None:
+                    self.metrics.incr("dedup_hits_total", source=source)
+                    self.metrics.observe("dedup_distance", distance)
+                return {"name": other, "distance": distance, "outputs": outputs}
+
+        if self.metrics is not None:
+            self.metrics.incr("dedup_misses_total")
+        self._add(name, image_key, xml_hash, output_dir)
+        self._pending[name] = loop.create_future()
+        return None
+
+    def _persist(self, name: str):
+        image_key, xml_hash, output_dir = self._entries[name]
+        with self._lock:
+            assert self._db is not None
+            self._db.execute(
+                "INSERT OR REPLACE INTO canonicals VALUES (?, ?, ?, ?, ?, ?)",
+                (name, image_key, xml_hash, output_dir, self.version, time.time()),
+            )
+            self._db.commit()
+
+    async def publish(self, name: str, outputs: Dict[str, Any]):
+        """Record a saved canonical and hand its outputs to waiting duplicates.
+
+        A canonical whose combine step failed is released instead, so its
+        duplicates are processed on their own rather than reusing the error.
+        """
+        if not usable(outputs):
+            self.release(name)
+            return
+        pending = self._pending.pop(name, None)
+        if pending is None:
+            return
+        if not pending.done():
+            pending.set_result({field: outputs.get(field) for field in REUSED_FIELDS})
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._persist, name)
+
+    def release(self, name: str):
+        """Withdraw a canonical that failed; its duplicates are processed normally."""
+        pending = self._pending.pop(name, None)
+        if pending is None:
+            return
+        if not pending.done():
+            pending.set_result(None)
+        self._entries.pop(name, None)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,239 @@
+# modules/discovery.py
+import fnmatch
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import INPUT_INDEX_PATH
+from modules.response_cache import hash_file
+from modules.work_queue import ArticleJob
+
+# Scans Gemini accepts; when several share a stem the first listed wins
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+# Separates the directories of a nested article's name ("1920/03/page" ->
+# "1920__03__page"), so every article keeps a flat output file name. A name
+# containing the separator can still collide ("a__b.png" and "a/b.png"), so
+# discover() skips any article whose name was already taken
+NAME_SEPARATOR = "__"
+
+# A directory modified this recently may still change within the same mtime
+# tick, so its listing is not cached yet
+_SETTLE_SECONDS = 2.0
+
+
+class InputIndex:
+    """On-disk index of the input tree: directory listings and file hashes.
+
+    A directory's listing is reused while its mtime is unchanged (adding,
+    removing or renaming an entry updates it), so an unchanged tree is walked
+    with one stat per directory instead of a scandir. File hashes are reused
+    while a file's size and mtime are unchanged.
+    """
+
+    def __init__(self, path: Optional[str] = INPUT_INDEX_PATH):
+        """
+        Initialize the index.
+
+        Args:
+            path: SQLite file holding the index; None keeps it in memory only
+        """
+        self.stats: Dict[str, int] = {
+            "listed": 0,
+            "reused": 0,
+            "hashed": 0,
+            "hash_reused": 0,
+        }
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db: Optional[sqlite3.Connection] = sqlite3.connect(
+            path or ":memory:",
+            check_same_thread=False,
+            # Shard processes share the index; wait out their writes
+            timeout=30,
+        )
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, "
+            "subdirs TEXT NOT NULL, files TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def listing(
+        self, path: str, mtime_ns: int
+    ) -> Optional[Tuple[List[str], List[str]]]:
+        """Cached (subdirectories, files) of a directory that has not changed."""
+        with self._lock:
+            assert self._db is not None
+            row = self._db.execute(
+                "SELECT mtime_ns, subdirs, files FROM dirs WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None or row[0] != mtime_ns:
+            return None
+        self.stats["reused"] += 1
+        return json.loads(row[1]), json.loads(row[2])
+
+    def store_listing(
+        self, path: str, mtime_ns: int, subdirs: List[str], files: List[str]
+    ):
+        with self._lock:
+            assert self._db is not None
+            self._db.execute(
+                "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                (path, mtime_ns, json.dumps(subdirs), json.dumps(files)),
+            )
+            self._db.commit()
+
+    def hash_file(self, path: str) -> str:
+        """SHA-256 of a file, recomputed only when its size or mtime changed."""
+        stat = os.stat(path)
+        with self._lock:
+            assert self._db is not None
+            row = self._db.execute(
+                "SELECT size, mtime_ns, hash FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            self.stats["hash_reused"] += 1
+            return row[2]
+
+        digest = hash_file(path)
+        self.stats["hashed"] += 1
+        with self._lock:
+            assert self._db is not None
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest),
+            )
+            self._db.commit()
+        return digest
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _list_directory(
+    directory: str, index: Optional[InputIndex]
+) -> Tuple[List[str], List[str]]:
+    """Sorted (subdirectories, files) of a directory, hidden entries excluded."""
+    stat = os.stat(directory)
+    if index is not None:
+        cached = index.listing(directory, stat.st_mtime_ns)
+        if cached is not None:
+            return cached
+
+    subdirs: List[str] = []
+    files: List[str] = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                subdirs.append(entry.name)
+            elif entry.is_file():
+                files.append(entry.name)
+    subdirs.sort()
+    files.sort()
+
+    if index is not None:
+        index.stats["listed"] += 1
+        if time.time() - stat.st_mtime > _SETTLE_SECONDS:
+            index.store_listing(directory, stat.st_mtime_ns, subdirs, files)
+    return subdirs, files
+
+
+def _selected(path: str, include: Sequence[str], exclude: Sequence[str]) -> bool:
+    if include and not any(fnmatch.fnmatch(path, p) for p in include):
+        return False
+    return not any(fnmatch.fnmatch(path, p) for p in exclude)
+
+
+def discover(
+    root: str,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    index: Optional[InputIndex] = None,
+    recursive: bool = True,
+) -> Iterator[ArticleJob]:
+    """
+    Lazily yield the (image, xml) pairs under `root`.
+
+    Images and XML files are paired by stem within each directory in one
+    pass. Directories are walked depth first in name order, so the job order
+    is the same on every run and every machine.
+
+    Args:
+        root: Top of the input tree
+        include: Glob patterns; when given, only images whose path relative
+            to `root` (with "/" separators) matches one of them are kept
+        exclude: Glob patterns of relative image paths to skip
+        index: Input index reused to skip listing unchanged directories
+        recursive: Also walk subdirectories
+
+    Returns:
+        Iterator of jobs, named after their relative path without extension
+    """
+    orphans = 0
+    # Job name -> relative image path, to catch names that flatten alike
+    names: Dict[str, str] = {}
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        directory = os.path.join(root, relative) if relative else root
+        subdirs, files = _list_directory(directory, index)
+
+        images: Dict[str, str] = {}
+        # Stem -> the XML file's real name, whatever its extension's case
+        xml_files: Dict[str, str] = {}
+        for filename in files:
+            stem, extension = os.path.splitext(filename)
+            extension = extension.lower()
+            if extension in IMAGE_EXTENSIONS:
+                images.setdefault(stem, filename)
+            elif extension == ".xml":
+                xml_files.setdefault(stem, filename)
+
+        for stem, filename in sorted(images.items()):
+            relative_path = f"{relative}/{filename}" if relative else filename
+            if not _selected(relative_path, include, exclude):
+                continue
+            xml_filename = xml_files.get(stem)
+            if xml_filename is None:
+                orphans += 1
+                continue
+            name = (f"{relative}/{stem}" if relative else stem).replace(
+                "/", NAME_SEPARATOR
+            )
+            if name in names:
+                print(
+                    f"Skipped '{relative_path}': its output name '{name}' is "
+                    f"already used by '{names[name]}'"
+                )
+                continue
+            names[name] = relative_path
+            yield ArticleJob(
+                name,
+                os.path.join(directory, filename),
+                os.path.join(directory, xml_filename),
+            )
+
+        if recursive:
+            # Reversed, so the stack pops subdirectories in name order
+            for subdir in reversed(subdirs):
+                pending.append(f"{relative}/{subdir}" if relative else subdir)
+
+    if orphans:
+        print(f"Skipped {orphans} image(s) without an associated XML file")
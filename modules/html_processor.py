@@ -1,24 +1,205 @@
-from typing import Optional
+import json
+from html import escape
+from string import Template
+from typing import Any, Dict, Iterator, List, Optional
+
 from modules.ai_processor import AIProcessor
 from modules.prompt_manager import PromptManager
 
+# Bump when the local renderer's markup changes so incremental runs re-render
+HTML_RENDER_VERSION = "1"
+
+_PAGE_HEAD = Template(
+    """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+${author_meta}</head>
+<body>
+<article>
+"""
+)
+
+_PAGE_TAIL = "</article>\n</body>\n</html>\n"
+
+
+def slice_page(response: str) -> str:
+    """The page in a response: from the first "<html" to the last "</html>".
+
+    A response without "<html" is returned whole; one whose page is never
+    closed is kept from "<html" to its end.
+    """
+    start = response.find("<html")
+    if start < 0:
+        return response
+    end = response.rfind("</html>")
+    if end < start:
+        return response[start:]
+    return response[start : end + len("</html>")]
+
+
+class HTMLStreamSlicer:
+    """Incremental form of slice_page().
+
+    feed() returns the part of the page that is final after each chunk, so
+    a streamed response can be written out while it is still arriving. Text
+    after a "</html>" is held back until another "</html>" follows it or the
+    stream ends, when it is dropped.
+    """
+
+    _START = "<html"
+    _END = "</html>"
 
-class HTMLProcessor:
     def __init__(self):
+        self._pending = ""
+        self._parts: List[str] = []
+        self._page: List[str] = []
+        self._started = False
+        self._closed = False
+
+    def feed(self, chunk: str) -> str:
+        self._parts.append(chunk)
+        self._pending += chunk
+        if not self._started:
+            start = self._pending.find(self._START)
+            if start < 0:
+                # Keep just enough to catch a marker split across chunks
+                self._pending = self._pending[-(len(self._START) - 1) :]
+                return ""
+            self._started = True
+            self._pending = self._pending[start:]
+
+        end = self._pending.rfind(self._END)
+        if end >= 0:
+            self._closed = True
+            end += len(self._END)
+            ready, self._pending = self._pending[:end], self._pending[end:]
+        elif self._closed:
+            ready = ""
+        else:
+            keep = len(self._END) - 1
+            ready, self._pending = self._pending[:-keep], self._pending[-keep:]
+        self._page.append(ready)
+        return ready
+
+    def finish(self) -> str:
+        """Text still to be written once the stream ends."""
+        if not self._started:
+            # No page found: like slice_page, fall back to the whole response
+            rest = "".join(self._parts)
+        elif self._closed:
+            # Trailing text after the last </html> is not part of the page
+            rest, self._pending = "", ""
+        else:
+            rest, self._pending = self._pending, ""
+        self._page.append(rest)
+        return rest
+
+    def page(self) -> str:
+        """Everything returned by feed() and finish() so far."""
+        return "".join(self._page)
+
+
+class HTMLProcessor:
+    def __init__(self, ai_processor: Optional[AIProcessor] = None):
         self.prompt = PromptManager()
-        self.ai_processor = AIProcessor()
+        self.ai_processor = ai_processor or AIProcessor()
 
     def generate_html(self, result: Optional[str] = None) -> Optional[str]:
         """Generate HTML representation of the article."""
         if not result:
             return "Error: Missing structured result. Run structure_content step first."
         else:
-            # Try to extract HTML from response
-            html_start = result.find("<html")
-            html_end = result.rfind("</html>") + 7
-
-            if html_start >= 0 and html_end > html_start:
-                html_code = result[html_start:html_end]
-                return html_code
-            else:
-                return result  # Return the full response if we couldn't extract HTML
+            # Same slicing as a streamed response gets
+            return slice_page(result)
+
+    @staticmethod
+    def can_render(structured_content: Optional[Dict[str, Any]]) -> bool:
+        """True when the content has the fields the local renderer lays out."""
+        return (
+            isinstance(structured_content, dict)
+            and "error" not in structured_content
+            and bool(
+                structured_content.get("title") or structured_content.get("content")
+            )
+        )
+
+    def iter_html(
+        self, structured_content: Optional[Dict[str, Any]], chunk_size: int = 65536
+    ) -> Iterator[str]:
+        """
+        Render structured article JSON as semantic HTML5, yielding it in chunks.
+
+        Output depends only on the input, so re-rendering an article is
+        reproducible byte for byte.
+
+        Args:
+            structured_content: Dict following RESPONSE_STRUCTURE
+                (title/author/content, optionally a metadata section)
+            chunk_size: Approximate number of characters per yielded chunk
+
+        Returns:
+            Iterator over the page's text
+        """
+        buffer: List[str] = []
+        size = 0
+        for piece in self._render(structured_content or {}):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+
+    def render_html(self, structured_content: Optional[Dict[str, Any]]) -> str:
+        """Render structured article JSON as a complete HTML5 page string."""
+        return "".join(self.iter_html(structured_content))
+
+    def _render(self, content: Dict[str, Any]) -> Iterator[str]:
+        title = escape(str(content.get("title") or "Untitled article"))
+        author = escape(str(content.get("author") or ""))
+
+        yield _PAGE_HEAD.substitute(
+            title=title,
+            author_meta=f'<meta name="author" content="{author}">\n' if author else "",
+        )
+        yield f"<header>\n<h1>{title}</h1>\n"
+        if author:
+            yield f'<p class="author">{author}</p>\n'
+        yield "</header>\n"
+
+        yield from self._render_blocks(content.get("content"), level=2)
+
+        metadata = content.get("metadata")
+        if isinstance(metadata, dict) and metadata:
+            yield "<footer>\n<dl>\n"
+            for key, value in metadata.items():
+                if not isinstance(value, str):
+                    value = json.dumps(value, ensure_ascii=False)
+                yield f"<dt>{escape(str(key))}</dt><dd>{escape(value)}</dd>\n"
+            yield "</dl>\n</footer>\n"
+
+        yield _PAGE_TAIL
+
+    def _render_blocks(self, blocks: Any, level: int) -> Iterator[str]:
+        """Paragraph strings become <p>; {heading, content} dicts become sections."""
+        if blocks is None:
+            return
+        if isinstance(blocks, (str, dict)):
+            blocks = [blocks]
+        for block in blocks:
+            if isinstance(block, dict):
+                heading = block.get("heading") or block.get("title")
+                body = block.get("content", block.get("paragraphs", block.get("text")))
+                yield "<section>\n"
+                if heading:
+                    tag = f"h{min(level, 6)}"
+                    yield f"<{tag}>{escape(str(heading))}</{tag}>\n"
+                yield from self._render_blocks(body, level + 1)
+                yield "</section>\n"
+            elif isinstance(block, list):
+                yield from self._render_blocks(block, level)
+            elif block:
+                yield f"<p>{escape(str(block))}</p>\n"
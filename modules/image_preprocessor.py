@@ -0,0 +1,263 @@
+# modules/image_preprocessor.py
+import asyncio
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional
+
+from config import (
+    IMAGE_CACHE_FOLDER,
+    IMAGE_FORMAT,
+    IMAGE_GRAYSCALE,
+    IMAGE_MAX_SIDE,
+    IMAGE_PREPROCESS,
+    IMAGE_PREPROCESS_WORKERS,
+    IMAGE_QUALITY,
+    IMAGE_SOURCE_DPI,
+    IMAGE_TARGET_DPI,
+    IMAGE_TILE_HEIGHT,
+    IMAGE_TILE_OVERLAP,
+)
+from modules.metrics import Metrics
+
+# Optional dependency (pip install "genai-article-processor[images]"); it is
+# imported where images are decoded, so runs that never do skip its import cost
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+# Bump when preprocess_image changes its output for the same options
+PREPROCESS_VERSION = "1"
+
+_EXTENSIONS = {"webp": "webp", "jpeg": "jpg", "png": "png"}
+
+
+def preprocess_image(source: str, prefix: str, options: Dict[str, Any]) -> List[str]:
+    """
+    Shrink one scan for OCR - runs in a worker process.
+
+    Args:
+        source: Original image file
+        prefix: Output path without the "-<tile>.<ext>" suffix
+        options: Settings from ImagePreprocessor.options
+
+    Returns:
+        Paths of the re-encoded image, or of its tiles from top to bottom
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        dpi = float((opened.info.get("dpi") or (0,))[0] or options["source_dpi"])
+
+    # DPI-aware downscaling: OCR quality plateaus well below archive scan DPI
+    scale = 1.0
+    if dpi and options["target_dpi"] and dpi > options["target_dpi"]:
+        scale = options["target_dpi"] / dpi
+    if options["max_side"]:
+        scale = min(scale, options["max_side"] / max(image.size))
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    if options["grayscale"]:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    tiles = [image]
+    height, overlap = options["tile_height"], options["tile_overlap"]
+    if height and image.height > height * 1.5:
+        # Evenly sized overlapping bands no taller than `height`, so no line of
+        # text is only ever seen cut in half and there is no thin last sliver
+        overlap = min(overlap, height // 2)
+        count = math.ceil((image.height - overlap) / (height - overlap))
+        band = math.ceil((image.height + (count - 1) * overlap) / count)
+        tiles = [
+            image.crop((0, top, image.width, min(top + band, image.height)))
+            for top in range(0, count * (band - overlap), band - overlap)
+        ]
+
+    fmt = options["format"]
+    save_options: Dict[str, Any] = {"optimize": True}
+    if fmt in ("webp", "jpeg"):
+        save_options = {"quality": options["quality"]}
+        if fmt == "jpeg":
+            save_options["optimize"] = True
+
+    paths = []
+    for i, tile in enumerate(tiles):
+        path = f"{prefix}-{i}.{_EXTENSIONS[fmt]}"
+        tmp_path = f"{path}.tmp"
+        tile.save(tmp_path, format=fmt.upper(), **save_options)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+class ImagePreprocessor:
+    """Downscales, grayscales, re-encodes and tiles scans before upload.
+
+    Work runs in a process pool (Pillow holds the GIL for much of it) and the
+    output is cached on disk by source content hash and settings.
+    """
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        metrics: Optional[Metrics] = None,
+        enabled: bool = IMAGE_PREPROCESS,
+        cache_dir: str = IMAGE_CACHE_FOLDER,
+        workers: int = IMAGE_PREPROCESS_WORKERS,
+        target_dpi: int = IMAGE_TARGET_DPI,
+        source_dpi: int = IMAGE_SOURCE_DPI,
+        max_side: int = IMAGE_MAX_SIDE,
+        grayscale: bool = IMAGE_GRAYSCALE,
+        image_format: str = IMAGE_FORMAT,
+        quality: int = IMAGE_QUALITY,
+        tile_height: int = IMAGE_TILE_HEIGHT,
+        tile_overlap: int = IMAGE_TILE_OVERLAP,
+    ):
+        """
+        Initialize the preprocessor.
+
+        Args:
+            executor: Thread pool for the cache lookups (None: the loop's default)
+            metrics: Registry receiving byte counts and timings
+            enabled: Whether images are preprocessed at all; also requires Pillow
+            cache_dir: Folder holding the preprocessed images
+            workers: Worker processes (0 uses the CPU count)
+            target_dpi: Resolution scans are downscaled to
+            source_dpi: DPI assumed when the file records none (0: unknown)
+            max_side: Longest side in pixels after downscaling (0: unlimited)
+            grayscale: Convert to 8-bit grayscale
+            image_format: Output encoding: "webp", "jpeg" or "png"
+            quality: Lossy encoder quality (webp/jpeg)
+            tile_height: Tile height in pixels for very tall pages (0: never tile)
+            tile_overlap: Pixels shared by neighbouring tiles
+        """
+        if image_format not in _EXTENSIONS:
+            raise ValueError(f"Unknown image format '{image_format}'")
+        if enabled and not HAS_PILLOW:
+            print("IMAGE_PREPROCESS is set but Pillow is not installed; skipping it")
+        self.enabled = enabled and HAS_PILLOW
+        self.executor = executor
+        self.metrics = metrics
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.options = {
+            "target_dpi": target_dpi,
+            "source_dpi": source_dpi,
+            "max_side": max_side,
+            "grayscale": grayscale,
+            "format": image_format,
+            "quality": quality,
+            "tile_height": tile_height,
+            "tile_overlap": tile_overlap,
+        }
+        settings = json.dumps(
+            {**self.options, "version": PREPROCESS_VERSION}, sort_keys=True
+        )
+        # Identifies the settings in cache keys and the manifest version
+        self.signature = hashlib.sha256(settings.encode()).hexdigest()[:12]
+        self._pool: Optional[Executor] = None
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Spawned workers start clean instead of inheriting the parent's threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def cache_key(self, image_hash: str) -> str:
+        """Key of the preprocessed output of an image under the current settings."""
+        return f"{image_hash[:32]}-{self.signature}"
+
+    def _cached(self, index_path: str) -> Optional[List[str]]:
+        """Tile paths listed by a cache index, if they are all still on disk."""
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                paths = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if all(os.path.exists(path) for path in paths):
+            return paths
+        return None
+
+    def _remember(self, index_path: str, source: str, paths: List[str]):
+        """Write the cache index (last, so a listed tile always exists)."""
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(paths, f)
+        os.replace(tmp_path, index_path)
+        if self.metrics is not None:
+            self.metrics.incr(
+                "image_bytes_total", os.path.getsize(source), stage="source"
+            )
+            self.metrics.incr(
+                "image_bytes_total",
+                sum(os.path.getsize(path) for path in paths),
+                stage="processed",
+            )
+
+    async def prepare(self, image_path: str, image_hash: str) -> List[str]:
+        """
+        Return the image(s) to upload in place of `image_path`.
+
+        Args:
+            image_path: Original scan
+            image_hash: Content hash of the scan (keys the cache)
+
+        Returns:
+            Preprocessed image or tile paths; [image_path] when preprocessing
+            is disabled or the image could not be processed
+        """
+        if not self.enabled:
+            return [image_path]
+
+        loop = asyncio.get_running_loop()
+        key = self.cache_key(image_hash)
+        index_path = os.path.join(self.cache_dir, f"{key}.json")
+        paths = await loop.run_in_executor(self.executor, self._cached, index_path)
+        if paths is not None:
+            if self.metrics is not None:
+                self.metrics.incr("image_cache_hits_total")
+            return paths
+
+        start = time.perf_counter()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            paths = await loop.run_in_executor(
+                self.pool,
+                preprocess_image,
+                image_path,
+                os.path.join(self.cache_dir, key),
+                self.options,
+            )
+        except Exception as e:
+            # Unreadable for Pillow: upload the original and let Gemini try
+            if self.metrics is not None:
+                self.metrics.incr("image_preprocess_errors_total")
+            print(f"Could not preprocess {image_path}: {e}")
+            return [image_path]
+        if self.metrics is not None:
+            self.metrics.observe(
+                "image_preprocess_seconds", time.perf_counter() - start
+            )
+        await loop.run_in_executor(
+            self.executor, self._remember, index_path, image_path, paths
+        )
+        return paths
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,243 @@
+# modules/json_extractor.py
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    # Optional fast backend (pip install "genai-article-processor[fast]");
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+_FENCE = re.compile(r"```[a-zA-Z]*[ \t]*\n?(.*?)```", re.DOTALL)
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class ResponseSchema:
+    """Field names and types compiled once from a JSON response template."""
+
+    def __init__(self, template: str):
+        """
+        Compile the schema.
+
+        Args:
+            template: JSON template such as RESPONSE_STRUCTURE; the type of
+                each field's placeholder ("" / [] / {}) is the expected type
+        """
+        fields = json.loads(template) if template else {}
+        self.fields: Dict[str, type] = {
+            name: type(placeholder) for name, placeholder in fields.items()
+        }
+
+    def matches(self, value: Any) -> bool:
+        """True when `value` is an object carrying at least one template field."""
+        return isinstance(value, dict) and any(name in value for name in self.fields)
+
+    def coerce(self, value: Dict[str, Any]) -> Dict[str, Any]:
+        """Repair common type slips: absent fields become null, lists and
+        strings are converted into each other as the template expects."""
+        fixed = dict(value)
+        for name, expected in self.fields.items():
+            field = fixed.get(name)
+            if field is None:
+                fixed[name] = None
+            elif expected is list and isinstance(field, str):
+                fixed[name] = [p.strip() for p in field.split("\n\n") if p.strip()]
+            elif expected is str and isinstance(field, list):
+                fixed[name] = ", ".join(str(item) for item in field if item)
+            elif expected is str and not isinstance(field, str):
+                fixed[name] = str(field)
+        return fixed
+
+
+def strip_code_fences(text: str) -> str:
+    """Return the contents of ```json fences when the text has them."""
+    blocks = _FENCE.findall(text)
+    return "\n".join(blocks) if blocks else text
+
+
+def iter_objects(text: str) -> Iterator[str]:
+    """Yield every balanced top-level {...} span, ignoring braces inside strings."""
+    scanner = JSONStreamScanner()
+    yield from scanner.feed(text)
+
+
+def repair(candidate: str) -> str:
+    """Fix the mistakes models commonly make in otherwise valid JSON.
+
+    Outside strings: trailing commas and Python literals (True/False/None).
+    Inside strings: raw newlines/tabs, which JSON requires to be escaped.
+    """
+    out: List[str] = []
+    in_string = escaped = False
+    i = 0
+    while i < len(candidate):
+        char = candidate[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            elif char == "\t":
+                char = "\\t"
+            out.append(char)
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char == ",":
+            # Drop the comma when only whitespace separates it from } or ]
+            j = i + 1
+            while j < len(candidate) and candidate[j].isspace():
+                j += 1
+            if j >= len(candidate) or candidate[j] not in "}]":
+                out.append(char)
+        elif char.isalpha():
+            j = i
+            while j < len(candidate) and candidate[j].isalpha():
+                j += 1
+            word = candidate[i:j]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+class JSONStreamScanner:
+    """Incremental balanced-brace scanner.
+
+    Text can be fed chunk by chunk while a response is still streaming; each
+    top-level object is returned as soon as its closing brace arrives.
+    """
+
+    __slots__ = ("_buffer", "_depth", "_in_string", "_escaped")
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume a chunk and return the objects it completed."""
+        completed = []
+        start = 0 if self._depth else None
+        for i, char in enumerate(chunk):
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    start = i
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(chunk[start : i + 1])
+                    completed.append("".join(self._buffer))
+                    self._buffer = []
+                    start = None
+        if self._depth and start is not None:
+            self._buffer.append(chunk[start:])
+        return completed
+
+
+class JSONExtractor:
+    """Finds, repairs and validates the JSON object in a model response."""
+
+    def __init__(self, schema: Optional[ResponseSchema] = None):
+        self.schema = schema
+
+    def _parse(self, candidate: str) -> Optional[Any]:
+        try:
+            return _loads(candidate)
+        except json.JSONDecodeError:
+            pass
+        try:
+            return _loads(repair(candidate))
+        except json.JSONDecodeError:
+            return None
+
+    def choose(self, candidates: List[str]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Pick the best object among candidate spans.
+
+        Returns:
+            (object, found_any) where the object is the first one fitting the
+            schema (coerced), else the first that parsed; found_any tells
+            whether there was any {...} span at all
+        """
+        fallback = None
+        for candidate in candidates:
+            value = self._parse(candidate)
+            if not isinstance(value, dict):
+                continue
+            if self.schema is None:
+                return value, True
+            if self.schema.matches(value):
+                return self.schema.coerce(value), True
+            if fallback is None:
+                fallback = value
+        return fallback, bool(candidates)
+
+    def extract(self, text: str) -> Dict[str, Any]:
+        """Extract the response object, or an error dict like structure_json's."""
+        candidates = list(iter_objects(strip_code_fences(text)))
+        if not candidates and "```" in text:
+            # Unterminated fence: scan the raw text instead
+            candidates = list(iter_objects(text))
+
+        value, found = self.choose(candidates)
+        if value is not None:
+            return value
+        if not found:
+            return {
+                "error": "Could not extract JSON from response",
+                "raw_response": text,
+            }
+        return {"error": "Invalid JSON in response", "raw_response": text}
+
+    def stream(self) -> "StreamingJSONExtractor":
+        return StreamingJSONExtractor(self)
+
+
+class StreamingJSONExtractor:
+    """Parses objects while a response streams in, so parsing overlaps generation."""
+
+    def __init__(self, extractor: JSONExtractor):
+        self.extractor = extractor
+        self.scanner = JSONStreamScanner()
+        self.parts: List[str] = []
+        self.value: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Consume a chunk; returns the object once a schema match has closed."""
+        self.parts.append(chunk)
+        if self.value is None:
+            value, _ = self.extractor.choose(self.scanner.feed(chunk))
+            schema = self.extractor.schema
+            if value is not None and (schema is None or schema.matches(value)):
+                self.value = value
+        return self.value
+
+    def result(self) -> Dict[str, Any]:
+        """Final object, falling back to a full extraction of the joined text."""
+        if self.value is not None:
+            return self.value
+        return self.extractor.extract("".join(self.parts))
@@ -0,0 +1,120 @@
+# modules/manifest.py
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from modules.response_cache import hash_file
+
+# Bump when a pipeline change should invalidate previously processed articles
+PIPELINE_VERSION = "1"
+
+
+class Manifest:
+    """Append-only record of processed articles used for incremental runs."""
+
+    def __init__(self, path: str, log_path: Optional[str] = None):
+        """
+        Initialize the manifest, replaying any entries from a previous run.
+
+        Args:
+            path: JSON Lines file holding one entry per processed article
+            log_path: File new entries are appended to (defaults to `path`);
+                shard workers each log to their own file and the entries are
+                merged back into `path` by a later unsharded run
+        """
+        self.path = path
+        self.log_path = log_path or path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load(self.path)
+        # Entries of shards (on any machine) not merged into `path` yet
+        for shard_log in self.shard_logs():
+            self._load(shard_log)
+
+    def shard_logs(self, prefix: str = "") -> List[str]:
+        """Shard log files next to the manifest, optionally of one machine only."""
+        return sorted(glob.glob(f"{glob.escape(self.path)}.shard-{prefix}*"))
+
+    def _load(self, path: str):
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted run is ignored
+                    continue
+                # The same article may be in several logs; the latest wins
+                current = self.entries.get(entry["name"])
+                if current is None or entry.get("completed_at", 0) >= current.get(
+                    "completed_at", 0
+                ):
+                    self.entries[entry["name"]] = entry
+
+    @staticmethod
+    def fingerprint(
+        image_path: str,
+        xml_path: str,
+        version: str,
+        hasher: Callable[[str], str] = hash_file,
+    ) -> Dict[str, str]:
+        """Hash an article's inputs together with the pipeline/prompt version.
+
+        `hasher` lets an InputIndex reuse the hashes of unchanged files.
+        """
+        return {
+            "image_hash": hasher(image_path),
+            "xml_hash": hasher(xml_path),
+            "version": version,
+        }
+
+    def is_current(self, name: str, fingerprint: Dict[str, str]) -> bool:
+        """True when the article was processed from identical inputs and version."""
+        entry = self.entries.get(name)
+        if entry is None:
+            return False
+        if any(entry.get(key) != value for key, value in fingerprint.items()):
+            return False
+        return all(os.path.exists(path) for path in entry.get("outputs", []))
+
+    def record(self, name: str, fingerprint: Dict[str, str], outputs: List[str]):
+        """Durably append an entry once an article's outputs are on disk."""
+        entry = {
+            "name": name,
+            **fingerprint,
+            "outputs": outputs,
+            "completed_at": time.time(),
+        }
+        with self._lock:
+            self.entries[name] = entry
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(name)
+
+    def merge(self, paths: List[str]):
+        """Fold shard logs into this manifest, then compact and drop the shard files."""
+        for path in paths:
+            self._load(path)
+        self.compact()
+        for path in paths:
+            if path != self.path and os.path.exists(path):
+                os.remove(path)
+
+    def compact(self):
+        """Rewrite the log with only the latest entry per article."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
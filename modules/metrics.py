@@ -0,0 +1,265 @@
+# modules/metrics.py
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+SeriesKey = Tuple[str, Labels]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Timer:
+    """Exact count/sum/min/max plus a bounded reservoir for percentiles."""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        self.samples: List[float] = []
+
+    def observe(self, value: float, reservoir: int, rng: random.Random):
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        if len(self.samples) < reservoir:
+            self.samples.append(value)
+        else:
+            # Reservoir sampling keeps memory flat over arbitrarily long runs
+            slot = rng.randrange(self.count)
+            if slot < reservoir:
+                self.samples[slot] = value
+
+    def quantiles(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"0.5": 0.0, "0.95": 0.0, "0.99": 0.0}
+        if len(self.samples) == 1:
+            value = self.samples[0]
+            return {"0.5": value, "0.95": value, "0.99": value}
+        cuts = statistics.quantiles(self.samples, n=100, method="inclusive")
+        return {"0.5": cuts[49], "0.95": cuts[94], "0.99": cuts[98]}
+
+
+class Metrics:
+    """In-process counters, gauges and timers with summary and export helpers."""
+
+    def __init__(self, reservoir: int = 2048):
+        """
+        Initialize the metrics registry.
+
+        Args:
+            reservoir: Samples kept per timer series for percentile estimates
+        """
+        self.reservoir = reservoir
+        self.started = time.time()
+        self._counters: Dict[SeriesKey, float] = {}
+        self._gauges: Dict[SeriesKey, float] = {}
+        self._gauge_peaks: Dict[SeriesKey, float] = {}
+        self._timers: Dict[SeriesKey, _Timer] = {}
+        self._probes: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+
+    def incr(self, name: str, value: float = 1, **labels: Any):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name: str, value: float, **labels: Any):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._gauges[key] = value
+            self._gauge_peaks[key] = max(self._gauge_peaks.get(key, value), value)
+
+    def observe(self, name: str, value: float, **labels: Any):
+        key = (name, _labels(labels))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = _Timer()
+            timer.observe(value, self.reservoir, self._rng)
+
+    @contextmanager
+    def span(self, name: str, **labels: Any) -> Iterator[None]:
+        """Time a block (sync or containing awaits) into the `name` timer."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.incr(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_probe(self, name: str, probe: Callable[[], float]):
+        """Register a gauge whose value is read whenever sample() runs."""
+        self._probes[name] = probe
+
+    def sample(self):
+        for name, probe in list(self._probes.items()):
+            self.gauge(name, probe())
+
+    async def run_sampler(self, interval: float = 0.5):
+        """Sample probe gauges periodically until cancelled."""
+        while True:
+            self.sample()
+            await asyncio.sleep(interval)
+
+    def state(self) -> Dict[str, Any]:
+        """Picklable copy of every series, used to merge metrics across processes."""
+        with self._lock:
+            return {
+                "started": self.started,
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "gauge_peaks": dict(self._gauge_peaks),
+                "timers": {
+                    key: (t.count, t.total, t.minimum, t.maximum, list(t.samples))
+                    for key, t in self._timers.items()
+                },
+            }
+
+    def merge(self, state: Dict[str, Any]):
+        """Fold the state() of another registry (e.g. a shard process) into this one."""
+        with self._lock:
+            self.started = min(self.started, state["started"])
+            for key, value in state["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            # Gauges from separate processes describe separate resources, so the
+            # merged value is their total (and the peak an upper bound of it)
+            for key, value in state["gauges"].items():
+                self._gauges[key] = self._gauges.get(key, 0) + value
+                self._gauge_peaks[key] = (
+                    self._gauge_peaks.get(key, 0) + state["gauge_peaks"][key]
+                )
+            for key, (count, total, minimum, maximum, samples) in state[
+                "timers"
+            ].items():
+                timer = self._timers.get(key)
+                if timer is None:
+                    timer = self._timers[key] = _Timer()
+                timer.count += count
+                timer.total += total
+                timer.minimum = min(timer.minimum, minimum)
+                timer.maximum = max(timer.maximum, maximum)
+                timer.samples.extend(samples)
+                if len(timer.samples) > self.reservoir:
+                    timer.samples = self._rng.sample(timer.samples, self.reservoir)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Every series as a flat record (the JSON lines export format)."""
+        now = time.time()
+        records: List[Dict[str, Any]] = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                records.append(
+                    {
+                        "type": "counter",
+                        "name": name,
+                        "labels": dict(labels),
+                        "value": value,
+                    }
+                )
+            for key, value in sorted(self._gauges.items()):
+                name, labels = key
+                records.append(
+                    {
+                        "type": "gauge",
+                        "name": name,
+                        "labels": dict(labels),
+                        "value": value,
+                        "max": self._gauge_peaks[key],
+                    }
+                )
+            for (name, labels), timer in sorted(self._timers.items()):
+                records.append(
+                    {
+                        "type": "timer",
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": timer.count,
+                        "sum": timer.total,
+                        "min": timer.minimum if timer.count else 0.0,
+                        "max": timer.maximum,
+                        "quantiles": timer.quantiles(),
+                    }
+                )
+        for record in records:
+            record["timestamp"] = now
+        return records
+
+    def to_jsonl(self) -> str:
+        return "".join(json.dumps(record) + "\n" for record in self.snapshot())
+
+    def to_prometheus(self, prefix: str = "article_processor_") -> str:
+        """Render the registry in the Prometheus text exposition format."""
+
+        def fmt(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+            merged = {**labels, **(extra or {})}
+            if not merged:
+                return ""
+            body = ",".join(f'{k}="{_escape(v)}"' for k, v in merged.items())
+            return "{" + body + "}"
+
+        lines: List[str] = []
+        declared = set()
+        for record in self.snapshot():
+            name = prefix + record["name"]
+            labels = record["labels"]
+            kind = {"counter": "counter", "gauge": "gauge", "timer": "summary"}[
+                record["type"]
+            ]
+            if name not in declared:
+                lines.append(f"# TYPE {name} {kind}")
+                declared.add(name)
+            if record["type"] == "timer":
+                for q, value in record["quantiles"].items():
+                    lines.append(f"{name}{fmt(labels, {'quantile': q})} {value}")
+                lines.append(f"{name}_sum{fmt(labels)} {record['sum']}")
+                lines.append(f"{name}_count{fmt(labels)} {record['count']}")
+            else:
+                lines.append(f"{name}{fmt(labels)} {record['value']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Export to `path`: Prometheus text for *.prom, JSON lines otherwise."""
+        if path.endswith(".prom"):
+            content, mode = self.to_prometheus(), "w"
+        else:
+            content, mode = self.to_jsonl(), "a"
+        with open(path, mode, encoding="utf-8") as f:
+            f.write(content)
+
+    def format_summary(self) -> str:
+        """Human-readable per-run summary."""
+        lines = [f"Run metrics ({time.time() - self.started:.1f}s):"]
+        for record in self.snapshot():
+            labels = ",".join(f"{k}={v}" for k, v in record["labels"].items())
+            series = f"{record['name']}{{{labels}}}" if labels else record["name"]
+            if record["type"] == "timer":
+                q = record["quantiles"]
+                lines.append(
+                    f"  {series}: n={record['count']} "
+                    f"p50={q['0.5'] * 1000:.1f}ms p95={q['0.95'] * 1000:.1f}ms "
+                    f"p99={q['0.99'] * 1000:.1f}ms total={record['sum']:.2f}s"
+                )
+            elif record["type"] == "gauge":
+                lines.append(f"  {series}: {record['value']:g} (max {record['max']:g})")
+            else:
+                lines.append(f"  {series}: {record['value']:g}")
+        return "\n".join(lines)
@@ -0,0 +1,308 @@
+# modules/output_store.py
+import glob
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Output backends: one file per output (the default), or every article as one
+# record appended to a rolling JSON Lines store, gzip-compressed JSON Lines
+# segments, or a SQLite database
+OUTPUT_BACKENDS = ("files", "jsonl", "gzip", "sqlite")
+
+STORE_DIRNAME = "store"
+SQLITE_FILENAME = "outputs.sqlite"
+_SEGMENT = re.compile(r"^(?P<prefix>.+)-(?P<seq>\d{5})\.jsonl(?:\.gz)?$")
+
+
+class JSONLStore:
+    """Append-only JSON Lines segments, rolled over at `segment_bytes`.
+
+    Each write_batch() appends its records and fsyncs once. With `compress`
+    every batch becomes one gzip member, so a segment stays a valid
+    multi-member .gz file and a torn last batch only loses that batch.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "outputs",
+        segment_bytes: int = 256 << 20,
+        compress: bool = False,
+    ):
+        """
+        Initialize the store; writing always starts a new segment.
+
+        Args:
+            directory: Folder holding the segments
+            prefix: Segment name prefix; concurrent writers (shard processes)
+                each need their own
+            segment_bytes: Size after which the next batch opens a new segment
+            compress: Write gzip-compressed segments
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_bytes = segment_bytes
+        self.compress = compress
+        self.suffix = ".jsonl.gz" if compress else ".jsonl"
+        self._file = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        existing = [
+            int(match["seq"])
+            for match in map(_SEGMENT.match, os.listdir(directory))
+            if match and match["prefix"] == prefix
+        ]
+        self._seq = max(existing, default=-1)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(
+            self.directory, f"{self.prefix}-{self._seq:05d}{self.suffix}"
+        )
+
+    def _segment(self):
+        if self._file is not None and self._file.tell() < self.segment_bytes:
+            return self._file
+        if self._file is not None:
+            self._file.close()
+        self._seq += 1
+        self._file = open(self.path, "ab")
+        return self._file
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> List[str]:
+        """Durably append `records`; returns the segment path holding each one."""
+        data = "".join(json.dumps(record) + "\n" for record in records).encode()
+        if self.compress:
+            data = gzip.compress(data)
+        with self._lock:
+            f = self._segment()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            return [self.path] * len(records)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class SQLiteStore:
+    """One row per article in a SQLite database; each batch is one transaction."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db: Optional[sqlite3.Connection] = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            # Shard processes share the database; wait out their writes
+            timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "name TEXT PRIMARY KEY, record TEXT NOT NULL, completed_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> List[str]:
+        rows = [
+            (record["name"], json.dumps(record), record["completed_at"])
+            for record in records
+        ]
+        with self._lock:
+            assert self._db is not None
+            self._db.executemany(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?)", rows
+            )
+            self._db.commit()
+        return [self.path] * len(records)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def open_store(
+    backend: str,
+    output_dir: str,
+    prefix: str = "outputs",
+    segment_bytes: int = 256 << 20,
+):
+    """Create the writer for a non-"files" backend under `output_dir`."""
+    directory = os.path.join(output_dir, STORE_DIRNAME)
+    if backend == "sqlite":
+        return SQLiteStore(os.path.join(directory, SQLITE_FILENAME))
+    if backend in ("jsonl", "gzip"):
+        return JSONLStore(directory, prefix, segment_bytes, compress=backend == "gzip")
+    raise ValueError(f"Unknown output backend '{backend}'")
+
+
+def _read_lines(path: str, start: int = 0) -> Iterator[Tuple[int, str]]:
+    """Yield (offset, line) for a segment; offsets are only meaningful uncompressed.
+
+    `start` skips that many bytes of an uncompressed segment.
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    yield -1, line
+            except (EOFError, gzip.BadGzipFile):
+                # Torn last member from an interrupted run
+                return
+        return
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for raw in f:
+            yield offset, raw.decode("utf-8")
+            offset += len(raw)
+
+
+class OutputReader:
+    """Fetch processed articles back by name, whichever backend wrote them."""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.store_dir = os.path.join(output_dir, STORE_DIRNAME)
+        # name -> (completed_at, segment path, byte offset or -1)
+        self._index: Dict[str, Tuple[float, str, int]] = {}
+        # Segment path -> bytes already indexed
+        self._scanned: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _segments(self) -> List[str]:
+        return sorted(
+            glob.glob(os.path.join(self.store_dir, "*.jsonl"))
+            + glob.glob(os.path.join(self.store_dir, "*.jsonl.gz"))
+        )
+
+    def _build_index(self) -> Dict[str, Tuple[float, str, int]]:
+        """Index what was appended to the segments since the last call.
+
+        A reader can be kept for a whole run: plain segments are read on from
+        where the last scan stopped, a grown compressed one is rescanned. The
+        most recently completed record of a name wins.
+        """
+        with self._lock:
+            index = self._index
+            for path in self._segments():
+                try:
+                    size = os.path.getsize(path)
+                except FileNotFoundError:
+                    continue
+                scanned = self._scanned.get(path, 0)
+                if size == scanned:
+                    continue
+                compressed = path.endswith(".gz")
+                for offset, line in _read_lines(path, 0 if compressed else scanned):
+                    if not line.endswith("\n"):
+                        # A line still being written (or torn); read it next time
+                        break
+                    if not compressed:
+                        scanned = offset + len(line.encode("utf-8"))
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    found = (record["completed_at"], path, offset)
+                    if record["name"] not in index or found >= index[record["name"]]:
+                        index[record["name"]] = found
+                self._scanned[path] = size if compressed else scanned
+            return index
+
+    def _from_segment(self, name: str) -> Optional[Dict[str, Any]]:
+        found = self._build_index().get(name)
+        if found is None:
+            return None
+        _, path, offset = found
+        if offset >= 0:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return json.loads(f.readline())
+        for _, line in _read_lines(path):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record["name"] == name and record["completed_at"] == found[0]:
+                return record
+        return None
+
+    def _from_sqlite(self, name: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.store_dir, SQLITE_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with closing(sqlite3.connect(path, timeout=30)) as db:
+            row = db.execute(
+                "SELECT record FROM articles WHERE name = ?", (name,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _from_files(self, name: str) -> Optional[Dict[str, Any]]:
+        # Imported here: data_saver depends on this module
+        from modules.data_saver import DataSaver, OUTPUT_SUFFIXES
+
+        record: Dict[str, Any] = {}
+        for field in OUTPUT_SUFFIXES:
+            if field == "full":
+                continue
+            path = DataSaver.output_file(self.output_dir, name, field)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    record[field] = (
+                        f.read() if path.endswith((".txt", ".html")) else json.load(f)
+                    )
+        return {"name": name, **record} if record else None
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Return one article's outputs.
+
+        Args:
+            name: Article base name
+
+        Returns:
+            Dict with raw_image_text, xml_metadata, combined_content and
+            html_content (fields that were never produced may be absent),
+            or None when the article is not in the output folder
+        """
+        for source in (self._from_sqlite, self._from_segment, self._from_files):
+            record = source(name)
+            if record is not None:
+                return record
+        return None
+
+    def names(self) -> List[str]:
+        """Names of every article held by a store backend, sorted."""
+        names = set(self._build_index())
+        path = os.path.join(self.store_dir, SQLITE_FILENAME)
+        if os.path.exists(path):
+            with closing(sqlite3.connect(path, timeout=30)) as db:
+                names.update(row[0] for row in db.execute("SELECT name FROM articles"))
+        return sorted(names)
+
+
+def make_record(name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """The single stored record for an article (replaces the separate files)."""
+    return {
+        "name": name,
+        "completed_at": time.time(),
+        **{
+            key: value
+            for key, value in data.items()
+            if isinstance(value, (dict, list, str, int, float, bool, type(None)))
+        },
+    }
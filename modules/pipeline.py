@@ -0,0 +1,164 @@
+# modules/pipeline.py
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from modules.article_context import ArticleContext
+from modules.work_queue import ArticleJob, JobResult, WorkQueueSummary
+
+# A stage handler may return False to finish an article early (e.g. when skipped)
+StageHandler = Callable[[ArticleContext], Awaitable[Optional[bool]]]
+
+
+@dataclass
+class Stage:
+    """One pipeline step with its own worker pool."""
+
+    name: str
+    handler: StageHandler
+    concurrency: int = 1
+
+
+# (job, context, start time) travelling between stage queues
+_Item = Tuple[ArticleJob, ArticleContext, float]
+
+
+class StagePipeline:
+    """Streams articles through a chain of stages, each with its own queue and workers.
+
+    Every stage works on the next article as soon as it hands the previous one
+    downstream, so OCR of article N+1 overlaps combine/HTML of article N and
+    throughput is bounded by the slowest stage instead of the sum of them.
+    """
+
+    def __init__(self, stages: List[Stage], max_pending: Optional[int] = None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            stages: Ordered list of stages
+            max_pending: Capacity of each inter-stage queue (defaults to twice
+                the consuming stage's concurrency)
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.max_pending = max_pending
+
+    def _queue_for(self, stage: Stage) -> asyncio.Queue:
+        return asyncio.Queue(maxsize=self.max_pending or max(1, stage.concurrency) * 2)
+
+    async def _produce(
+        self,
+        queue: asyncio.Queue,
+        jobs: Iterable[ArticleJob],
+        make_context: Callable[[ArticleJob], ArticleContext],
+    ):
+        try:
+            for job in jobs:
+                await queue.put((job, make_context(job), time.perf_counter()))
+        finally:
+            for _ in range(max(1, self.stages[0].concurrency)):
+                await queue.put(None)
+
+    def _finish(
+        self,
+        item: _Item,
+        summary: WorkQueueSummary,
+        on_result: Optional[Callable[[JobResult], None]],
+        error: Optional[BaseException] = None,
+    ):
+        job, ctx, start = item
+        if error is None:
+            result = JobResult(job, result=ctx.result())
+            summary.succeeded += 1
+        else:
+            result = JobResult(job, error=error)
+            summary.failed += 1
+            summary.failures.append(result)
+        result.elapsed = time.perf_counter() - start
+        if on_result:
+            on_result(result)
+
+    async def _worker(
+        self,
+        stage: Stage,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        summary: WorkQueueSummary,
+        on_result: Optional[Callable[[JobResult], None]],
+    ):
+        while True:
+            item = await inbox.get()
+            if item is None:
+                return
+
+            try:
+                proceed = await stage.handler(item[1])
+            except Exception as e:
+                self._finish(item, summary, on_result, e)
+                continue
+
+            if outbox is None or proceed is False:
+                self._finish(item, summary, on_result)
+            else:
+                await outbox.put(item)
+
+    async def _run_stage(
+        self,
+        index: int,
+        queues: List[asyncio.Queue],
+        summary: WorkQueueSummary,
+        on_result: Optional[Callable[[JobResult], None]],
+    ):
+        """Run a stage's workers, then tell the next stage there is no more input."""
+        stage = self.stages[index]
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        await asyncio.gather(
+            *(
+                self._worker(stage, queues[index], outbox, summary, on_result)
+                for _ in range(max(1, stage.concurrency))
+            )
+        )
+        if outbox is not None:
+            for _ in range(max(1, self.stages[index + 1].concurrency)):
+                await outbox.put(None)
+
+    async def run(
+        self,
+        jobs: Iterable[ArticleJob],
+        make_context: Callable[[ArticleJob], ArticleContext],
+        on_result: Optional[Callable[[JobResult], None]] = None,
+    ) -> WorkQueueSummary:
+        """
+        Stream all jobs through the stages.
+
+        Args:
+            jobs: Iterable of jobs; consumed lazily
+            make_context: Builds the per-article context for a job
+            on_result: Optional callback invoked as each article leaves the pipeline
+
+        Returns:
+            Summary of the run including any failed jobs
+        """
+        queues = [self._queue_for(stage) for stage in self.stages]
+        summary = WorkQueueSummary()
+
+        await asyncio.gather(
+            self._produce(queues[0], jobs, make_context),
+            *(
+                self._run_stage(i, queues, summary, on_result)
+                for i in range(len(self.stages))
+            ),
+        )
+        return summary
+
+
+def parse_stage_concurrency(spec: str) -> Dict[str, int]:
+    """Parse a 'stage=N,stage=N' string into a concurrency mapping."""
+    limits: Dict[str, int] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
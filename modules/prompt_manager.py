@@ -1,14 +1,385 @@
+import hashlib
 import json
-from typing import Dict, Any
+import re
+import textwrap
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
 
+from config import PROMPT_TOKEN_BUDGET
+from modules.metrics import Metrics
+from modules.rate_limiter import estimate_tokens
 
-class PromptManager:
-    def get_content_extraction_prompt(self) -> str:
-        return """
+_SLOT = re.compile(r"\$\{(\w+)\}")
+_TRUNCATED = "\n[... truncated to fit the prompt budget ...]"
+# Share of the prompt budget always left for the OCR text
+_MIN_TEXT_SHARE = 0.25
+# Bump when trimming produces different prompts for the same sources
+TRIM_VERSION = "2"
+
+
+class PromptTemplate:
+    """A prompt compiled once into static text and named `${slot}`s.
+
+    Every template starts with its static instructions and puts the
+    per-article data last, so all requests share a long identical prefix
+    (which Gemini's implicit context caching can reuse).
+    """
+
+    __slots__ = ("name", "parts", "prefix", "static_tokens", "version")
+
+    def __init__(self, name: str, text: str):
+        """
+        Compile the template.
+
+        Args:
+            name: Template name, part of its version
+            text: Template text; indentation is removed (it only costs tokens)
+        """
+        self.name = name
+        # Alternating static text and slot names: [text, slot, text, slot, ...]
+        self.parts: List[str] = _SLOT.split(textwrap.dedent(text).strip())
+        self.prefix = self.parts[0]
+        self.static_tokens = estimate_tokens("".join(self.parts[0::2]))
+        self.version = hashlib.sha256(
+            "\0".join([name, *self.parts]).encode()
+        ).hexdigest()[:12]
+
+    def render(self, **values: str) -> str:
+        parts = self.parts[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return "".join(parts)
+
+
+def compact_json(value: Any) -> str:
+    """Serialize for a prompt: no indentation or spaces, non-ASCII kept as is."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def trim_text(text: str, max_tokens: int) -> str:
+    """Cut text to about `max_tokens`, at a paragraph boundary when possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * 4 - len(_TRUNCATED))
+    cut = text.rfind("\n\n", 0, limit)
+    return text[: cut if cut > limit // 2 else limit] + _TRUNCATED
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """Split text into paragraph-aligned chunks of about `max_tokens` each."""
+    limit = max(1, max_tokens * 4)
+    chunks: List[str] = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > limit:
+            # A single paragraph longer than a chunk is cut at a line or space
+            cut = max(paragraph.rfind("\n", 0, limit), paragraph.rfind(" ", 0, limit))
+            cut = cut if cut > limit // 2 else limit
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        joined = f"{current}\n\n{paragraph}" if current else paragraph
+        if len(joined) > limit and current:
+            chunks.append(current)
+            joined = paragraph
+        current = joined
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+def trim_metadata(metadata: Any, max_tokens: int) -> Any:
+    """Shorten long strings, then long lists, until the serialized metadata fits.
+
+    Lists keep their first items and end with a "[... N more items]" marker,
+    so metadata made of many repeated elements (e.g. METS/ALTO word lists)
+    shrinks too. The result can still be over budget for very wide objects;
+    fit_metadata() guarantees the limit.
+    """
+    if estimate_tokens(compact_json(metadata)) <= max_tokens:
+        return metadata
+
+    def cap(value: Any, limit: int, items: int) -> Any:
+        if isinstance(value, str) and len(value) > limit:
+            return value[:limit] + "..."
+        if isinstance(value, dict):
+            return {k: cap(v, limit, items) for k, v in value.items()}
+        if isinstance(value, list):
+            kept = [cap(v, limit, items) for v in value[:items]]
+            if len(value) > items:
+                kept.append(f"[... {len(value) - items} more items]")
+            return kept
+        return value
+
+    def longest(value: Any) -> Tuple[int, int]:
+        """Length of the longest string and of the longest list in a value."""
+        if isinstance(value, str):
+            return len(value), 0
+        if isinstance(value, dict):
+            children, own = list(value.values()), 0
+        elif isinstance(value, list):
+            children, own = value, len(value)
+        else:
+            return 0, 0
+        sizes = [longest(v) for v in children] or [(0, 0)]
+        return max(s for s, _ in sizes), max(own, *(n for _, n in sizes))
+
+    limit, items = longest(metadata)
+    trimmed = metadata
+    while limit > 16 and estimate_tokens(compact_json(trimmed)) > max_tokens:
+        limit //= 2
+        trimmed = cap(metadata, limit, items)
+    while items > 1 and estimate_tokens(compact_json(trimmed)) > max_tokens:
+        items //= 2
+        trimmed = cap(metadata, limit, items)
+    return trimmed
+
+
+def fit_metadata(metadata: Any, max_tokens: int) -> str:
+    """Serialized metadata of at most about `max_tokens`, cut as JSON text last."""
+    serialized = compact_json(trim_metadata(metadata, max_tokens))
+    if estimate_tokens(serialized) <= max_tokens:
+        return serialized
+    return serialized[: max(0, max_tokens * 4 - len(_TRUNCATED))] + _TRUNCATED
+
+
+# Shared by the single-article and batched prompts
+_COMBINE_INSTRUCTIONS = """\
+Instructions:
+1. Thoroughly analyze both the extracted text and XML metadata.
+2. Reconcile discrepancies between the two sources:
+- Prefer XML metadata if confidence is high.
+- Correct OCR/spelling errors in extracted text while maintaining meaning.
+- Standardize proper nouns (names, locations) and dates accurately.
+3. Populate ALL fields in the JSON template:
+- Use inference when data is missing (based on context).
+- If a field cannot be reliably determined, use `null`.
+4. For the "content" field:
+- Divide the article into logical paragraphs.
+- Correct grammar, spelling, and flow while preserving historical context.
+5. In the "metadata" section:
+- Note any major corrections, reconciliations, or uncertainties.
+6. Ensure all numbers, dates, and units are accurately formatted.
+7. Maintain only plain text (no HTML tags, styling, or formatting codes)."""
+
+_HTML_REQUIREMENTS = """\
+Requirements:
+1. Use semantic HTML5 tags (like article, header, section, p)
+2. NO CSS styling - return only structural HTML
+3. NO images or other media elements
+4. Use simple, semantic document structure appropriate for an academic/historical article
+5. Include proper metadata in the head section
+6. Focus on content readability and semantic structure only
+7. Return ONLY the complete HTML code, including <!DOCTYPE html>, <html>, <head>, and <body> tags"""
+
+_JSON_OUTPUT = """\
+Output Requirements:
+- Return ONLY a raw JSON object that strictly follows the provided template.${raw_text}
+- No explanations, code blocks, markdown, or additional text.
+- The response must begin with '{' and end with '}'.
+- Ensure the JSON is valid, properly formatted, and ready for programmatic parsing.
+
+Strict adherence to formatting is critical, as this JSON will be automatically processed."""
+
+TEMPLATES = {
+    template.name: template
+    for template in (
+        PromptTemplate(
+            "extract",
+            """
             Extract all the text from this old article image.
             Return only the extracted text without any additional commentary.
             Preserve paragraph breaks and structural elements as much as possible.
+            """,
+        ),
+        PromptTemplate(
+            "combine",
+            f"""
+You are tasked with structuring historical news article content into a strict JSON format by intelligently analyzing extracted OCR text and XML metadata.
+
+{_COMBINE_INSTRUCTIONS}
+
+{_JSON_OUTPUT}
+
+JSON Response Structure (strict structure to follow):
+${{response_template}}
+
+Sources:
+- XML Metadata:
+```
+${{xml_metadata}}
+```
+
+- Extracted Text (may contain OCR or spelling errors):
+```
+${{extracted_text}}
+```
+""",
+        ),
+        PromptTemplate(
+            "combine_chunk",
+            f"""
+You are tasked with structuring historical news article content into a strict JSON format by intelligently analyzing extracted OCR text and XML metadata.
+The article is too long for one request, so it was split at paragraph boundaries; you are given one part of it. Other parts are structured separately and merged afterwards.
+
+{_COMBINE_INSTRUCTIONS}
+8. Put every paragraph of this part, in order, into "content"; do not summarize it or add text from other parts.
+9. Fill the other fields only from what this part and the metadata show; use `null` otherwise.
+
+{_JSON_OUTPUT}
+
+JSON Response Structure (strict structure to follow):
+${{response_template}}
+
+Sources:
+- XML Metadata:
+```
+${{xml_metadata}}
+```
+
+- Part ${{part}} of the extracted text (may contain OCR or spelling errors):
+```
+${{extracted_text}}
+```
+""",
+        ),
+        PromptTemplate(
+            "fused",
+            f"""
+You are tasked with structuring the historical news article in the attached image into a strict JSON format by reading the image and intelligently analyzing the XML metadata.
+
+{_COMBINE_INSTRUCTIONS}
+
+{_JSON_OUTPUT}
+
+JSON Response Structure (strict structure to follow):
+${{response_template}}
+
+Sources:
+- The attached article image (read all of its text; it may be faded or damaged)
+
+- XML Metadata:
+```
+${{xml_metadata}}
+```
+""",
+        ),
+        PromptTemplate(
+            "html",
+            f"""
+Create a clean, text-only HTML page for the article with the content given at the end.
+
+{_HTML_REQUIREMENTS}
+
+The output should be valid HTML5 focused solely on content structure without any visual styling.
+
+Article content:
+${{content}}
+""",
+        ),
+        PromptTemplate(
+            "batch_combine",
+            f"""
+You are tasked with structuring several independent historical news articles into a strict JSON format by intelligently analyzing extracted OCR text and XML metadata.
+Each article starts with a "### ARTICLE <id>" line; never mix content between articles.
+
+{_COMBINE_INSTRUCTIONS}
+
+Output Requirements:
+- Return ONLY a raw JSON object keyed by article ID, e.g. {{"<id>": {{...}}}}.
+- Every article ID below must appear exactly once, with a value that strictly follows the template.
+- No explanations, code blocks, markdown, or additional text.
+- Ensure the JSON is valid, properly formatted, and ready for programmatic parsing.
+
+Strict adherence to formatting is critical, as this JSON will be automatically processed.
+
+JSON Response Structure for each article (strict structure to follow):
+${{response_template}}
+
+Articles:
+${{articles}}
+""",
+        ),
+        PromptTemplate(
+            "batch_html",
+            f"""
+Create a clean, text-only HTML page for each of the articles given at the end. Each article starts with a "### ARTICLE <id>" line.
+
+{_HTML_REQUIREMENTS}
+
+Output format:
+- Start each page with a line containing only <<<ARTICLE <id>>>, followed by that article's complete HTML document.
+- Return one page per article ID below and nothing else.
+
+The output should be valid HTML5 focused solely on content structure without any visual styling.
+
+Articles:
+${{articles}}
+""",
+        ),
+    )
+}
+
+_RAW_TEXT_FIELD = (
+    '\n- Also add a "raw_text" field holding the verbatim transcription'
+    " of the image, before any corrections."
+)
+
+
+class PromptManager:
+    def __init__(
+        self,
+        token_budget: int = PROMPT_TOKEN_BUDGET,
+        metrics: Optional[Metrics] = None,
+    ):
+        """
+        Initialize the prompt manager.
+
+        Args:
+            token_budget: Estimated token limit for a combine/fused prompt;
+                longer OCR text and metadata are trimmed to fit (0 disables)
+            metrics: Registry counting trimmed prompts
         """
+        self.token_budget = token_budget
+        self.metrics = metrics
+
+    @cached_property
+    def version(self) -> str:
+        """Short hash of the templates and budget, used to key caches and the manifest."""
+        versions = [TEMPLATES[name].version for name in sorted(TEMPLATES)]
+        versions += [str(self.token_budget), TRIM_VERSION]
+        return hashlib.sha256("\0".join(versions).encode()).hexdigest()[:12]
+
+    def _fit(
+        self, name: str, extracted_text: str, xml_metadata: Any, fixed: str
+    ) -> Tuple[str, str]:
+        """Serialize the article data, trimmed to the token budget if needed."""
+        metadata = compact_json(xml_metadata)
+        if not self.token_budget:
+            return extracted_text, metadata
+        available = (
+            self.token_budget - TEMPLATES[name].static_tokens - estimate_tokens(fixed)
+        )
+        if estimate_tokens(extracted_text) + estimate_tokens(metadata) <= available:
+            return extracted_text, metadata
+
+        if self.metrics is not None:
+            self.metrics.incr("prompt_trimmed_total", prompt=name)
+        # Metadata may use up to half of what is left, and never the OCR
+        # text's minimum share of the budget; the text gets the rest
+        min_text = int(self.token_budget * _MIN_TEXT_SHARE)
+        metadata = fit_metadata(
+            xml_metadata, max(min(available // 2, available - min_text), 1)
+        )
+        text = trim_text(
+            extracted_text, max(available - estimate_tokens(metadata), min_text)
+        )
+        return text, metadata
+
+    def get_content_extraction_prompt(self) -> str:
+        return TEMPLATES["extract"].prefix
 
     def get_combined_prompt(
         self,
@@ -16,63 +387,76 @@ class PromptManager:
         xml_metadata: Dict[str, Any],
         response_template: str,
     ) -> str:
-        return f"""
-            You are tasked with structuring historical news article content into a strict JSON format by intelligently analyzing extracted OCR text and XML metadata.
-
-            Sources:
-            - Extracted Text (may contain OCR or spelling errors):
-            ```
-            {extracted_text}
-            ```
-
-            - XML Metadata:
-            ```
-            {xml_metadata}
-            ```
-
-            JSON Response Structure (strict structure to follow):
-            {response_template}
-
-            Instructions:
-            1. Thoroughly analyze both the extracted text and XML metadata.
-            2. Reconcile discrepancies between the two sources:
-            - Prefer XML metadata if confidence is high.
-            - Correct OCR/spelling errors in extracted text while maintaining meaning.
-            - Standardize proper nouns (names, locations) and dates accurately.
-            3. Populate ALL fields in the JSON template:
-            - Use inference when data is missing (based on context).
-            - If a field cannot be reliably determined, use `null`.
-            4. For the "content" field:
-            - Divide the article into logical paragraphs.
-            - Correct grammar, spelling, and flow while preserving historical context.
-            5. In the "metadata" section:
-            - Note any major corrections, reconciliations, or uncertainties.
-            6. Ensure all numbers, dates, and units are accurately formatted.
-            7. Maintain only plain text (no HTML tags, styling, or formatting codes).
-
-            Output Requirements:
-            - Return ONLY a raw JSON object that strictly follows the provided template.
-            - No explanations, code blocks, markdown, or additional text.
-            - The response must begin with '{{' and end with '}}'.
-            - Ensure the JSON is valid, properly formatted, and ready for programmatic parsing.
-
-            Strict adherence to formatting is critical, as this JSON will be automatically processed.
+        text, metadata = self._fit(
+            "combine", extracted_text, xml_metadata, response_template
+        )
+        return TEMPLATES["combine"].render(
+            response_template=response_template,
+            xml_metadata=metadata,
+            extracted_text=text,
+            raw_text="",
+        )
+
+    def get_chunk_prompt(
+        self,
+        chunk: str,
+        xml_metadata: Dict[str, Any],
+        response_template: str,
+        part: int,
+        parts: int,
+        metadata_tokens: int,
+    ) -> str:
+        """Combine prompt for one part of a long article's OCR text.
+
+        The metadata is repeated in every part, so it is trimmed to
+        `metadata_tokens` (its long text fields mostly duplicate the OCR text).
         """
+        return TEMPLATES["combine_chunk"].render(
+            response_template=response_template,
+            xml_metadata=fit_metadata(xml_metadata, metadata_tokens),
+            extracted_text=chunk,
+            part=f"{part} of {parts}",
+            raw_text="",
+        )
 
-    def get_html_prompt(self, structured_content: Dict[str, Any]) -> str:
-        return f"""
-            Create a clean, text-only HTML page for the article with the following content:
+    def get_fused_prompt(
+        self,
+        xml_metadata: Dict[str, Any],
+        response_template: str,
+        include_raw_text: bool = False,
+    ) -> str:
+        """Single multimodal prompt: read the attached image and structure it directly."""
+        _, metadata = self._fit("fused", "", xml_metadata, response_template)
+        return TEMPLATES["fused"].render(
+            response_template=response_template,
+            xml_metadata=metadata,
+            raw_text=_RAW_TEXT_FIELD if include_raw_text else "",
+        )
 
-            {json.dumps(structured_content, indent=2)}
+    def get_html_prompt(self, structured_content: Dict[str, Any]) -> str:
+        return TEMPLATES["html"].render(content=compact_json(structured_content))
 
-            Requirements:
-            1. Use semantic HTML5 tags (like article, header, section, p)
-            2. NO CSS styling - return only structural HTML
-            3. NO images or other media elements
-            4. Use simple, semantic document structure appropriate for an academic/historical article
-            5. Include proper metadata in the head section
-            6. Focus on content readability and semantic structure only
-            7. Return ONLY the complete HTML code, including <!DOCTYPE html>, <html>, <head>, and <body> tags
+    def get_batch_combined_prompt(
+        self,
+        items: List[Tuple[str, str, Dict[str, Any]]],
+        response_template: str,
+    ) -> str:
+        """Combine prompt for several articles given as (id, text, metadata)."""
+        articles = "\n\n".join(
+            f"### ARTICLE {article_id}\n"
+            f"- XML Metadata:\n```\n{compact_json(xml_metadata)}\n```\n"
+            "- Extracted Text (may contain OCR or spelling errors):\n"
+            f"```\n{extracted_text}\n```"
+            for article_id, extracted_text, xml_metadata in items
+        )
+        return TEMPLATES["batch_combine"].render(
+            response_template=response_template, articles=articles
+        )
 
-            The output should be valid HTML5 focused solely on content structure without any visual styling.
-        """
+    def get_batch_html_prompt(self, items: List[Tuple[str, Dict[str, Any]]]) -> str:
+        """HTML prompt for several articles given as (id, structured content)."""
+        articles = "\n\n".join(
+            f"### ARTICLE {article_id}\n{compact_json(structured_content)}"
+            for article_id, structured_content in items
+        )
+        return TEMPLATES["batch_html"].render(articles=articles)
@@ -0,0 +1,269 @@
+# modules/rate_limiter.py
+import asyncio
+import random
+import re
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from config import (
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_MAX_RETRIES,
+    GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_TOKENS_PER_MINUTE,
+)
+from modules.metrics import Metrics
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+class RetryExhaustedError(RuntimeError):
+    """Raised when a transient Gemini error persists after every retry."""
+
+    def __init__(self, attempts: int, error: BaseException):
+        super().__init__(f"Gemini call failed after {attempts} attempts: {error}")
+        self.attempts = attempts
+        self.error = error
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `rate` units per minute."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until `amount` units are available, then take them."""
+        # Requests larger than the bucket would never fit; cap them at capacity
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Debit (or credit, when negative) units after the real cost is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by all callers."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = GEMINI_TOKENS_PER_MINUTE,
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            requests_per_minute: Request quota (0 disables the limit)
+            tokens_per_minute: Token quota (0 disables the limit)
+        """
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, estimated_tokens: int = 0):
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None and estimated_tokens:
+            await self.tokens.acquire(estimated_tokens)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the response reports real usage."""
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight calls: grows on success, halves when throttled."""
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: Optional[int] = None):
+        self.minimum = max(1, minimum)
+        self.maximum = maximum or initial
+        self.limit = float(max(self.minimum, min(initial, self.maximum)))
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, throttled: bool = False):
+        async with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honors server retry hints."""
+
+    def __init__(
+        self,
+        max_attempts: int = GEMINI_MAX_RETRIES + 1,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def status_of(error: BaseException) -> Optional[int]:
+        code = getattr(error, "code", None)
+        return code if isinstance(code, int) else None
+
+    def is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        # httpx comes with the Gemini SDK; no transport error exists before it loads
+        httpx = sys.modules.get("httpx")
+        if httpx is not None and isinstance(error, httpx.TransportError):
+            return True
+        return self.status_of(error) in RETRYABLE_STATUS_CODES
+
+    def is_throttle(self, error: BaseException) -> bool:
+        return self.status_of(error) in THROTTLE_STATUS_CODES
+
+    @staticmethod
+    def retry_after(error: BaseException) -> Optional[float]:
+        """Read a Retry-After header or a RetryInfo retryDelay from the error."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            value = headers.get("retry-after")
+            if value:
+                try:
+                    return float(value)
+                except ValueError:
+                    pass
+
+        match = re.search(
+            r"'retryDelay':\s*'([\d.]+)s'", str(getattr(error, "details", ""))
+        )
+        return float(match.group(1)) if match else None
+
+    def delay_for(self, attempt: int, error: BaseException) -> float:
+        hint = self.retry_after(error)
+        if hint is not None:
+            return min(hint, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class CallController:
+    """Runs Gemini calls under the shared rate limit, concurrency limit and retry policy."""
+
+    def __init__(
+        self,
+        limiter: Optional[RateLimiter] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        retry: Optional[RetryPolicy] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.limiter = limiter or RateLimiter()
+        self.metrics = metrics
+        self.concurrency = concurrency or AdaptiveConcurrency(GEMINI_MAX_CONCURRENCY)
+        self.retry = retry or RetryPolicy()
+        self.stats: Dict[str, int] = {"calls": 0, "retries": 0, "throttled": 0}
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+        rate_limited: bool = True,
+        hold: bool = False,
+    ) -> T:
+        """
+        Run `func` with rate limiting and retries.
+
+        Args:
+            func: Zero-argument coroutine function performing one attempt
+            estimated_tokens: Token cost charged before the call
+            usage: Extracts the real token count from the result, if known
+            rate_limited: Whether the call counts against the request/token quota
+            hold: Keep the concurrency slot of the successful attempt, e.g. for
+                a stream that is still being read; the caller must hand it
+                back with release()
+
+        Returns:
+            The result of the first successful attempt
+        """
+        attempt = 0
+        while True:
+            if rate_limited:
+                await self.limiter.acquire(estimated_tokens)
+            await self.concurrency.acquire()
+            self.stats["calls"] += 1
+            try:
+                result = await func()
+            except Exception as e:
+                await self.release(e)
+                if not self.retry.is_retryable(e):
+                    raise
+                attempt += 1
+                if attempt >= self.retry.max_attempts:
+                    raise RetryExhaustedError(attempt, e) from e
+                delay = self.retry.delay_for(attempt, e)
+            except BaseException:
+                await self.release()
+                raise
+            else:
+                if usage is not None:
+                    self.limiter.settle(estimated_tokens, usage(result))
+                if not hold:
+                    await self.release()
+                return result
+
+            self.stats["retries"] += 1
+            if self.metrics is not None:
+                self.metrics.incr("gemini_retries_total")
+                self.metrics.gauge("gemini_concurrency_limit", self.concurrency.limit)
+            print(f"Retrying Gemini call in {delay:.1f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+
+    async def release(self, error: Optional[BaseException] = None):
+        """Hand back a concurrency slot; a throttling `error` halves the limit."""
+        throttled = error is not None and self.retry.is_throttle(error)
+        if throttled:
+            self.stats["throttled"] += 1
+            if self.metrics is not None:
+                self.metrics.incr("gemini_throttled_total")
+        await self.concurrency.release(throttled)
+
+
+def usage_tokens(response: Any) -> Optional[int]:
+    """Total token count reported by a generate_content response, if any."""
+    metadata = getattr(response, "usage_metadata", None)
+    return getattr(metadata, "total_token_count", None)
+
+
+def estimate_tokens(prompt: str, images: int = 0) -> int:
+    """Rough token estimate: ~4 characters per token plus a fixed cost per image."""
+    return len(prompt) // 4 + images * 258
@@ -0,0 +1,89 @@
+# modules/request_batcher.py
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class RequestBatcher(Generic[T, R]):
+    """Groups requests submitted concurrently into one call of `flush`.
+
+    A batch is sent once `max_items` requests are waiting or `max_wait`
+    seconds after its first request arrived, whichever comes first. An
+    `eager` batcher instead sends right away whenever no batch is in flight,
+    and requests arriving meanwhile go out together when it completes
+    (group commit: batching without added latency).
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[T]], Awaitable[List[R]]],
+        max_items: int,
+        max_wait: float = 0.05,
+        eager: bool = False,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            flush: Coroutine function handling a batch; returns one result per item
+            max_items: Largest number of requests sent together
+            max_wait: Seconds a partial batch waits for more requests
+            eager: Send as soon as the previous batch is done instead of
+                waiting up to `max_wait`
+        """
+        self.flush = flush
+        self.max_items = max(1, max_items)
+        self.max_wait = max_wait
+        self.eager = eager
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    async def submit(self, item: T) -> R:
+        """Queue `item` for the next batch and wait for its own result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_items or (self.eager and not self._tasks):
+            self._send()
+        elif self._timer is None and not self.eager:
+            self._timer = loop.call_later(self.max_wait, self._send)
+        return await future
+
+    def _send(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference so the task is not garbage collected mid-flight
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Future):
+        self._tasks.discard(task)
+        if self.eager and not self._tasks:
+            self._send()
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]):
+        try:
+            results = await self.flush([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        # A short result list must not leave the remaining requests waiting
+        for _, future in batch[len(results) :]:
+            if not future.done():
+                future.set_exception(
+                    RuntimeError(
+                        f"Batch returned {len(results)} results for {len(batch)} items"
+                    )
+                )
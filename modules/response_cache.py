@@ -0,0 +1,209 @@
+# modules/response_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import (
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MEMORY_ENTRIES,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_TTL,
+)
+
+# Eviction scans the table, so it runs at most once per this many writes;
+# small caches are trimmed more often, so they overshoot by at most a tenth
+_EVICT_INTERVAL = 100
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (in-memory LRU + SQLite) cache of Gemini responses."""
+
+    def __init__(
+        self,
+        path: Optional[str] = RESPONSE_CACHE_PATH,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        memory_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL,
+    ):
+        """
+        Initialize the response cache.
+
+        Args:
+            path: SQLite file for the persistent tier; None keeps the cache in memory only
+            max_entries: Maximum number of rows kept on disk (0 means unbounded)
+            memory_entries: Maximum number of entries kept in the in-memory LRU
+            ttl: Seconds before an entry expires (0 means never)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+        }
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._evict_interval = (
+            min(_EVICT_INTERVAL, max(1, max_entries // 10))
+            if max_entries
+            else _EVICT_INTERVAL
+        )
+        self._writes_since_evict = 0
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(
+                path,
+                check_same_thread=False,
+                # Shard processes share the database; wait out their writes
+                timeout=30,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_created ON responses (created)"
+            )
+            self._evict()
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, image_hash: Optional[str] = None) -> str:
+        """Build a content-addressed key from the model, prompt and image hash."""
+        prompt_hash = hash_bytes(prompt.encode("utf-8"))
+        return hash_bytes(f"{model}\0{prompt_hash}\0{image_hash or ''}".encode())
+
+    @property
+    def hits(self) -> int:
+        return self.stats["memory_hits"] + self.stats["disk_hits"]
+
+    @property
+    def misses(self) -> int:
+        return self.stats["misses"]
+
+    def _expired(self, created: float, now: float) -> bool:
+        return bool(self.ttl) and now - created > self.ttl
+
+    def _remember(self, key: str, value: str, created: float):
+        """Insert into the in-memory LRU, evicting the least recently used entry."""
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._db.execute(
+                            "UPDATE responses SET accessed = ? WHERE key = ?",
+                            (now, key),
+                        )
+                        self._db.commit()
+                        self._remember(key, value, created)
+                        self.stats["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str):
+        """Store a response in both tiers, evicting every few writes."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stats["writes"] += 1
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._writes_since_evict += 1
+                if self._writes_since_evict >= self._evict_interval:
+                    self._evict()
+                self._db.commit()
+
+    def delete(self, key: str):
+        """Remove a response from both tiers."""
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+
+    def _evict(self):
+        """Drop expired rows and trim the disk tier to max_entries (oldest access first)."""
+        assert self._db is not None
+        self._writes_since_evict = 0
+        if self.ttl:
+            cursor = self._db.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+            )
+            self.stats["evictions"] += max(cursor.rowcount, 0)
+        if self.max_entries:
+            cursor = self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.stats["evictions"] += max(cursor.rowcount, 0)
+
+    def lookup(
+        self, model: str, prompt: str, image_hash: Optional[str] = None
+    ) -> Tuple[str, Optional[str]]:
+        """Compute the key for a request and return it with any cached response."""
+        key = self.make_key(model, prompt, image_hash)
+        return key, self.get(key)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,147 @@
+# modules/runtime.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from config import (
+    GEMINI_API_KEY,
+    RESPONSE_CACHE_ENABLED,
+    RUNTIME_MAX_WORKERS,
+    UPLOAD_REGISTRY_PATH,
+)
+from modules.image_preprocessor import ImagePreprocessor
+from modules.metrics import Metrics
+from modules.rate_limiter import CallController
+from modules.response_cache import ResponseCache
+from modules.upload_registry import UploadRegistry
+
+
+class Runtime:
+    """Owns the long-lived resources shared by every pipeline component."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        client: Optional[Any] = None,
+        api_key: str = GEMINI_API_KEY,
+        response_cache: Optional[ResponseCache] = None,
+        use_cache: bool = RESPONSE_CACHE_ENABLED,
+        call_controller: Optional[CallController] = None,
+        metrics: Optional[Metrics] = None,
+        image_preprocessor: Optional[ImagePreprocessor] = None,
+    ):
+        """
+        Initialize the runtime.
+
+        Args:
+            max_workers: Size of the shared thread pool (defaults to
+                RUNTIME_MAX_WORKERS, or a CPU-based size when that is 0)
+            client: Pre-built Gemini client; created lazily when omitted
+            api_key: API key used when the client is created lazily
+            response_cache: Pre-built response cache; created lazily when omitted
+            use_cache: Whether Gemini responses should be cached at all
+            call_controller: Rate limit/retry controller shared by every Gemini call
+            metrics: Metrics registry shared by every component
+            image_preprocessor: Pre-built scan preprocessor; created lazily
+                from the IMAGE_* settings when omitted
+        """
+        self.max_workers = (
+            max_workers or RUNTIME_MAX_WORKERS or min(32, (os.cpu_count() or 1) + 4)
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="article-runtime"
+        )
+        self._client = client
+        self._api_key = api_key
+        self._response_cache = response_cache
+        self.use_cache = use_cache or response_cache is not None
+        self._upload_registry: Optional[UploadRegistry] = None
+        self._call_controller = call_controller
+        self.metrics = metrics or Metrics()
+        self._image_preprocessor = image_preprocessor
+
+        # ThreadPoolExecutor exposes no public queue depth; read its internals
+        self.metrics.register_probe(
+            "executor_queue_depth", lambda: self.executor._work_queue.qsize()
+        )
+        self.metrics.register_probe(
+            "executor_threads", lambda: len(self.executor._threads)
+        )
+
+    @property
+    def client(self) -> Any:
+        """Single Gemini client reused (with its connection pool) by all callers."""
+        if self._client is None:
+            # The SDK takes most of the start-up time; load it on first use
+            from google.genai import Client
+
+            self._client = Client(api_key=self._api_key)
+        return self._client
+
+    @property
+    def response_cache(self) -> Optional[ResponseCache]:
+        """Shared response cache, or None when caching is disabled."""
+        if self.use_cache and self._response_cache is None:
+            self._response_cache = ResponseCache()
+        return self._response_cache
+
+    @property
+    def call_controller(self) -> CallController:
+        """Rate limiter, adaptive concurrency and retry policy for Gemini calls."""
+        if self._call_controller is None:
+            self._call_controller = CallController()
+        if self._call_controller.metrics is None:
+            self._call_controller.metrics = self.metrics
+        return self._call_controller
+
+    @property
+    def upload_registry(self) -> UploadRegistry:
+        """Shared registry of uploaded image handles (persisted with the cache)."""
+        if self._upload_registry is None:
+            self._upload_registry = UploadRegistry(
+                path=None if not self.use_cache else UPLOAD_REGISTRY_PATH
+            )
+        return self._upload_registry
+
+    @property
+    def image_preprocessor(self) -> ImagePreprocessor:
+        """Shrinks scans before upload (a no-op unless IMAGE_PREPROCESS is set)."""
+        if self._image_preprocessor is None:
+            self._image_preprocessor = ImagePreprocessor()
+        if self._image_preprocessor.executor is None:
+            self._image_preprocessor.executor = self.executor
+        if self._image_preprocessor.metrics is None:
+            self._image_preprocessor.metrics = self.metrics
+        return self._image_preprocessor
+
+    def close(self):
+        """Shut down the shared executor and release the client and caches."""
+        self.executor.shutdown(wait=True)
+        if self._image_preprocessor is not None:
+            self._image_preprocessor.close()
+        if self._response_cache is not None:
+            self._response_cache.close()
+        if self._upload_registry is not None:
+            self._upload_registry.close()
+        close = getattr(self._client, "close", None)
+        if callable(close):
+            close()
+
+    async def __aenter__(self):
+        """Support for async context manager"""
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Clean up resources when exiting async context"""
+        self.close()
+
+
+_default_runtime: Optional[Runtime] = None
+
+
+def get_default_runtime() -> Runtime:
+    """Return the process-wide runtime used when none is passed explicitly."""
+    global _default_runtime
+    if _default_runtime is None:
+        _default_runtime = Runtime()
+    return _default_runtime
@@ -0,0 +1,633 @@
+# modules/service.py
+import asyncio
+import email.parser
+import email.policy
+import itertools
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from config import (
+    INPUT_FOLDER,
+    PROCESSED_FOLDER,
+    SERVICE_MAX_UPLOAD_MB,
+    SERVICE_QUEUE_SIZE,
+    SERVICE_RETAIN_JOBS,
+    SERVICE_UPLOAD_FOLDER,
+    SERVICE_WORKERS,
+)
+from modules.discovery import IMAGE_EXTENSIONS
+from modules.metrics import Metrics
+from modules.output_store import OutputReader
+from modules.work_queue import ArticleJob
+
+FINISHED = ("succeeded", "failed")
+
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+# Form fields read as text from a multipart upload
+_TEXT_FIELDS = ("name", "priority")
+
+_REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+@dataclass
+class ServiceJob:
+    """One submitted article and its progress through the service queue."""
+
+    id: str
+    job: ArticleJob
+    priority: int = 0
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Upload folder removed once the article is processed
+    cleanup: Optional[str] = None
+    # Replaced (after being set) on every status change
+    changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status as returned by the API."""
+        status: Dict[str, Any] = {
+            "id": self.id,
+            "name": self.job.name,
+            "status": self.status,
+            "priority": self.priority,
+            "submitted_at": self.submitted_at,
+        }
+        if self.started_at is not None:
+            status["queued_seconds"] = self.started_at - self.submitted_at
+        if self.finished_at is not None and self.started_at is not None:
+            status["elapsed_seconds"] = self.finished_at - self.started_at
+        if self.error is not None:
+            status["error"] = self.error
+        return status
+
+
+class JobService:
+    """Bounded, prioritized in-process queue in front of a warm article handler.
+
+    Jobs with a higher priority run first (first come, first served within a
+    priority). Submissions beyond `max_queued` waiting jobs are refused rather
+    than queued without limit, so callers can back off.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[ArticleJob], Awaitable[Dict[str, Any]]],
+        workers: int = SERVICE_WORKERS,
+        max_queued: int = SERVICE_QUEUE_SIZE,
+        retain: int = SERVICE_RETAIN_JOBS,
+        executor: Optional[Executor] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        """
+        Initialize the job service.
+
+        Args:
+            handler: Coroutine function that processes a single article
+            workers: Number of articles processed concurrently
+            max_queued: Waiting jobs accepted before submissions are refused
+            retain: Finished jobs kept for status and result requests
+            executor: Thread pool removing processed uploads (None: the loop's default)
+            metrics: Registry receiving queue depth, wait and run times
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.retain = max(1, retain)
+        self.executor = executor
+        self.metrics = metrics
+        self.jobs: Dict[str, ServiceJob] = {}
+        self._finished: deque = deque()
+        self.running = 0
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue(
+            maxsize=max(1, max_queued)
+        )
+        self._order = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._busy: set = set()
+        self._closing = False
+        if self.metrics is not None:
+            self.metrics.register_probe("service_queue_depth", self._queue.qsize)
+            self.metrics.register_probe("service_running", lambda: self.running)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._work()) for _ in range(self.workers)
+            ]
+
+    def submit(
+        self,
+        job: ArticleJob,
+        priority: int = 0,
+        job_id: Optional[str] = None,
+        cleanup: Optional[str] = None,
+    ) -> ServiceJob:
+        """
+        Queue an article.
+
+        Args:
+            job: Article to process
+            priority: Higher values run first
+            job_id: Identifier to use (a random one when omitted)
+            cleanup: Folder deleted once the article is processed
+
+        Returns:
+            The queued job
+
+        Raises:
+            asyncio.QueueFull: When the queue is full or the service is stopping
+        """
+        if self._closing:
+            raise asyncio.QueueFull("The service is shutting down")
+        service_job = ServiceJob(
+            job_id or uuid.uuid4().hex, job, priority, cleanup=cleanup
+        )
+        self._queue.put_nowait((-priority, next(self._order), service_job))
+        self.jobs[service_job.id] = service_job
+        if self.metrics is not None:
+            self.metrics.incr("service_jobs_total", status="queued")
+        return service_job
+
+    def get(self, job_id: str) -> Optional[ServiceJob]:
+        return self.jobs.get(job_id)
+
+    def _set_status(self, service_job: ServiceJob, status: str):
+        service_job.status = status
+        changed, service_job.changed = service_job.changed, asyncio.Event()
+        changed.set()
+
+    async def _run(self, service_job: ServiceJob):
+        service_job.started_at = time.time()
+        self._set_status(service_job, "running")
+        if self.metrics is not None:
+            self.metrics.observe(
+                "service_queue_wait_seconds",
+                service_job.started_at - service_job.submitted_at,
+            )
+        try:
+            service_job.result = await self.handler(service_job.job)
+            status = "succeeded"
+        except Exception as e:
+            service_job.error = str(e)
+            status = "failed"
+        service_job.finished_at = time.time()
+        if service_job.cleanup:
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, shutil.rmtree, service_job.cleanup, True
+            )
+        if self.metrics is not None:
+            self.metrics.incr("service_jobs_total", status=status)
+            self.metrics.observe(
+                "service_job_seconds",
+                service_job.finished_at - service_job.started_at,
+            )
+        self._set_status(service_job, status)
+        # Forget the oldest finished jobs beyond the retention limit
+        self._finished.append(service_job.id)
+        while len(self._finished) > self.retain:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    async def _work(self):
+        while True:
+            _, _, service_job = await self._queue.get()
+            task = asyncio.current_task()
+            self._busy.add(task)
+            self.running += 1
+            try:
+                await self._run(service_job)
+            finally:
+                self.running -= 1
+                self._busy.discard(task)
+            if self._closing:
+                return
+
+    async def wait(self, service_job: ServiceJob, timeout: float) -> ServiceJob:
+        """Wait up to `timeout` seconds for a job to finish (long polling)."""
+        deadline = time.monotonic() + timeout
+        while not service_job.finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(service_job.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return service_job
+
+    async def watch(self, service_job: ServiceJob) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job's status now and after every change until it finishes."""
+        while True:
+            changed = service_job.changed
+            yield service_job.to_dict()
+            if service_job.finished:
+                return
+            await changed.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for service_job in self.jobs.values():
+            counts[service_job.status] = counts.get(service_job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "jobs": counts,
+        }
+
+    async def stop(self):
+        """Refuse new jobs, let running articles finish and stop the workers."""
+        self._closing = True
+        for task in self._tasks:
+            if task not in self._busy:
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes
+
+
+def _safe_name(name: str) -> str:
+    """Article name usable as an output file name."""
+    name = _UNSAFE_NAME.sub("_", name).strip("._")
+    if not name:
+        raise HTTPError(400, "Invalid article name")
+    return name
+
+
+def _parse_multipart(content_type: str, body: bytes) -> Dict[str, Tuple[str, bytes]]:
+    """Fields of a multipart/form-data body as name -> (filename, data)."""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    if not message.is_multipart():
+        raise HTTPError(400, "Malformed multipart body")
+    fields: Dict[str, Tuple[str, bytes]] = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            payload = part.get_payload(decode=True)
+            fields[str(name)] = (part.get_filename() or "", payload or b"")
+    return fields
+
+
+class ServiceAPI:
+    """Minimal asyncio HTTP/1.1 front end for a JobService.
+
+    Routes:
+        POST /jobs                 submit multipart (image, xml files) or JSON
+                                   ({"image_path", "xml_path"}); optional
+                                   "name" and "priority" fields
+        GET  /jobs/<id>?wait=<s>   status, optionally long-polling until done
+        GET  /jobs/<id>/events     status changes as JSON lines until done
+        GET  /jobs/<id>/result     outputs of a finished job
+        GET  /health               queue and worker counts
+        GET  /metrics              metrics in the Prometheus text format
+    """
+
+    def __init__(
+        self,
+        service: JobService,
+        executor: Optional[Executor] = None,
+        upload_dir: str = SERVICE_UPLOAD_FOLDER,
+        input_root: str = INPUT_FOLDER,
+        output_dir: str = PROCESSED_FOLDER,
+        max_body: int = SERVICE_MAX_UPLOAD_MB << 20,
+        metrics: Optional[Metrics] = None,
+    ):
+        """
+        Initialize the API.
+
+        Args:
+            service: Job queue the submitted articles go to
+            executor: Thread pool for body parsing and file writes
+            upload_dir: Folder holding uploaded articles until they are processed
+            input_root: Only files under this folder can be submitted by path
+            output_dir: Folder the processed articles are saved to
+            max_body: Largest accepted request body in bytes
+            metrics: Registry receiving request counts and latencies
+        """
+        self.service = service
+        self.executor = executor
+        self.upload_dir = upload_dir
+        self.input_root = os.path.realpath(input_root)
+        self.output_dir = output_dir
+        self.max_body = max_body
+        self.metrics = metrics
+
+    async def serve(self, host: str, port: int) -> asyncio.Server:
+        """Start listening; returns the server (port 0 picks a free port)."""
+        self.service.start()
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve the requests of one (keep-alive) connection."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send(writer, e.status, {"error": str(e)}, close=True)
+                    return
+                if request is None:
+                    return
+                close = request.headers.get("connection", "").lower() == "close"
+                if not await self._dispatch(request, writer, close):
+                    return
+                if close:
+                    return
+        except (
+            ConnectionError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        if reader.at_eof():
+            return None
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HTTPError(400, "Content-Length must be an integer")
+        if length < 0:
+            raise HTTPError(400, "Content-Length must not be negative")
+        if length > self.max_body:
+            raise HTTPError(413, f"Request body over {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return Request(method.upper(), url.path, parse_qs(url.query), headers, body)
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Any,
+        headers: Optional[Dict[str, str]] = None,
+        close: bool = False,
+        content_type: str = "application/json",
+    ):
+        body = (
+            payload.encode()
+            if isinstance(payload, str)
+            else json.dumps(payload, ensure_ascii=False).encode()
+        )
+        lines = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+        ]
+        lines += [f"{key}: {value}" for key, value in (headers or {}).items()]
+        if close:
+            lines.append("Connection: close")
+        writer.write("\r\n".join(lines).encode() + b"\r\n\r\n" + body)
+        await writer.drain()
+
+    async def _dispatch(
+        self, request: Request, writer: asyncio.StreamWriter, close: bool
+    ) -> bool:
+        """Answer one request; returns False when the connection was consumed."""
+        start = time.perf_counter()
+        parts = request.path.strip("/").split("/")
+        route = parts[0] if len(parts) < 3 else f"{parts[0]}/{parts[2]}"
+        status = 500
+        try:
+            if request.path == "/jobs" and request.method == "POST":
+                service_job = await self._submit(request)
+                status = 202
+                await self._send(
+                    writer,
+                    status,
+                    service_job.to_dict(),
+                    {"Location": f"/jobs/{service_job.id}"},
+                    close,
+                )
+            elif parts[0] == "jobs" and len(parts) in (2, 3):
+                if request.method != "GET":
+                    raise HTTPError(405, "Method not allowed")
+                service_job = self.service.get(parts[1])
+                if service_job is None:
+                    raise HTTPError(404, f"Unknown job '{parts[1]}'")
+                if len(parts) == 2:
+                    try:
+                        wait = float(request.query.get("wait", ["0"])[0] or 0)
+                    except ValueError:
+                        raise HTTPError(400, "wait must be a number of seconds")
+                    if wait > 0:
+                        await self.service.wait(service_job, min(wait, 300))
+                    status = 200
+                    await self._send(writer, status, service_job.to_dict(), close=close)
+                elif parts[2] == "events":
+                    status = 200
+                    await self._stream_events(writer, service_job)
+                    return False
+                elif parts[2] == "result":
+                    if not service_job.finished:
+                        raise HTTPError(409, "Job has not finished yet")
+                    status = 200
+                    await self._send(
+                        writer, status, self._result(service_job), close=close
+                    )
+                else:
+                    raise HTTPError(404, "Not found")
+            elif request.path == "/health" and request.method == "GET":
+                status = 200
+                await self._send(writer, status, self.service.stats(), close=close)
+            elif request.path == "/metrics" and request.method == "GET":
+                status = 200
+                text = self.metrics.to_prometheus() if self.metrics is not None else ""
+                await self._send(
+                    writer, status, text, close=close, content_type="text/plain"
+                )
+            else:
+                raise HTTPError(404, "Not found")
+        except HTTPError as e:
+            status = e.status
+            headers = {"Retry-After": "1"} if status == 503 else None
+            await self._send(writer, status, {"error": str(e)}, headers, close)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            await self._send(writer, status, {"error": str(e)}, close=True)
+            return False
+        finally:
+            if self.metrics is not None:
+                self.metrics.incr(
+                    "service_requests_total", route=route, status=str(status)
+                )
+                self.metrics.observe(
+                    "service_request_seconds", time.perf_counter() - start, route=route
+                )
+        return True
+
+    async def _stream_events(
+        self, writer: asyncio.StreamWriter, service_job: ServiceJob
+    ):
+        """Send each status change as one JSON line, then close the connection."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        async for status in self.service.watch(service_job):
+            writer.write(json.dumps(status).encode() + b"\n")
+            await writer.drain()
+
+    def _result(self, service_job: ServiceJob) -> Dict[str, Any]:
+        outputs = service_job.result or {}
+        if (
+            service_job.status == "succeeded"
+            and outputs.get("combined_content") is None
+        ):
+            # Skipped as unchanged by the manifest: read the earlier outputs back
+            outputs = {
+                **outputs,
+                **(OutputReader(self.output_dir).get(service_job.job.name) or {}),
+            }
+        return {**service_job.to_dict(), **outputs}
+
+    async def _submit(self, request: Request) -> ServiceJob:
+        content_type = request.headers.get("content-type", "")
+        loop = asyncio.get_running_loop()
+        job_id = uuid.uuid4().hex
+        cleanup = None
+        if content_type.startswith("multipart/form-data"):
+            fields = await loop.run_in_executor(
+                self.executor, _parse_multipart, content_type, request.body
+            )
+            job, cleanup = await loop.run_in_executor(
+                self.executor, self._save_upload, job_id, fields
+            )
+            # Only the text fields; "image" and "xml" are the uploaded files
+            options = {
+                key: fields[key][1].decode("utf-8", "replace")
+                for key in _TEXT_FIELDS
+                if key in fields
+            }
+        elif content_type.startswith("application/json"):
+            try:
+                options = json.loads(request.body or b"{}")
+            except json.JSONDecodeError:
+                raise HTTPError(400, "Malformed JSON body")
+            if not isinstance(options, dict):
+                raise HTTPError(400, "Expected a JSON object")
+            job = self._job_from_paths(options)
+        else:
+            raise HTTPError(415, "Send multipart/form-data or application/json")
+
+        try:
+            try:
+                priority = int(options.get("priority") or 0)
+            except (TypeError, ValueError):
+                raise HTTPError(400, "priority must be an integer")
+            try:
+                return self.service.submit(job, priority, job_id, cleanup)
+            except asyncio.QueueFull:
+                raise HTTPError(503, "Job queue is full; retry later")
+        except BaseException:
+            # The job never reached the queue; nothing else removes its upload
+            if cleanup:
+                await loop.run_in_executor(self.executor, shutil.rmtree, cleanup, True)
+            raise
+
+    def _save_upload(
+        self, job_id: str, fields: Dict[str, Tuple[str, bytes]]
+    ) -> Tuple[ArticleJob, str]:
+        """Write an uploaded (image, xml) pair to its own folder."""
+        if "image" not in fields or "xml" not in fields:
+            raise HTTPError(400, "Upload both an 'image' and an 'xml' file")
+        image_name, image = fields["image"]
+        stem, extension = os.path.splitext(os.path.basename(image_name))
+        extension = extension.lower() or ".png"
+        if extension not in IMAGE_EXTENSIONS:
+            raise HTTPError(400, f"Unsupported image type '{extension}'")
+        name_field = fields.get("name", ("", b""))[1].decode("utf-8", "replace")
+        name = _safe_name(name_field or stem or job_id)
+
+        directory = os.path.join(self.upload_dir, job_id)
+        os.makedirs(directory, exist_ok=True)
+        image_path = os.path.join(directory, f"{name}{extension}")
+        xml_path = os.path.join(directory, f"{name}.xml")
+        try:
+            for path, data in ((image_path, image), (xml_path, fields["xml"][1])):
+                with open(path, "wb") as f:
+                    f.write(data)
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return ArticleJob(name, image_path, xml_path), directory
+
+    def _resolve(self, path: str) -> str:
+        """Absolute path of a submitted input, which must be under input_root."""
+        path = os.path.realpath(os.path.join(self.input_root, path))
+        if os.path.commonpath([path, self.input_root]) != self.input_root:
+            raise HTTPError(403, f"'{path}' is outside the input folder")
+        if not os.path.isfile(path):
+            raise HTTPError(404, f"'{path}' does not exist")
+        return path
+
+    def _job_from_paths(self, options: Dict[str, Any]) -> ArticleJob:
+        if not options.get("image_path"):
+            raise HTTPError(400, "image_path is required")
+        image_path = self._resolve(str(options["image_path"]))
+        stem = os.path.splitext(image_path)[0]
+        xml_path = self._resolve(str(options.get("xml_path") or f"{stem}.xml"))
+        name = _safe_name(str(options.get("name") or os.path.basename(stem)))
+        return ArticleJob(name, image_path, xml_path)
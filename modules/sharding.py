@@ -0,0 +1,47 @@
+# modules/sharding.py
+import hashlib
+from typing import Iterable, Iterator, Tuple
+
+from modules.work_queue import ArticleJob
+
+
+def shard_of(name: str, count: int, salt: str = "") -> int:
+    """
+    Deterministically map an article name to one of `count` shards.
+
+    Uses a content hash rather than hash(), which is randomized per process,
+    so every process and every machine agrees on the assignment.
+
+    Args:
+        name: Article base name
+        count: Number of shards
+        salt: Distinguishes independent levels of sharding (machines/processes)
+
+    Returns:
+        Shard index in [0, count)
+    """
+    if count <= 1:
+        return 0
+    digest = hashlib.blake2b(f"{salt}{name}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse an 'INDEX/COUNT' shard spec such as '0/4'."""
+    index, _, count = spec.partition("/")
+    try:
+        shard = (int(index), int(count))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected INDEX/COUNT") from None
+    if not 0 <= shard[0] < shard[1]:
+        raise ValueError(f"Shard index must be in [0, {shard[1]}), got {shard[0]}")
+    return shard
+
+
+def select_shard(
+    jobs: Iterable[ArticleJob], index: int, count: int, salt: str = ""
+) -> Iterator[ArticleJob]:
+    """Lazily keep only the jobs assigned to shard `index` of `count`."""
+    for job in jobs:
+        if shard_of(job.name, count, salt) == index:
+            yield job
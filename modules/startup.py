@@ -0,0 +1,116 @@
+# modules/startup.py
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Packages whose import is expensive; the report shows which phase loaded them
+HEAVY_PACKAGES = ("google.genai", "httpx", "pydantic", "PIL", "dotenv", "orjson")
+
+
+def parse_importtime(output: str) -> List[Tuple[str, float, int]]:
+    """
+    Parse `python -X importtime` output.
+
+    Args:
+        output: The interpreter's stderr
+
+    Returns:
+        (module, self seconds, nesting depth) of every import, in load order
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # The column header
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(fields[0]) / 1e6, depth))
+    return imports
+
+
+def import_costs(
+    module: str = "main", cwd: Optional[str] = None, top: int = 10
+) -> Dict[str, Any]:
+    """
+    Measure a cold import of `module` in a fresh interpreter.
+
+    Args:
+        module: Module to import
+        cwd: Directory to run the interpreter in (defaults to this project)
+        top: Number of packages listed
+
+    Returns:
+        Interpreter wall time, total import time and the most expensive
+        top-level packages
+    """
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    packages: Dict[str, float] = {}
+    for name, seconds, _ in parse_importtime(result.stderr):
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + seconds
+    return {
+        "interpreter_seconds": wall,
+        "import_seconds": sum(packages.values()),
+        "packages": sorted(packages.items(), key=lambda item: -item[1])[:top],
+    }
+
+
+def _loaded() -> List[str]:
+    return [name for name in HEAVY_PACKAGES if name in sys.modules]
+
+
+class StartupProfile:
+    """Times the start-up phases of a run for `--profile-startup`."""
+
+    def __init__(self):
+        self.phases: List[Dict[str, Any]] = []
+        self.imports: Optional[Dict[str, Any]] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase; an error is recorded instead of ending the profile."""
+        before = _loaded()
+        start = time.perf_counter()
+        record: Dict[str, Any] = {"name": name}
+        try:
+            yield
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["seconds"] = time.perf_counter() - start
+        record["loaded"] = [package for package in _loaded() if package not in before]
+        self.phases.append(record)
+
+    def report(self) -> Dict[str, Any]:
+        return {"imports": self.imports, "phases": self.phases, "loaded": _loaded()}
+
+    def print_report(self):
+        if self.imports is not None:
+            print(
+                f"Cold start: {self.imports['interpreter_seconds'] * 1000:.0f} ms "
+                f"(imports {self.imports['import_seconds'] * 1000:.0f} ms)"
+            )
+            for package, seconds in self.imports["packages"]:
+                print(f"  import {package:<28} {seconds * 1000:8.1f} ms")
+        print("Initialization:")
+        for record in self.phases:
+            notes = [f"loads {', '.join(record['loaded'])}"] if record["loaded"] else []
+            if "error" in record:
+                notes.append(record["error"])
+            note = f"  ({'; '.join(notes)})" if notes else ""
+            print(f"  {record['name']:<28} {record['seconds'] * 1000:8.1f} ms{note}")
@@ -0,0 +1,165 @@
+# modules/upload_registry.py
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import UPLOAD_REGISTRY_PATH, UPLOAD_TTL
+
+# Seconds between sweeps of old handles out of memory
+_SWEEP_INTERVAL = 60.0
+
+
+class UploadRegistry:
+    """Tracks uploaded Gemini file handles by content hash until they expire."""
+
+    def __init__(
+        self, path: Optional[str] = UPLOAD_REGISTRY_PATH, ttl: float = UPLOAD_TTL
+    ):
+        """
+        Initialize the upload registry.
+
+        Args:
+            path: SQLite file used to remember uploads across runs; None keeps
+                handles in memory only
+            ttl: Seconds a handle is reused when the upload response carries
+                no expiration time of its own; handles are also only kept in
+                memory this long (the database keeps them until they expire)
+        """
+        self.ttl = ttl
+        self.stats: Dict[str, int] = {"reused": 0, "uploaded": 0, "expired": 0}
+        # content hash -> (handle, expires, time it was stored in memory)
+        self._handles: Dict[str, Tuple[Any, float, float]] = {}
+        self._lock = threading.Lock()
+        # content hash -> [lock, callers using it]; dropped once unused
+        self._key_locks: Dict[str, List[Any]] = {}
+        self._swept = time.time()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(
+                path,
+                check_same_thread=False,
+                # Shard processes share the database; wait out their writes
+                timeout=30,
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "hash TEXT PRIMARY KEY, name TEXT, uri TEXT, "
+                "mime_type TEXT, expires REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expiry_of(self, handle: Any) -> float:
+        """Use the server-reported expiration when available, else the local TTL."""
+        expiration = getattr(handle, "expiration_time", None)
+        if expiration is not None:
+            # Keep a safety margin so a handle never expires mid-request
+            return expiration.timestamp() - 300
+        return time.time() + self.ttl
+
+    def _load(self, content_hash: str) -> Optional[Tuple[Any, float]]:
+        """Restore a persisted handle from the previous run, if still valid."""
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT name, uri, mime_type, expires FROM uploads WHERE hash = ?",
+                (content_hash,),
+            ).fetchone()
+        if row is None:
+            return None
+        name, uri, mime_type, expires = row
+        from google.genai import types
+
+        return types.File(name=name, uri=uri, mime_type=mime_type), expires
+
+    def _sweep(self, now: float):
+        """Drop expired handles and those held longer than the TTL - under _lock."""
+        self._swept = now
+        for content_hash, (_, expires, stored) in list(self._handles.items()):
+            if expires <= now or now - stored > self.ttl:
+                del self._handles[content_hash]
+
+    def _remember(self, content_hash: str, handle: Any, expires: float):
+        """Keep a handle in memory - under _lock."""
+        now = time.time()
+        if now - self._swept > _SWEEP_INTERVAL:
+            self._sweep(now)
+        self._handles[content_hash] = (handle, expires, now)
+
+    def _store(self, content_hash: str, handle: Any, expires: float):
+        with self._lock:
+            self._remember(content_hash, handle, expires)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                    (
+                        content_hash,
+                        getattr(handle, "name", None),
+                        getattr(handle, "uri", None),
+                        getattr(handle, "mime_type", None),
+                        expires,
+                    ),
+                )
+                self._db.commit()
+
+    def get_or_upload(self, content_hash: str, upload: Callable[[], Any]) -> Any:
+        """
+        Return a valid handle for the content, uploading it only when needed.
+
+        Concurrent callers for the same content wait for a single upload.
+
+        Args:
+            content_hash: Hash of the file contents
+            upload: Callable performing the actual upload
+
+        Returns:
+            The uploaded file handle
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(content_hash, [threading.Lock(), 0])
+            key_lock[1] += 1
+
+        try:
+            with key_lock[0]:
+                return self._get_or_upload(content_hash, upload)
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[content_hash]
+
+    def _get_or_upload(self, content_hash: str, upload: Callable[[], Any]) -> Any:
+        cached = self._handles.get(content_hash)
+        entry = cached[:2] if cached is not None else self._load(content_hash)
+        if entry is not None:
+            handle, expires = entry
+            if expires > time.time():
+                if cached is None:
+                    with self._lock:
+                        self._remember(content_hash, handle, expires)
+                self.stats["reused"] += 1
+                return handle
+            self.stats["expired"] += 1
+
+        handle = upload()
+        self._store(content_hash, handle, self._expiry_of(handle))
+        self.stats["uploaded"] += 1
+        return handle
+
+    def invalidate(self, content_hash: str):
+        """Forget a handle, e.g. after the server rejected it."""
+        with self._lock:
+            self._handles.pop(content_hash, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM uploads WHERE hash = ?", (content_hash,))
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
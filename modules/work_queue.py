@@ -0,0 +1,133 @@
+# modules/work_queue.py
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+@dataclass
+class ArticleJob:
+    """A single (png, xml) pair waiting to be processed."""
+
+    name: str
+    image_path: str
+    xml_path: str
+
+
+@dataclass
+class JobResult:
+    """Outcome of one article, reported as soon as its worker finishes."""
+
+    job: ArticleJob
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class WorkQueueSummary:
+    """Aggregate counters for a finished run; only failures are retained."""
+
+    succeeded: int = 0
+    failed: int = 0
+    failures: List[JobResult] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.succeeded + self.failed
+
+
+class WorkQueue:
+    """Bounded producer/worker pool that streams jobs to a fixed number of workers."""
+
+    def __init__(
+        self,
+        handler: Callable[[ArticleJob], Awaitable[Dict[str, Any]]],
+        workers: int = 1,
+        max_pending: Optional[int] = None,
+    ):
+        """
+        Initialize the work queue.
+
+        Args:
+            handler: Coroutine function that processes a single job
+            workers: Number of concurrent workers
+            max_pending: Maximum number of queued jobs before the producer blocks
+                (defaults to twice the worker count)
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max_pending or self.workers * 2
+
+    async def _produce(self, queue: asyncio.Queue, jobs: Iterable[ArticleJob]):
+        """Feed jobs into the queue, blocking whenever it is full."""
+        try:
+            for job in jobs:
+                await queue.put(job)
+        finally:
+            # One sentinel per worker so every worker exits cleanly
+            for _ in range(self.workers):
+                await queue.put(None)
+
+    async def _work(
+        self,
+        queue: asyncio.Queue,
+        summary: WorkQueueSummary,
+        on_result: Optional[Callable[[JobResult], None]],
+    ):
+        """Pick up the next job as soon as the previous one finishes."""
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+
+            start = time.perf_counter()
+            try:
+                result = JobResult(job, result=await self.handler(job))
+                summary.succeeded += 1
+            except Exception as e:
+                result = JobResult(job, error=e)
+                summary.failed += 1
+                summary.failures.append(result)
+            result.elapsed = time.perf_counter() - start
+
+            if on_result:
+                on_result(result)
+
+    async def run(
+        self,
+        jobs: Iterable[ArticleJob],
+        on_result: Optional[Callable[[JobResult], None]] = None,
+    ) -> WorkQueueSummary:
+        """
+        Process all jobs with bounded concurrency.
+
+        Args:
+            jobs: Iterable of jobs; consumed lazily by the producer
+            on_result: Optional callback invoked with each job's result
+
+        Returns:
+            Summary of the run including any failed jobs
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        summary = WorkQueueSummary()
+
+        workers = [
+            asyncio.create_task(self._work(queue, summary, on_result))
+            for _ in range(self.workers)
+        ]
+        await asyncio.gather(self._produce(queue, jobs), *workers)
+
+        return summary
+
+
+def report_result(result: JobResult) -> None:
+    """Print a one-line status for a finished job."""
+    if result.ok:
+        print(f"✔ {result.job.name} processed in {result.elapsed:.2f}s")
+    else:
+        print(f"✘ {result.job.name} failed after {result.elapsed:.2f}s: {result.error}")
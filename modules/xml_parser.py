@@ -1,60 +1,139 @@
 # modules/xml_parser.py
 import asyncio
-import xml.etree.ElementTree as ET
-from typing import Dict, Any
+from xml.parsers import expat
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
+from config import XML_METADATA_FIELDS
+from modules.runtime import Runtime, get_default_runtime
 
-class XMLParser:
-    def _parse_element(self, element: ET.Element) -> Dict[str, Any]:
-        """Recursively parse an XML element and its children."""
-        result = {}
-
-        # If the element has children
-        if len(element) > 0:
-            children_data = {}
-            for child in element:
-                child_data = self._parse_element(child)
-
-                # Handle the child's data
-                if child.tag in children_data:
-                    # If this tag already exists, convert to list or append
-                    if not isinstance(children_data[child.tag], list):
-                        children_data[child.tag] = [children_data[child.tag]]
-                    if isinstance(child_data[child.tag], list):
-                        # If child_data is already a list, extend it
-                        children_data[child.tag].extend(child_data[child.tag])
-                    else:
-                        # If child_data is not a list, append it
-                        children_data[child.tag].append(child_data[child.tag])
-                else:
-                    # First occurrence of this tag
-                    children_data[child.tag] = child_data[child.tag]
-
-            result[element.tag] = children_data
+
+class _Frame:
+    """Conversion state for one open element while streaming."""
+
+    __slots__ = ("tag", "children", "lists", "text", "keep")
+
+    def __init__(self, tag: str, keep: bool):
+        self.tag = tag
+        self.children: Optional[Dict[str, Any]] = None
+        # Tags already promoted to a list, so repeats append without type checks
+        self.lists: Optional[Set[str]] = None
+        self.text: List[str] = []
+        self.keep = keep
+
+    def add(self, tag: str, value: Any):
+        children = self.children
+        if children is None:
+            self.children = {tag: value}
+        elif tag not in children:
+            children[tag] = value
+        elif self.lists is not None and tag in self.lists:
+            children[tag].append(value)
         else:
-            # Element has no children, just text
-            result[element.tag] = element.text.strip() if element.text else ""
+            children[tag] = [children[tag], value]
+            if self.lists is None:
+                self.lists = set()
+            self.lists.add(tag)
 
-        return result
 
-    def _parse_xml_metadata(self, xml_path: str) -> Dict[str, Any]:
-        """Parse the XML metadata file and extract structured information with any level of nesting."""
-        try:
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
+class XMLParser:
+    def __init__(
+        self,
+        runtime: Optional[Runtime] = None,
+        fields: Optional[Iterable[str]] = None,
+    ):
+        """
+        Initialize the XMLParser.
+
+        Args:
+            runtime: Shared runtime providing the executor
+            fields: Optional selectors ("mainContent/paragraph", "heading", ...)
+                relative to the root; only matching subtrees are extracted
+        """
+        self.runtime = runtime or get_default_runtime()
+        if fields is None:
+            fields = XML_METADATA_FIELDS
+        self.selectors: List[Tuple[str, ...]] = [
+            tuple(filter(None, field.split("/"))) for field in fields if field.strip()
+        ]
 
-            # Use a recursive function to handle elements at any nesting level
-            metadata = self._parse_element(root)
+    def _selected(self, path: Tuple[str, ...]) -> bool:
+        """True when the path lies on or below (or leads to) a selected field."""
+        return any(
+            selector[: len(path)] == path[: len(selector)]
+            for selector in self.selectors
+        )
 
-            # Since we want the root element's children as the top level, not the root itself
-            if (
-                isinstance(metadata, dict)
-                and len(metadata) == 1
-                and root.tag in metadata
-            ):
-                metadata = metadata[root.tag]
+    def _stream_convert(self, xml_path: str) -> Any:
+        """Stream the document into nested dicts without building an element tree.
 
-            return metadata
+        Produces the same shape as a recursive conversion: an element with
+        children becomes a dict keyed by child tag (repeated tags become lists)
+        and a leaf becomes its stripped text. Only the open elements are held
+        in memory, so depth is not bound by the recursion limit.
+        """
+        stack: List[_Frame] = []
+        path: List[str] = []
+        selectors = self.selectors
+        selected: Dict[Tuple[str, ...], bool] = {}
+        result: List[Any] = [{}]
+
+        def start(tag: str, attrs: Dict[str, str]):
+            if "}" in tag:
+                # Match ElementTree's "{namespace}tag" naming
+                tag = "{" + tag
+            keep = True
+            if stack:
+                parent = stack[-1]
+                if parent.children is None:
+                    parent.children = {}
+                    parent.text = []
+                keep = parent.keep
+                if selectors:
+                    path.append(tag)
+                    if keep:
+                        key = tuple(path)
+                        keep = selected.get(key)
+                        if keep is None:
+                            keep = selected[key] = self._selected(key)
+            stack.append(_Frame(tag, keep))
+
+        def end(tag: str):
+            frame = stack.pop()
+            if selectors and stack:
+                path.pop()
+            if not frame.keep:
+                return
+            if frame.children is not None:
+                value: Any = frame.children
+            else:
+                value = "".join(frame.text).strip()
+            if stack:
+                stack[-1].add(frame.tag, value)
+            else:
+                # The root element's children form the top level
+                result[0] = value
+
+        def character_data(data: str):
+            frame = stack[-1]
+            # Text of elements with children is not part of the output
+            if frame.children is None and frame.keep:
+                frame.text.append(data)
+
+        parser = expat.ParserCreate(None, "}")
+        parser.buffer_text = True
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = character_data
+
+        with open(xml_path, "rb") as xml_file:
+            parser.ParseFile(xml_file)
+
+        return result[0]
+
+    def _parse_xml_metadata(self, xml_path: str) -> Dict[str, Any]:
+        """Parse the XML metadata file and extract structured information with any level of nesting."""
+        try:
+            return self._stream_convert(xml_path)
         except Exception as e:
             print(f"Error parsing XML: {e}")
             return {}
@@ -62,4 +141,6 @@ class XMLParser:
     async def parse_xml_metadata(self, xml_path: str) -> Dict[str, Any]:
         """Parse the XML metadata file asynchronously."""
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self._parse_xml_metadata, xml_path)
+        return await loop.run_in_executor(
+            self.runtime.executor, self._parse_xml_metadata, xml_path
+        )
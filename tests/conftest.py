@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_client import FakeClient
+from config import RESPONSE_STRUCTURE
+from modules.runtime import Runtime
+
+ARTICLE_XML = "<article><heading>Title</heading></article>"
+
+
+@pytest.fixture
+def make_article(tmp_path):
+    """Write an article's image and XML to tmp_path; returns their paths.
+
+    `image=None` keeps an image the test already saved there.
+    """
+
+    def make(name="a", image=b"png"):
+        image_path, xml_path = tmp_path / f"{name}.png", tmp_path / f"{name}.xml"
+        if image is not None:
+            image_path.write_bytes(image)
+        xml_path.write_text(ARTICLE_XML)
+        return str(image_path), str(xml_path)
+
+    return make
+
+
+@pytest.fixture
+def article(make_article):
+    """Paths of a one-article input "a" (a placeholder image and its XML)."""
+    return make_article()
+
+
+@pytest.fixture
+def make_runtime():
+    """
+    Build runtimes around a FakeClient; each is closed after the test.
+
+    Keyword arguments other than the named Runtime ones configure the fake
+    client's responses (response_chars, stream_chunk_chars, ...). The client
+    is reachable as runtime.client.
+    """
+    runtimes = []
+
+    def make(
+        max_workers=2,
+        response_cache=None,
+        call_controller=None,
+        image_preprocessor=None,
+        **client_options,
+    ) -> Runtime:
+        runtime = Runtime(
+            max_workers=max_workers,
+            client=FakeClient(**client_options),
+            response_cache=response_cache,
+            use_cache=False,
+            call_controller=call_controller,
+            image_preprocessor=image_preprocessor,
+        )
+        runtimes.append(runtime)
+        return runtime
+
+    yield make
+    for runtime in runtimes:
+        runtime.close()
+
+
+@pytest.fixture
+def process_article(article, tmp_path):
+    """Run the `article` input through an agent, saving to tmp_path/out."""
+
+    def process(agent):
+        return asyncio.run(
+            agent.process_article(
+                *article, "a", RESPONSE_STRUCTURE, str(tmp_path / "out")
+            )
+        )
+
+    return process
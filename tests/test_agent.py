@@ -0,0 +1,159 @@
+import asyncio
+import os
+
+from config import RESPONSE_STRUCTURE
+from modules.agent import ArticleProcessorAgent, merge_chunks
+from modules.ai_processor import AIProcessor
+from modules.article_context import ArticleContext
+from modules.response_cache import ResponseCache
+
+
+def test_fused_mode_renders_html_locally(tmp_path, make_runtime, process_article):
+    runtime = make_runtime()
+    result = process_article(ArticleProcessorAgent(runtime, fused=True))
+
+    # One upload plus a single generate call
+    assert runtime.client.calls == 2
+    assert result["combined_content"]["title"] == "Fake title"
+    assert "<h1>Fake title</h1>" in result["html_content"]
+    assert result["raw_image_text"] is None
+    # The page is written chunk by chunk while it is rendered, not again on save
+    page = tmp_path / "out" / "a.html"
+    assert result["output_files"].count(str(page)) == 1
+    assert page.read_text(encoding="utf-8") == result["html_content"]
+
+
+def test_fused_mode_can_keep_raw_text(tmp_path, make_runtime, process_article):
+    agent = ArticleProcessorAgent(make_runtime(), fused=True, fused_raw_text=True)
+    result = process_article(agent)
+
+    assert result["raw_image_text"]
+    assert "raw_text" not in result["combined_content"]
+    assert str(tmp_path / "out" / "a_raw.txt") in result["output_files"]
+
+
+def test_streaming_writes_outputs_as_responses_arrive(
+    tmp_path, make_runtime, process_article
+):
+    runtime = make_runtime(response_chars=500, stream_chunk_chars=7)
+    agent = ArticleProcessorAgent(runtime, streaming=True, html_renderer="llm")
+    output = tmp_path / "out"
+
+    result = process_article(agent)
+
+    assert result["combined_content"]["title"] == "Fake title"
+    assert (output / "a_raw.txt").read_text() == result["raw_image_text"]
+    assert (output / "a.html").read_text() == result["html_content"]
+    assert result["html_content"].startswith("<html>")
+    assert len(result["output_files"]) == len(set(result["output_files"]))
+    assert not list(output.glob("*.tmp"))
+    names = {record["name"] for record in runtime.metrics.snapshot()}
+    assert {"gemini_ttft_seconds", "gemini_tokens_per_second"} <= names
+
+
+def test_concurrent_articles_keep_separate_contexts(tmp_path, make_runtime):
+    names = [f"a{i}" for i in range(4)]
+    for name in names:
+        (tmp_path / f"{name}.png").write_bytes(name.encode())
+        (tmp_path / f"{name}.xml").write_text(
+            f"<article><heading>{name}</heading></article>"
+        )
+    agent = ArticleProcessorAgent(make_runtime(max_workers=4))
+    output = tmp_path / "out"
+
+    async def run():
+        return await asyncio.gather(
+            *(
+                agent.process_article(
+                    str(tmp_path / f"{name}.png"),
+                    str(tmp_path / f"{name}.xml"),
+                    name,
+                    RESPONSE_STRUCTURE,
+                    str(output),
+                )
+                for name in names
+            )
+        )
+
+    results = asyncio.run(run())
+
+    for name, result in zip(names, results):
+        assert result["xml_metadata"]["heading"] == name
+        assert str(output / f"{name}.html") in result["output_files"]
+        assert all(
+            os.path.basename(path).startswith(name) for path in result["output_files"]
+        )
+
+
+def test_ai_history_is_bounded(make_runtime):
+    runtime = make_runtime(max_workers=1)
+    processor = AIProcessor(runtime, history_limit=3)
+    disabled = AIProcessor(runtime, history_limit=0)
+
+    async def run():
+        for i in range(4):
+            await processor.ask_ai(f"prompt {i}")
+            await disabled.ask_ai(f"prompt {i}")
+
+    asyncio.run(run())
+
+    # The oldest messages are dropped once the limit is reached
+    history = processor.get_history()
+    assert len(history) == 3
+    assert history[-2] == {"role": "user", "content": "prompt 3"}
+    assert disabled.get_history() == []
+
+
+def test_rejected_combine_responses_are_not_cached(make_runtime):
+    runtime = make_runtime(response_cache=ResponseCache(None))
+    runtime.client.models._respond = lambda prompt: "not json"
+    agent = ArticleProcessorAgent(runtime)
+
+    async def run():
+        for _ in range(2):
+            ctx = ArticleContext("a.png", "a.xml", "a", RESPONSE_STRUCTURE, "out")
+            ctx.raw_image_text = "text"
+            await agent.combine(ctx)
+            assert "error" in ctx.combined_content
+
+    asyncio.run(run())
+
+    # The malformed answer is asked for again instead of replayed
+    assert runtime.client.calls == 2
+
+
+def test_merge_chunks_keeps_order_and_prefers_metadata():
+    parts = [
+        {"title": "Part title", "author": None, "date": "", "content": ["a", "b"]},
+        {"title": "Other", "date": "1921", "content": ["b", "c"]},
+        {"error": "Failed to parse JSON"},
+    ]
+    chunks = ["a\n\nb", "b\n\nc", "d\n\ne"]
+
+    merged = merge_chunks(parts, chunks, {"heading": " Court  case ", "author": ""})
+
+    # The boundary paragraph both parts returned is kept once; the failed
+    # part falls back to its OCR paragraphs
+    assert merged["content"] == ["a", "b", "c", "d", "e"]
+    assert merged["title"] == "Court case"
+    assert merged["date"] == "1921" and merged["author"] is None
+    assert "error" not in merged
+
+
+def test_merge_chunks_keeps_repeated_paragraphs_within_a_part():
+    parts = [{"content": ["a", "* * *", "* * *", "b"]}, {"content": ["b", "b"]}]
+
+    merged = merge_chunks(parts, ["", ""], None)
+
+    assert merged["content"] == ["a", "* * *", "* * *", "b", "b"]
+
+
+def test_long_articles_are_combined_in_concurrent_parts(make_runtime, process_article):
+    runtime = make_runtime(response_chars=1000)
+    result = process_article(ArticleProcessorAgent(runtime, chunk_tokens=100))
+
+    # Upload and OCR, then 1000 OCR characters in three parts of about 400
+    assert runtime.client.calls == 2 + 3
+    assert result["combined_content"]["title"] == "Title"
+    # The fake returns the same paragraph for every part; it is kept once
+    assert len(result["combined_content"]["content"]) == 1
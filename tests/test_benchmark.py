@@ -0,0 +1,57 @@
+import asyncio
+
+from benchmarks.run_benchmark import make_fixtures, percentiles, run_config
+
+
+def test_benchmark_reports_throughput_and_stage_latency(tmp_path):
+    make_fixtures(str(tmp_path), 3)
+    config = {
+        "input_dir": str(tmp_path),
+        "latency": 0.0,
+        "error_rate": 0.0,
+        "response_chars": 100,
+        "mode": "queue",
+        "parallel": 2,
+    }
+
+    result = asyncio.run(run_config(config))
+
+    assert result["articles"] == 3
+    assert result["failed"] == 0
+    assert result["articles_per_second"] > 0
+    assert set(result["stage_latency_ms"]) == {
+        "parse_metadata",
+        "extract_text",
+        "combine",
+        "generate_html",
+        "save",
+    }
+
+
+def test_percentiles_in_milliseconds():
+    assert percentiles([0.001] * 10)["p99"] == 1.0
+
+
+def test_fused_mode_makes_one_generate_call_per_article(tmp_path):
+    make_fixtures(str(tmp_path), 3)
+    config = {
+        "input_dir": str(tmp_path),
+        "latency": 0.0,
+        "error_rate": 0.0,
+        "response_chars": 100,
+        "mode": "queue",
+        "parallel": 2,
+        "fused": True,
+    }
+
+    result = asyncio.run(run_config(config))
+
+    assert result["failed"] == 0
+    # One upload and one fused generate call per article
+    assert result["gemini_calls"] == 6
+    assert set(result["stage_latency_ms"]) == {
+        "parse_metadata",
+        "extract_structured",
+        "generate_html",
+        "save",
+    }
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from config import RESPONSE_STRUCTURE
+from modules.agent import ArticleProcessorAgent
+from modules.article_context import ArticleContext
+from modules.dedup import BKTree, DedupIndex, hamming, xml_fingerprint
+
+
+def test_bk_tree_finds_every_hash_within_the_distance():
+    rng = random.Random(0)
+    keys = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for i, key in enumerate(keys):
+        tree.add(key, str(i))
+    query = keys[7] ^ 0b1011  # three bits away from entry 7
+
+    expected = sorted(
+        (hamming(query, key), str(i))
+        for i, key in enumerate(keys)
+        if hamming(query, key) <= 12
+    )
+    assert tree.search(query, 12) == expected
+    assert tree.search(query, 3)[0] == (3, "7")
+
+
+def test_xml_fingerprint_ignores_case_spacing_and_empty_fields():
+    assert xml_fingerprint(
+        {"heading": "Court  Case", "author": "", "tags": ["A"]}
+    ) == xml_fingerprint({"heading": "court case", "tags": ["a"]})
+    assert xml_fingerprint({"heading": "Court case"}) != xml_fingerprint(
+        {"heading": "Obituary"}
+    )
+    # Missing or unparsable XML is no evidence at all
+    assert xml_fingerprint({}) == xml_fingerprint({"heading": " "}) == ""
+
+
+def test_failed_canonicals_are_not_reused(tmp_path, article):
+    index = DedupIndex(None)
+    # Without XML evidence only byte-identical images can match
+    key = index.image_key(article[0], "")
+    assert key.startswith("s:")
+
+    async def scenario():
+        assert await index.match("a", key, "", str(tmp_path)) is None
+        waiting = asyncio.create_task(index.match("b", key, "", str(tmp_path)))
+        await asyncio.sleep(0)
+        await index.publish("a", {"combined_content": {"error": "Failed"}})
+        return await waiting
+
+    # "b" waited for "a", whose combine failed: it is processed on its own
+    assert asyncio.run(scenario()) is None
+    index.close()
+
+
+def test_failed_saves_release_waiting_duplicates(tmp_path, make_runtime):
+    runtime = make_runtime()
+    index = DedupIndex(None, executor=runtime.executor)
+    agent = ArticleProcessorAgent(runtime, dedup_index=index)
+
+    async def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    agent.data_saver.save_processed_data = fail
+    ctx = ArticleContext("a.png", "a.xml", "a", RESPONSE_STRUCTURE, str(tmp_path))
+
+    async def scenario():
+        assert await index.match("a", "s:key", "", str(tmp_path)) is None
+        waiting = asyncio.create_task(index.match("b", "s:key", "", str(tmp_path)))
+        await asyncio.sleep(0)
+        with pytest.raises(OSError):
+            await agent.save(ctx)
+        return await asyncio.wait_for(waiting, 1)
+
+    # "b" does not wait out DEDUP_WAIT for a canonical that will never publish
+    assert asyncio.run(scenario()) is None
+    index.close()
+
+
+def test_agent_reuses_results_of_rescanned_articles(
+    tmp_path, make_article, make_runtime
+):
+    Image = pytest.importorskip("PIL.Image")
+    scan = Image.new("L", (400, 600), 230)
+    for top in range(0, 600, 30):
+        scan.paste(20, (30, top, 30 + (top * 7) % 340, top + 10))
+    scan.save(tmp_path / "a.png")
+    # The same clipping rescanned at a lower resolution
+    scan.resize((200, 300)).save(tmp_path / "b.png")
+    scan.rotate(90, expand=True).save(tmp_path / "c.png")
+    for name in ("a", "b", "c"):
+        make_article(name, image=None)
+
+    runtime = make_runtime(max_workers=4)
+    index = DedupIndex(None, executor=runtime.executor, metrics=runtime.metrics)
+    agent = ArticleProcessorAgent(runtime, fused=True, dedup_index=index)
+    output = tmp_path / "out"
+
+    def process(name):
+        return agent.process_article(
+            str(tmp_path / f"{name}.png"),
+            str(tmp_path / f"{name}.xml"),
+            name,
+            RESPONSE_STRUCTURE,
+            str(output),
+        )
+
+    async def run():
+        # "a" and "b" are in flight together: one waits for the other's results
+        return await asyncio.gather(process("a"), process("b"), process("c"))
+
+    a, b, _ = asyncio.run(run())
+    index.close()
+
+    assert b["combined_content"] == a["combined_content"]
+    assert b["html_content"] == a["html_content"]
+    links = {
+        path.name: json.loads(path.read_text())["name"]
+        for path in output.glob("*_duplicate_of.json")
+    }
+    assert links in ({"b_duplicate_of.json": "a"}, {"a_duplicate_of.json": "b"})
+    # The rotated scan "c" is a different image and is processed on its own:
+    # uploads and generate calls for one of "a"/"b" and for "c" only
+    assert runtime.client.calls == 4
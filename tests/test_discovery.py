@@ -0,0 +1,98 @@
+import os
+import time
+
+from modules.discovery import InputIndex, discover
+
+
+def make_tree(root, paths):
+    for path in paths:
+        full = root / path
+        full.parent.mkdir(parents=True, exist_ok=True)
+        full.write_text(path)
+    # Age every directory past the settle window so its listing is indexed
+    old = time.time() - 60
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (old, old))
+
+
+def test_discover_pairs_nested_inputs_in_a_stable_order(tmp_path, capsys):
+    make_tree(
+        tmp_path,
+        [
+            "b.png",
+            "b.xml",
+            "a.jpg",
+            "a.xml",
+            "orphan.png",
+            "1921/z.png",
+            "1921/z.xml",
+            "1920/03/page.webp",
+            "1920/03/page.xml",
+            ".hidden/x.png",
+            ".hidden/x.xml",
+        ],
+    )
+
+    jobs = list(discover(str(tmp_path)))
+
+    assert [job.name for job in jobs] == ["a", "b", "1920__03__page", "1921__z"]
+    assert jobs[2].image_path == str(tmp_path / "1920" / "03" / "page.webp")
+    assert jobs[2].xml_path == str(tmp_path / "1920" / "03" / "page.xml")
+    assert "Skipped 1 image(s)" in capsys.readouterr().out
+
+
+def test_discover_pairs_xml_whose_extension_differs_in_case(tmp_path):
+    make_tree(tmp_path, ["scan.PNG", "scan.XML"])
+
+    [job] = discover(str(tmp_path))
+
+    assert job.xml_path == str(tmp_path / "scan.XML")
+    assert os.path.exists(job.xml_path)
+
+
+def test_discover_applies_include_and_exclude_globs(tmp_path):
+    make_tree(
+        tmp_path,
+        ["1920/a.png", "1920/a.xml", "1920/b.png", "1920/b.xml"]
+        + ["1921/c.png", "1921/c.xml"],
+    )
+
+    jobs = discover(str(tmp_path), include=["1920/*"], exclude=["*/b.png"])
+
+    assert [job.name for job in jobs] == ["1920__a"]
+
+
+def test_index_reuses_listings_and_hashes_until_inputs_change(tmp_path):
+    inputs = tmp_path / "inputs"
+    make_tree(inputs, ["2020/a.png", "2020/a.xml"])
+    index = InputIndex(str(tmp_path / "inputs.sqlite"))
+
+    first = list(discover(str(inputs), index=index))
+    digest = index.hash_file(first[0].image_path)
+    assert index.stats["listed"] == 2 and index.stats["hashed"] == 1
+
+    second = list(discover(str(inputs), index=index))
+    assert second == first
+    assert index.stats["reused"] == 2
+    assert index.hash_file(first[0].image_path) == digest
+    assert index.stats["hash_reused"] == 1
+
+    # A new pair changes the directory's mtime, so only it is listed again
+    (inputs / "2020" / "b.png").write_text("b")
+    (inputs / "2020" / "b.xml").write_text("b")
+    third = list(discover(str(inputs), index=index))
+    assert [job.name for job in third] == ["2020__a", "2020__b"]
+    assert index.stats["listed"] == 3
+
+    (inputs / "2020" / "a.png").write_text("changed")
+    assert index.hash_file(first[0].image_path) != digest
+    index.close()
+
+
+def test_discover_skips_articles_whose_flattened_names_collide(tmp_path, capsys):
+    make_tree(tmp_path, ["a__b.png", "a__b.xml", "a/b.png", "a/b.xml"])
+
+    jobs = list(discover(str(tmp_path)))
+
+    assert [job.image_path for job in jobs] == [str(tmp_path / "a__b.png")]
+    assert "Skipped 'a/b.png'" in capsys.readouterr().out
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from config import RESPONSE_STRUCTURE
+from modules.agent import ArticleProcessorAgent
+from modules.article_context import ArticleContext
+from modules.html_processor import HTMLProcessor, HTMLStreamSlicer
+
+ARTICLE = {
+    "title": "Fire & Flood",
+    "author": "A. <Reporter>",
+    "content": ["First paragraph.", {"heading": "Aftermath", "content": ["Later."]}],
+}
+
+
+@pytest.fixture
+def processor(make_runtime) -> HTMLProcessor:
+    return ArticleProcessorAgent(make_runtime(max_workers=1)).html_processor
+
+
+def test_render_html_is_semantic_escaped_and_reproducible(processor):
+    page = processor.render_html(ARTICLE)
+
+    assert page.startswith("<!DOCTYPE html>")
+    assert "<title>Fire &amp; Flood</title>" in page
+    assert '<p class="author">A. &lt;Reporter&gt;</p>' in page
+    assert "<section>\n<h2>Aftermath</h2>\n<p>Later.</p>\n</section>" in page
+    assert page == processor.render_html(ARTICLE)
+
+
+def test_iter_html_streams_large_articles_in_chunks(processor):
+    article = {"title": "Long", "content": ["x" * 1000] * 100}
+
+    chunks = list(processor.iter_html(article, chunk_size=10000))
+
+    assert len(chunks) > 5
+    assert "".join(chunks) == processor.render_html(article)
+
+
+def test_local_renderer_falls_back_to_llm_for_unusable_content(tmp_path, make_runtime):
+    runtime = make_runtime()
+    client = runtime.client
+    agent = ArticleProcessorAgent(runtime)
+
+    ctx = ArticleContext("", "", "a", RESPONSE_STRUCTURE, str(tmp_path))
+    ctx.combined_content = ARTICLE
+    asyncio.run(agent.generate_html(ctx))
+    assert client.calls == 0
+    assert "<h1>Fire &amp; Flood</h1>" in ctx.html_content
+    assert (tmp_path / "a.html").read_text(encoding="utf-8") == ctx.html_content
+
+    ctx.combined_content = {"error": "Invalid JSON in response", "raw_response": "?"}
+    asyncio.run(agent.generate_html(ctx))
+    assert client.calls == 1
+    assert ctx.html_content.startswith("<html>")
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        "Here: <html><p>a</p></html> and <html><p>b</p></html> done",
+        "</html> then <html>page</html>\n",
+        "Cut off <html><p>never closed",
+        "no page at all",
+    ],
+)
+def test_streamed_and_whole_responses_slice_the_same_page(processor, response):
+    for size in (1, 4, len(response)):
+        slicer = HTMLStreamSlicer()
+        for i in range(0, len(response), size):
+            slicer.feed(response[i : i + size])
+        slicer.finish()
+
+        assert slicer.page() == processor.generate_html(response)
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from modules.ai_processor import AIProcessor
+from modules.image_preprocessor import ImagePreprocessor, preprocess_image
+from modules.response_cache import hash_file
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def make_scan(path, size=(600, 3000), dpi=300):
+    image = Image.new("RGB", size, (250, 240, 220))
+    for top in range(0, size[1], 40):
+        image.paste((20, 20, 20), (40, top, size[0] - 40, top + 12))
+    image.save(path, dpi=(dpi, dpi))
+    return str(path)
+
+
+def test_downscales_grayscales_and_tiles_tall_pages(tmp_path):
+    options = {
+        "target_dpi": 150,
+        "source_dpi": 0,
+        "max_side": 0,
+        "grayscale": True,
+        "format": "png",
+        "quality": 80,
+        "tile_height": 600,
+        "tile_overlap": 50,
+    }
+    paths = preprocess_image(
+        make_scan(tmp_path / "scan.png"), str(tmp_path / "out"), options
+    )
+
+    tiles = [Image.open(path) for path in paths]
+    # 300 -> 150 DPI halves each side: 300x1500, cut into even overlapping bands
+    assert [tile.size for tile in tiles] == [(300, 534), (300, 534), (300, 532)]
+    assert {tile.mode for tile in tiles} == {"L"}
+
+
+def test_ai_processor_uploads_cached_preprocessed_tiles(tmp_path, make_runtime):
+    scan = make_scan(tmp_path / "scan.png")
+    runtime = make_runtime(
+        image_preprocessor=ImagePreprocessor(
+            enabled=True,
+            cache_dir=str(tmp_path / "cache"),
+            workers=1,
+            image_format="webp",
+            tile_height=1000,
+        ),
+    )
+    processor = AIProcessor(runtime)
+
+    async def ask_twice():
+        await processor.ask_ai("transcribe", scan)
+        return await runtime.image_preprocessor.prepare(scan, hash_file(scan))
+
+    tiles = asyncio.run(ask_twice())
+
+    assert len(tiles) == 3 and all(path.endswith(".webp") for path in tiles)
+    assert runtime.client.uploads == 3
+    records = {
+        (r["name"], tuple(r["labels"].items())): r for r in runtime.metrics.snapshot()
+    }
+    source = records[("image_bytes_total", (("stage", "source"),))]["value"]
+    assert records[("upload_bytes_total", ())]["value"] < source
+    assert records[("image_cache_hits_total", ())]["value"] == 1
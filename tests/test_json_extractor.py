@@ -0,0 +1,46 @@
+from config import RESPONSE_STRUCTURE
+from modules.json_extractor import JSONExtractor, ResponseSchema, repair
+from utils import UtilityManager
+
+extractor = JSONExtractor(ResponseSchema(RESPONSE_STRUCTURE))
+
+
+def test_extracts_fenced_json_despite_braces_in_commentary():
+    response = (
+        "Here is the article {as requested}:\n"
+        '```json\n{"title": "A {b}", "author": "C", "content": ["x"]}\n```\n'
+        "Let me know if you need anything else :}"
+    )
+
+    assert extractor.extract(response) == {
+        "title": "A {b}",
+        "author": "C",
+        "content": ["x"],
+    }
+
+
+def test_repairs_common_model_mistakes():
+    response = '{"title": "T", "author": None, "content": "p1\n\np2",}'
+
+    assert extractor.extract(response) == {
+        "title": "T",
+        "author": None,
+        "content": ["p1", "p2"],
+    }
+    assert repair('{"a": [1, 2,], "b": True}') == '{"a": [1, 2], "b": true}'
+
+
+def test_reports_missing_or_invalid_json():
+    assert "Could not extract" in extractor.extract("no json here")["error"]
+    assert "Invalid JSON" in extractor.extract("{not: json: at all}")["error"]
+    assert UtilityManager().structure_json(None)["error"] == "No response received"
+
+
+def test_streaming_extraction_finishes_before_the_response_ends():
+    stream = extractor.stream()
+    chunks = ['Sure: {"title": "a}', '", "author": "b", "content": []}', " trailing"]
+
+    assert stream.feed(chunks[0]) is None
+    assert stream.feed(chunks[1]) == {"title": "a}", "author": "b", "content": []}
+    stream.feed(chunks[2])
+    assert stream.result()["author"] == "b"
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from main import ArticleProcessor
+from modules.manifest import Manifest
+from modules.work_queue import ArticleJob
+
+
+def test_manifest_skips_only_unchanged_articles(tmp_path):
+    image, xml, output = tmp_path / "a.png", tmp_path / "a.xml", tmp_path / "a.html"
+    image.write_bytes(b"png")
+    xml.write_text("<article/>")
+    output.write_text("<html/>")
+    path = str(tmp_path / "manifest.jsonl")
+
+    fingerprint = Manifest.fingerprint(str(image), str(xml), "v1")
+    Manifest(path).record("a", fingerprint, [str(output)])
+
+    manifest = Manifest(path)
+    assert manifest.is_current("a", fingerprint)
+    assert not manifest.is_current("a", {**fingerprint, "version": "v2"})
+
+    xml.write_text("<article>changed</article>")
+    assert not manifest.is_current(
+        "a", Manifest.fingerprint(str(image), str(xml), "v1")
+    )
+
+    output.unlink()
+    assert not manifest.is_current("a", fingerprint)
+
+
+def test_manifest_ignores_torn_last_line(tmp_path):
+    path = tmp_path / "manifest.jsonl"
+    path.write_text('{"name": "a", "outputs": []}\n{"name": "b", "outp')
+
+    assert list(Manifest(str(path)).entries) == ["a"]
+
+
+def test_manifest_merges_shard_logs(tmp_path):
+    path = str(tmp_path / "manifest.jsonl")
+    fingerprint = {"image_hash": "i", "xml_hash": "x", "version": "v1"}
+    Manifest(path).record("a", fingerprint, [])
+
+    shard_logs = [f"{path}.shard-0", f"{path}.shard-1"]
+    for name, log in zip(["b", "c"], shard_logs):
+        Manifest(path, log_path=log).record(name, fingerprint, [])
+
+    Manifest(path).merge(shard_logs)
+
+    assert sorted(Manifest(path).entries) == ["a", "b", "c"]
+    assert not any((tmp_path / f"manifest.jsonl.shard-{i}").exists() for i in (0, 1))
+
+
+def test_manifest_reads_unmerged_shard_logs_latest_entry_first(tmp_path):
+    path = str(tmp_path / "manifest.jsonl")
+    old = {"image_hash": "i", "xml_hash": "x", "version": "v1"}
+    new = {**old, "version": "v2"}
+    # Two machines each log to their own file and never rewrite the manifest
+    Manifest(path, log_path=f"{path}.shard-0").record("a", old, [])
+    Manifest(path, log_path=f"{path}.shard-1").record("b", old, [])
+    # An unsharded run later reprocesses "a"
+    Manifest(path).record("a", new, [])
+
+    manifest = Manifest(path)
+    assert manifest.is_current("a", new) and manifest.is_current("b", old)
+    manifest.merge(manifest.shard_logs())
+    assert Manifest(path).is_current("a", new) and manifest.shard_logs() == []
+
+
+def test_failed_articles_are_not_recorded(tmp_path, article, make_runtime):
+    runtime = make_runtime()
+    manifest = Manifest(str(tmp_path / "manifest.jsonl"))
+    processor = ArticleProcessor(
+        runtime, manifest, output_path=str(tmp_path / "out"), dedup=False
+    )
+
+    async def fail(prompt, image_path=None):
+        return None
+
+    processor.agent.ai_processor.ask_ai = fail
+    job = ArticleJob("a", *article)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await processor.process_job(job)
+        pipeline = processor.build_pipeline({})
+        return await pipeline.run([job], processor.make_context)
+
+    summary = asyncio.run(run())
+    processor.close()
+
+    # Both paths fail the article, so an incremental run retries it
+    assert summary.failed == 1 and summary.succeeded == 0
+    assert manifest.get("a") is None
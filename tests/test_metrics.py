@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+
+from modules.ai_processor import AIProcessor
+from modules.metrics import Metrics
+
+
+def test_counters_gauges_and_span_errors():
+    metrics = Metrics()
+    metrics.incr("calls_total", kind="text")
+    metrics.incr("calls_total", 2, kind="text")
+    metrics.gauge("depth", 5)
+    metrics.gauge("depth", 1)
+
+    with pytest.raises(ValueError):
+        with metrics.span("stage_seconds", stage="ocr"):
+            raise ValueError("boom")
+
+    records = {(r["name"], r["type"]): r for r in metrics.snapshot()}
+    assert records[("calls_total", "counter")]["value"] == 3
+    assert records[("depth", "gauge")]["value"] == 1
+    assert records[("depth", "gauge")]["max"] == 5
+    assert records[("stage_seconds_errors_total", "counter")]["labels"] == {
+        "stage": "ocr"
+    }
+    assert records[("stage_seconds", "timer")]["count"] == 1
+
+
+def test_timer_reservoir_stays_bounded():
+    metrics = Metrics(reservoir=10)
+    for i in range(1000):
+        metrics.observe("latency", i / 1000)
+
+    (record,) = metrics.snapshot()
+    assert record["count"] == 1000
+    assert record["max"] == 0.999
+    assert len(metrics._timers[("latency", ())].samples) == 10
+
+
+def test_exports_prometheus_and_jsonl(tmp_path):
+    metrics = Metrics()
+    metrics.incr("gemini_calls_total", kind="image")
+    metrics.observe("stage_seconds", 0.25, stage="html")
+
+    prom = tmp_path / "metrics.prom"
+    metrics.write(str(prom))
+    text = prom.read_text()
+    assert "# TYPE article_processor_stage_seconds summary" in text
+    assert 'article_processor_stage_seconds{stage="html",quantile="0.95"} 0.25' in text
+    assert 'article_processor_gemini_calls_total{kind="image"} 1' in text
+
+    jsonl = tmp_path / "metrics.jsonl"
+    metrics.write(str(jsonl))
+    metrics.write(str(jsonl))
+    lines = [json.loads(line) for line in jsonl.read_text().splitlines()]
+    assert len(lines) == 4
+
+
+def test_ai_processor_records_calls_and_tokens(make_runtime):
+    runtime = make_runtime()
+    processor = AIProcessor(runtime)
+
+    assert asyncio.run(processor.ask_ai("hello"))
+
+    records = {
+        (r["name"], tuple(r["labels"].items())): r for r in runtime.metrics.snapshot()
+    }
+    assert records[("gemini_calls_total", (("kind", "text"),))]["value"] == 1
+    assert records[("gemini_call_seconds", (("kind", "text"),))]["count"] == 1
+    assert records[("gemini_tokens_total", (("kind", "candidates"),))]["value"] > 0
+
+
+def test_merge_combines_process_states():
+    shards = [Metrics(), Metrics()]
+    for i, shard in enumerate(shards):
+        shard.incr("gemini_calls_total", 2)
+        shard.gauge("executor_threads", 4)
+        shard.observe("stage_seconds", 0.1 * (i + 1), stage="ocr")
+
+    merged = Metrics()
+    for shard in shards:
+        merged.merge(shard.state())
+
+    records = {r["name"]: r for r in merged.snapshot()}
+    assert records["gemini_calls_total"]["value"] == 4
+    assert records["executor_threads"]["value"] == 8
+    assert records["stage_seconds"]["count"] == 2
+    assert records["stage_seconds"]["max"] == 0.2
@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+
+import pytest
+
+from modules.agent import ArticleProcessorAgent
+from modules.data_saver import DataSaver
+from modules.output_store import JSONLStore, OutputReader
+
+
+def save_articles(runtime, tmp_path, backend, names, **saver_options):
+    saver = DataSaver(runtime, backend, **saver_options)
+
+    async def save_all():
+        return await asyncio.gather(
+            *(
+                saver.save_processed_data(
+                    str(tmp_path),
+                    {
+                        "raw_image_text": f"text of {name}",
+                        "xml_metadata": {"heading": name},
+                        "combined_content": {"title": name},
+                        "html_content": f"<html>{name}</html>",
+                    },
+                    name,
+                )
+                for name in names
+            )
+        )
+
+    written = asyncio.run(save_all())
+    saver.close()
+    return written
+
+
+@pytest.mark.parametrize("backend", ["jsonl", "gzip", "sqlite"])
+def test_store_backends_round_trip(tmp_path, make_runtime, backend):
+    runtime = make_runtime()
+    written = save_articles(runtime, tmp_path, backend, ["a", "b", "c"])
+
+    # One record per article instead of five files
+    assert all(len(paths) == 1 for paths in written)
+    assert not list(tmp_path.glob("*_full.json"))
+    reader = OutputReader(str(tmp_path))
+    assert reader.names() == ["a", "b", "c"]
+    assert reader.get("b")["combined_content"] == {"title": "b"}
+    assert reader.get("b")["html_content"] == "<html>b</html>"
+    assert reader.get("missing") is None
+
+    # Concurrent saves were group committed
+    records = {r["name"]: r for r in runtime.metrics.snapshot()}
+    assert records["output_records_total"]["value"] == 3
+    assert records["output_batches_total"]["value"] < 3
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_reader_picks_up_records_appended_after_it_indexed(tmp_path, compress):
+    store = JSONLStore(str(tmp_path / "store"), compress=compress)
+    store.write_batch([{"name": "a", "completed_at": 1, "html_content": "a"}])
+    reader = OutputReader(str(tmp_path))
+    assert reader.get("b") is None
+
+    store.write_batch([{"name": "b", "completed_at": 2, "html_content": "b"}])
+    store.close()
+
+    assert reader.get("b")["html_content"] == "b"
+    assert reader.names() == ["a", "b"]
+
+
+def test_files_backend_can_drop_full_json(tmp_path, make_runtime):
+    save_articles(make_runtime(), tmp_path, "files", ["a"], write_full=False)
+
+    assert not (tmp_path / "a_full.json").exists()
+    assert OutputReader(str(tmp_path)).get("a")["raw_image_text"] == "text of a"
+
+
+def test_jsonl_store_rolls_segments_and_keeps_latest_record(tmp_path):
+    store = JSONLStore(str(tmp_path / "store"), segment_bytes=1)
+    store.write_batch([{"name": "a", "completed_at": 1, "html_content": "old"}])
+    store.write_batch([{"name": "a", "completed_at": 2, "html_content": "new"}])
+    store.close()
+
+    assert len(list(tmp_path.glob("store/outputs-*.jsonl"))) == 2
+    assert OutputReader(str(tmp_path)).get("a")["html_content"] == "new"
+
+
+def test_gzip_reader_ignores_torn_last_batch(tmp_path):
+    store = JSONLStore(str(tmp_path / "store"), compress=True)
+    store.write_batch([{"name": "a", "completed_at": 1}])
+    store.close()
+    segment = next(tmp_path.glob("store/*.jsonl.gz"))
+    with open(segment, "ab") as f:
+        f.write(gzip.compress(b'{"name": "b", "completed_at": 2}\n')[:20])
+
+    assert OutputReader(str(tmp_path)).names() == ["a"]
+
+
+def test_agent_streams_without_files_when_using_a_store(
+    tmp_path, make_runtime, process_article
+):
+    agent = ArticleProcessorAgent(
+        make_runtime(), streaming=True, output_backend="jsonl"
+    )
+    output = tmp_path / "out"
+
+    result = process_article(agent)
+    agent.data_saver.close()
+
+    assert [p.name for p in output.iterdir()] == ["store"]
+    assert result["output_files"] == [str(output / "store" / "outputs-00000.jsonl")]
+    stored = OutputReader(str(output)).get("a")
+    assert stored["raw_image_text"] == result["raw_image_text"]
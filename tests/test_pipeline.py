@@ -0,0 +1,45 @@
+import asyncio
+
+from modules.article_context import ArticleContext
+from modules.pipeline import Stage, StagePipeline, parse_stage_concurrency
+from modules.work_queue import ArticleJob
+
+
+def make_context(job: ArticleJob) -> ArticleContext:
+    return ArticleContext(job.image_path, job.xml_path, job.name, "{}", "out")
+
+
+def test_pipeline_runs_every_stage_and_isolates_failures():
+    calls = []
+
+    async def ocr(ctx: ArticleContext):
+        await asyncio.sleep(0)
+        if ctx.image_name == "bad":
+            raise RuntimeError("ocr failed")
+        ctx.raw_image_text = f"text of {ctx.image_name}"
+
+    async def skip_or_save(ctx: ArticleContext):
+        calls.append(ctx.image_name)
+        return ctx.image_name != "skip"
+
+    async def html(ctx: ArticleContext):
+        ctx.html_content = f"<p>{ctx.raw_image_text}</p>"
+
+    pipeline = StagePipeline(
+        [Stage("ocr", ocr, 3), Stage("save", skip_or_save, 2), Stage("html", html)]
+    )
+    jobs = [ArticleJob(n, f"{n}.png", f"{n}.xml") for n in ("a", "bad", "skip", "b")]
+    results = []
+
+    summary = asyncio.run(pipeline.run(jobs, make_context, results.append))
+
+    assert (summary.succeeded, summary.failed) == (3, 1)
+    assert sorted(calls) == ["a", "b", "skip"]
+    by_name = {r.job.name: r for r in results}
+    assert by_name["a"].result["html_content"] == "<p>text of a</p>"
+    assert by_name["skip"].result["html_content"] is None
+    assert isinstance(by_name["bad"].error, RuntimeError)
+
+
+def test_parse_stage_concurrency():
+    assert parse_stage_concurrency("ocr=8, combine=4,") == {"ocr": 8, "combine": 4}
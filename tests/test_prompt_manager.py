@@ -0,0 +1,66 @@
+from config import RESPONSE_STRUCTURE
+from modules.metrics import Metrics
+from modules.prompt_manager import TEMPLATES, PromptManager, chunk_text
+from modules.rate_limiter import estimate_tokens
+
+
+def test_prompts_share_a_static_prefix_and_serialize_compactly():
+    prompts = PromptManager()
+    first = prompts.get_combined_prompt(
+        "text one", {"heading": "Ä"}, RESPONSE_STRUCTURE
+    )
+    second = prompts.get_combined_prompt("text two", {}, RESPONSE_STRUCTURE)
+
+    prefix = TEMPLATES["combine"].prefix
+    assert first.startswith(prefix) and second.startswith(prefix)
+    assert '{"heading":"Ä"}' in first
+    assert "            " not in first
+    assert first.endswith("text one\n```")
+
+
+def test_oversized_sources_are_trimmed_to_the_budget():
+    metrics = Metrics()
+    prompts = PromptManager(token_budget=2000, metrics=metrics)
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 200 for i in range(50))
+    metadata = {"heading": "Title", "mainContent": "m" * 20000}
+
+    prompt = prompts.get_combined_prompt(text, metadata, RESPONSE_STRUCTURE)
+
+    assert estimate_tokens(prompt) <= 2000
+    assert "Paragraph 0" in prompt and "truncated" in prompt
+    assert '"heading":"Title"' in prompt
+    (record,) = metrics.snapshot()
+    assert record["labels"] == {"prompt": "combine"}
+
+
+def test_repeated_element_metadata_leaves_room_for_the_text():
+    prompts = PromptManager(token_budget=32000)
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 200 for i in range(400))
+    # METS/ALTO-style metadata: many short, repeated elements
+    metadata = {
+        "heading": "Title",
+        "String": [{"CONTENT": f"w{i}", "HPOS": i, "VPOS": i} for i in range(20000)],
+    }
+
+    prompt = prompts.get_combined_prompt(text, metadata, RESPONSE_STRUCTURE)
+
+    assert estimate_tokens(prompt) <= 32000
+    assert '"heading":"Title"' in prompt and "more items]" in prompt
+    # At least the OCR text's minimum share of the budget is kept
+    kept = prompt[prompt.index("Paragraph 0") :]
+    assert estimate_tokens(kept) >= 32000 // 4
+
+
+def test_version_covers_templates_and_budget():
+    assert PromptManager().version == PromptManager().version
+    assert PromptManager(token_budget=100).version != PromptManager().version
+
+
+def test_chunk_text_keeps_paragraphs_together():
+    text = "\n\n".join(["a" * 30, "b" * 30, "c" * 30, "d" * 200])
+
+    chunks = chunk_text(text, max_tokens=20)
+
+    assert chunks[0] == "a" * 30 + "\n\n" + "b" * 30
+    assert all(len(chunk) <= 80 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
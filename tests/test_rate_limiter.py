@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+from google.genai import errors
+
+from benchmarks.fake_client import FakeClient
+from modules.rate_limiter import (
+    AdaptiveConcurrency,
+    CallController,
+    RateLimiter,
+    RetryExhaustedError,
+    RetryPolicy,
+    TokenBucket,
+)
+
+
+def make_controller(max_attempts: int = 3) -> CallController:
+    return CallController(
+        limiter=RateLimiter(0, 0),
+        concurrency=AdaptiveConcurrency(4),
+        retry=RetryPolicy(max_attempts=max_attempts, base_delay=0.001),
+    )
+
+
+def test_controller_retries_transient_errors_from_fake_client():
+    client = FakeClient(fail_first=2, error_code=503)
+    controller = make_controller()
+
+    async def call():
+        return await controller.call(
+            lambda: asyncio.to_thread(client.models.generate_content, "m", "hi")
+        )
+
+    response = asyncio.run(call())
+
+    assert response.text
+    assert controller.stats == {"calls": 3, "retries": 2, "throttled": 2}
+    assert controller.concurrency.limit < 4
+
+
+def test_controller_gives_up_after_max_attempts():
+    client = FakeClient(fail_first=10)
+    controller = make_controller(max_attempts=2)
+
+    async def call():
+        return await controller.call(
+            lambda: asyncio.to_thread(client.models.generate_content, "m", "hi")
+        )
+
+    with pytest.raises(RetryExhaustedError):
+        asyncio.run(call())
+
+
+def test_controller_does_not_retry_client_errors():
+    client = FakeClient(fail_first=1, error_code=400)
+    controller = make_controller()
+
+    async def call():
+        return await controller.call(
+            lambda: asyncio.to_thread(client.models.generate_content, "m", "hi")
+        )
+
+    with pytest.raises(Exception, match="400"):
+        asyncio.run(call())
+    assert controller.stats["retries"] == 0
+
+
+def test_retry_policy_honors_retry_delay_hint():
+    error = errors.ClientError(
+        429, {"error": {"code": 429, "details": [{"retryDelay": "7s"}]}}
+    )
+
+    assert RetryPolicy().delay_for(1, error) == 7.0
+
+
+def test_token_bucket_throttles_once_empty():
+    async def drain():
+        bucket = TokenBucket(per_minute=600, capacity=2)
+        start = asyncio.get_running_loop().time()
+        for _ in range(3):
+            await bucket.acquire()
+        return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(drain()) >= 0.09
+
+
+def test_streamed_calls_hold_their_slot_until_read(make_runtime):
+    from types import SimpleNamespace
+
+    from modules.ai_processor import AIProcessor
+
+    controller = make_controller()
+    runtime = make_runtime(
+        call_controller=controller, response_chars=40, stream_chunk_chars=10
+    )
+    client = runtime.client
+    processor = AIProcessor(runtime)
+    concurrency = controller.concurrency
+
+    async def throttled_stream(model, contents, **kwargs):
+        async def chunks():
+            yield SimpleNamespace(text="partial", usage_metadata=None)
+            raise errors.ClientError(429, {"error": {"code": 429, "status": "X"}})
+
+        return chunks()
+
+    async def scenario():
+        stream = processor.stream_ai("hi")
+        await stream.__anext__()
+        held = concurrency.in_flight
+        rest = [text async for text in stream]
+        released = concurrency.in_flight
+
+        client.aio.models.generate_content_stream = throttled_stream
+        with pytest.raises(errors.ClientError):
+            async for _ in processor.stream_ai("again"):
+                assert concurrency.in_flight == 1
+        return held, len(rest), released
+
+    held, rest, released = asyncio.run(scenario())
+
+    assert (held, rest, released) == (1, 3, 0)
+    # The 429 arrived mid-stream: the slot is back and the limit halved
+    assert concurrency.in_flight == 0 and concurrency.limit == 2
+    assert controller.stats["throttled"] == 1
@@ -0,0 +1,92 @@
+import asyncio
+
+from benchmarks.run_benchmark import make_fixtures, run_config
+from config import RESPONSE_STRUCTURE
+from modules.agent import ArticleProcessorAgent
+from modules.article_context import ArticleContext
+from modules.request_batcher import RequestBatcher
+
+
+def test_batcher_groups_concurrent_requests():
+    batches = []
+
+    async def flush(items):
+        batches.append(items)
+        return [item * 10 for item in items]
+
+    async def run():
+        batcher = RequestBatcher(flush, max_items=3, max_wait=0.01)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(run()) == [0, 10, 20, 30, 40]
+    # A full batch goes out at once; the remainder after max_wait
+    assert batches == [[0, 1, 2], [3, 4]]
+
+
+def test_batcher_propagates_flush_errors():
+    async def flush(items):
+        raise RuntimeError("quota")
+
+    async def run():
+        batcher = RequestBatcher(flush, max_items=2)
+        return await asyncio.gather(
+            batcher.submit(1), batcher.submit(2), return_exceptions=True
+        )
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+
+
+def test_batcher_fails_requests_missing_from_a_short_result():
+    async def flush(items):
+        return items[:1]
+
+    async def run():
+        batcher = RequestBatcher(flush, max_items=3)
+        return await asyncio.wait_for(
+            asyncio.gather(
+                *(batcher.submit(i) for i in range(3)), return_exceptions=True
+            ),
+            1,
+        )
+
+    first, *rest = asyncio.run(run())
+    assert first == 0 and all(isinstance(r, RuntimeError) for r in rest)
+
+
+def test_batched_mode_cuts_combine_and_html_calls(tmp_path):
+    make_fixtures(str(tmp_path), 4)
+    config = {
+        "input_dir": str(tmp_path),
+        "latency": 0.0,
+        "error_rate": 0.0,
+        "response_chars": 100,
+        "mode": "queue",
+        "parallel": 4,
+        "html_renderer": "llm",
+    }
+
+    single = asyncio.run(run_config(config))
+    batched = asyncio.run(run_config({**config, "batch_size": 4}))
+
+    assert batched["failed"] == 0
+    # 4 uploads and 4 OCR calls, then 1 combine + 1 HTML call instead of 4 each
+    assert single["gemini_calls"] == 16
+    assert batched["gemini_calls"] == 10
+
+
+def test_invalid_batch_items_fall_back_to_single_calls(make_runtime):
+    agent = ArticleProcessorAgent(make_runtime(), batch_size=2)
+
+    async def partial_response(prompt, image_path=None):
+        return (
+            '{"0": {"title": "t", "author": "a", "content": "p1\\n\\np2"}, '
+            '"1": {"title": "t"}}'
+        )
+
+    agent.ai_processor.ask_ai = partial_response
+    batch = [ArticleContext("", "", f"a{i}", RESPONSE_STRUCTURE, "") for i in range(2)]
+
+    results = asyncio.run(agent._combine_batch(batch))
+
+    # Batched items get the same type repairs as single-article responses
+    assert results == [{"title": "t", "author": "a", "content": ["p1", "p2"]}, None]
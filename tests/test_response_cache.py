@@ -0,0 +1,57 @@
+from modules.response_cache import ResponseCache
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    key = ResponseCache.make_key("model", "prompt", "image-hash")
+
+    cache = ResponseCache(path)
+    assert cache.get(key) is None
+    cache.set(key, "response")
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get(key) == "response"
+    assert reopened.get(key) == "response"
+    assert reopened.stats["disk_hits"] == 1
+    assert reopened.stats["memory_hits"] == 1
+    reopened.close()
+
+
+def test_cache_key_depends_on_image_and_model():
+    base = ResponseCache.make_key("model", "prompt", "a")
+
+    assert base != ResponseCache.make_key("model", "prompt", "b")
+    assert base != ResponseCache.make_key("other", "prompt", "a")
+
+
+def test_cache_evicts_beyond_max_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path / "r.sqlite"), max_entries=2, memory_entries=1)
+    for i in range(3):
+        cache.set(f"k{i}", str(i))
+
+    assert cache.get("k0") is None
+    assert cache.get("k2") == "2"
+    assert cache.stats["evictions"] == 1
+    cache.close()
+
+
+def test_cache_evicts_every_few_writes(tmp_path):
+    cache = ResponseCache(str(tmp_path / "r.sqlite"), max_entries=50)
+    for i in range(54):
+        cache.set(f"k{i}", str(i))
+    # Trimmed every fifth write, so the table may briefly overshoot
+    assert cache.stats["evictions"] == 0
+
+    cache.set("k54", "54")
+    assert cache.stats["evictions"] == 5
+    cache.close()
+
+
+def test_deleted_responses_miss_in_both_tiers(tmp_path):
+    cache = ResponseCache(str(tmp_path / "r.sqlite"))
+    cache.set("k", "bad")
+    cache.delete("k")
+
+    assert cache.get("k") is None
+    cache.close()
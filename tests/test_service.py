@@ -0,0 +1,137 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from config import RESPONSE_STRUCTURE
+from modules.agent import ArticleProcessorAgent
+from modules.service import JobService, ServiceAPI
+from modules.work_queue import ArticleJob
+
+PNG = Path(__file__).resolve().parents[1] / "artifacts" / "inputs" / "article.png"
+
+
+def test_job_service_runs_higher_priority_first_and_bounds_the_queue():
+    order = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(job):
+            order.append(job.name)
+            await release.wait()
+            return {}
+
+        service = JobService(handler, workers=1, max_queued=2)
+        service.start()
+        first = service.submit(ArticleJob("first", "", ""))
+        await asyncio.sleep(0)  # the worker picks it up
+        service.submit(ArticleJob("low", "", ""), priority=0)
+        urgent = service.submit(ArticleJob("urgent", "", ""), priority=5)
+        with pytest.raises(asyncio.QueueFull):
+            service.submit(ArticleJob("overflow", "", ""))
+
+        assert first.status == "running" and urgent.status == "queued"
+        release.set()
+        await service.wait(urgent, 5)
+        await service.stop()
+        return urgent
+
+    urgent = asyncio.run(scenario())
+
+    assert order[:2] == ["first", "urgent"]
+    assert urgent.status == "succeeded"
+
+
+async def request(port, method, path, body=b"", content_type=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    headers = [f"{method} {path} HTTP/1.1", "Host: test", "Connection: close"]
+    if content_type:
+        headers.append(f"Content-Type: {content_type}")
+    headers.append(f"Content-Length: {len(body)}")
+    writer.write("\r\n".join(headers).encode() + b"\r\n\r\n" + body)
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+def multipart(fields):
+    boundary = "testboundary"
+    body = b""
+    for name, (filename, data) in fields.items():
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        body += (
+            f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+            + data
+            + b"\r\n"
+        )
+    body += f"--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def test_http_api_processes_uploaded_articles(tmp_path, make_runtime):
+    runtime = make_runtime()
+    agent = ArticleProcessorAgent(runtime, fused=True)
+    output = tmp_path / "out"
+
+    def handler(job):
+        return agent.process_article(
+            job.image_path, job.xml_path, job.name, RESPONSE_STRUCTURE, str(output)
+        )
+
+    async def scenario():
+        service = JobService(handler, workers=2, metrics=runtime.metrics)
+        api = ServiceAPI(
+            service,
+            upload_dir=str(tmp_path / "uploads"),
+            input_root=str(tmp_path / "inputs"),
+            output_dir=str(output),
+            metrics=runtime.metrics,
+        )
+        server = await api.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        body, content_type = multipart(
+            {
+                # A real PNG: binary parts must not be decoded as text
+                "image": ("scan 1.png", PNG.read_bytes()),
+                "xml": ("scan 1.xml", b"<article><heading>T</heading></article>"),
+                "priority": ("", b"3"),
+            }
+        )
+        status, payload = await request(port, "POST", "/jobs", body, content_type)
+        assert status == 202
+        job_id = json.loads(payload)["id"]
+
+        status, payload = await request(port, "GET", f"/jobs/{job_id}?wait=5")
+        assert json.loads(payload)["status"] == "succeeded"
+        status, payload = await request(port, "GET", f"/jobs/{job_id}/result")
+        result = json.loads(payload)
+
+        outside = json.dumps({"image_path": str(tmp_path / "uploads")}).encode()
+        denied, _ = await request(port, "POST", "/jobs", outside, "application/json")
+        missing, _ = await request(port, "GET", "/jobs/unknown")
+        bad_wait, _ = await request(port, "GET", f"/jobs/{job_id}?wait=soon")
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /jobs HTTP/1.1\r\nContent-Length: many\r\n\r\n")
+        bad_length = int((await reader.read()).split()[1])
+        writer.close()
+
+        server.close()
+        await service.stop()
+        await server.wait_closed()
+        return result, denied, missing, bad_wait, bad_length
+
+    result, denied, missing, bad_wait, bad_length = asyncio.run(scenario())
+
+    assert result["name"] == "scan_1" and result["priority"] == 3
+    assert result["combined_content"]["title"] == "Fake title"
+    assert (output / "scan_1_combined_content.json").exists()
+    # The upload is removed once the article is processed
+    assert not any((tmp_path / "uploads").iterdir())
+    assert (denied, missing) == (403, 404)
+    assert (bad_wait, bad_length) == (400, 400)
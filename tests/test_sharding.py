@@ -0,0 +1,24 @@
+import pytest
+
+from modules.sharding import parse_shard, select_shard, shard_of
+from modules.work_queue import ArticleJob
+
+
+def test_shards_partition_jobs_deterministically():
+    jobs = [ArticleJob(f"article-{i}", "", "") for i in range(200)]
+
+    shards = [[job.name for job in select_shard(jobs, i, 4)] for i in range(4)]
+
+    assert sorted(sum(shards, [])) == sorted(job.name for job in jobs)
+    assert all(shards)
+    assert shards[1] == [job.name for job in select_shard(jobs, 1, 4)]
+    assert shard_of("article-7", 4) == shard_of("article-7", 4)
+    assert shard_of("article-7", 1) == 0
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    with pytest.raises(ValueError):
+        parse_shard("4/4")
+    with pytest.raises(ValueError):
+        parse_shard("one")
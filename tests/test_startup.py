@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from modules.startup import StartupProfile, parse_importtime
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_parse_importtime_reads_self_times_and_depth():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:      2500 |       2620 | json\n"
+    )
+
+    assert parse_importtime(output) == [
+        ("json.decoder", 0.00012, 1),
+        ("json", 0.0025, 0),
+    ]
+
+
+def test_profile_records_failing_phases():
+    profile = StartupProfile()
+    with profile.phase("client"):
+        raise ValueError("no key")
+
+    (record,) = profile.report()["phases"]
+    assert record["name"] == "client" and record["error"] == "ValueError: no key"
+
+
+def test_cli_import_loads_no_optional_components():
+    optional = ["google.genai", "httpx", "PIL", "modules.dedup", "modules.service"]
+    code = f"import sys, main; print([m for m in {optional!r} if m in sys.modules])"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+
+    assert result.stdout.strip() == "[]", result.stderr
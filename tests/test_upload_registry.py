@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from modules.upload_registry import UploadRegistry
+
+
+def test_registry_uploads_once_per_content_hash():
+    registry = UploadRegistry(path=None)
+    uploads = []
+
+    def upload():
+        uploads.append(1)
+        return SimpleNamespace(name=f"files/{len(uploads)}")
+
+    first = registry.get_or_upload("hash", upload)
+    second = registry.get_or_upload("hash", upload)
+
+    assert first is second
+    assert len(uploads) == 1
+    assert registry.stats == {"reused": 1, "uploaded": 1, "expired": 0}
+
+
+def test_registry_reuploads_after_expiry_or_invalidation():
+    registry = UploadRegistry(path=None, ttl=-1)
+    registry.get_or_upload("hash", lambda: SimpleNamespace(name="files/a"))
+    registry.get_or_upload("hash", lambda: SimpleNamespace(name="files/b"))
+    assert registry.stats["expired"] == 1
+
+    registry.ttl = 3600
+    registry.invalidate("hash")
+    handle = registry.get_or_upload("hash", lambda: SimpleNamespace(name="files/c"))
+    assert handle.name == "files/c"
+
+
+def test_registry_restores_handles_from_disk(tmp_path):
+    path = str(tmp_path / "uploads.sqlite")
+    registry = UploadRegistry(path)
+    registry.get_or_upload(
+        "hash",
+        lambda: SimpleNamespace(name="files/a", uri="uri", mime_type="image/png"),
+    )
+    registry.close()
+
+    restored = UploadRegistry(path).get_or_upload("hash", lambda: None)
+    assert restored.uri == "uri"
+
+
+def test_registry_memory_stays_bounded(monkeypatch):
+    import modules.upload_registry as upload_registry
+
+    monkeypatch.setattr(upload_registry, "_SWEEP_INTERVAL", 0)
+    registry = UploadRegistry(path=None, ttl=3600)
+    for i in range(100):
+        registry.get_or_upload(f"hash{i}", lambda: SimpleNamespace(name="files/x"))
+    # No per-key locks are left behind once the uploads are registered
+    assert registry._key_locks == {}
+    assert len(registry._handles) == 100
+
+    # Handles kept longer than the TTL are swept on the next upload
+    registry.ttl = -1
+    registry.get_or_upload("new", lambda: SimpleNamespace(name="files/y"))
+    assert list(registry._handles) == ["new"]
@@ -0,0 +1,32 @@
+import asyncio
+
+from modules.discovery import discover
+from modules.work_queue import ArticleJob, WorkQueue
+
+
+def test_work_queue_reports_failures_without_stalling():
+    async def handler(job: ArticleJob):
+        await asyncio.sleep(0)
+        if job.name == "bad":
+            raise ValueError("boom")
+        return {"name": job.name}
+
+    jobs = [ArticleJob(name, f"{name}.png", f"{name}.xml") for name in "ab"]
+    jobs.insert(1, ArticleJob("bad", "bad.png", "bad.xml"))
+    seen = []
+
+    summary = asyncio.run(WorkQueue(handler, workers=2).run(jobs, seen.append))
+
+    assert summary.succeeded == 2
+    assert summary.failed == 1
+    assert summary.failures[0].job.name == "bad"
+    assert sorted(r.job.name for r in seen) == ["a", "b", "bad"]
+
+
+def test_discovered_jobs_skip_orphans(tmp_path):
+    for name in ("one.png", "one.xml", "orphan.png", "notes.txt"):
+        (tmp_path / name).write_text("")
+
+    pairs = list(discover(str(tmp_path)))
+
+    assert [p.name for p in pairs] == ["one"]
@@ -0,0 +1,55 @@
+import glob
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+from modules.xml_parser import XMLParser
+
+INPUTS = os.path.join(os.path.dirname(__file__), "..", "artifacts", "inputs")
+
+
+def recursive_reference(element: ET.Element):
+    """The original recursive conversion, kept as the expected output shape."""
+    if len(element) == 0:
+        return element.text.strip() if element.text else ""
+    children = {}
+    for child in element:
+        value = recursive_reference(child)
+        if child.tag not in children:
+            children[child.tag] = value
+        elif isinstance(children[child.tag], list):
+            children[child.tag].append(value)
+        else:
+            children[child.tag] = [children[child.tag], value]
+    return children
+
+
+def test_streaming_parser_matches_recursive_shape():
+    parser = XMLParser(fields=[])
+    for path in glob.glob(os.path.join(INPUTS, "*.xml")):
+        expected = recursive_reference(ET.parse(path).getroot())
+        assert parser._parse_xml_metadata(path) == expected
+
+
+def test_streaming_parser_handles_deep_and_repeated_elements(tmp_path):
+    depth = sys.getrecursionlimit() + 100
+    path = tmp_path / "deep.xml"
+    path.write_text(
+        "<root>"
+        + "<n>" * depth
+        + "leaf"
+        + "</n>" * depth
+        + "<p>a</p><p>b</p><p>c</p></root>"
+    )
+
+    result = XMLParser(fields=[])._parse_xml_metadata(str(path))
+
+    assert result["p"] == ["a", "b", "c"]
+
+
+def test_selectors_limit_extracted_fields():
+    parser = XMLParser(fields=["heading", "mainContent/paragraph"])
+    result = parser._parse_xml_metadata(os.path.join(INPUTS, "article.xml"))
+
+    assert set(result) == {"heading", "mainContent"}
+    assert set(result["mainContent"]) == {"paragraph"}
@@ -1,20 +1,39 @@
-import json
 import asyncio
 import os
 import shutil
 from typing import Dict, Any, Optional, List
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from config import RESPONSE_STRUCTURE
+from modules.json_extractor import JSONExtractor, ResponseSchema
+
+
+def delete_folder_if_exists(folder_path: str):
+    if os.path.exists(folder_path):
+        try:
+            shutil.rmtree(folder_path)
+            print(f"Folder '{os.path.relpath(folder_path)}' deleted successfully.")
+        except Exception as e:
+            print(f"Error deleting folder '{folder_path}': {e}")
+    else:
+        print(f"Folder '{os.path.relpath(folder_path)}' does not exist.")
 
 
 class UtilityManager:
-    def __init__(self, max_workers: Optional[int] = None):
+    def __init__(
+        self, max_workers: Optional[int] = None, executor: Optional[Executor] = None
+    ):
         """
         Initialize the UtilityManager with optional thread pool size.
 
         Args:
             max_workers: Maximum number of worker threads to use for parallel processing
+            executor: Shared executor to use instead of creating a private pool;
+                it is left running on close() since the caller owns it
         """
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+        self.json_extractor = JSONExtractor(ResponseSchema(RESPONSE_STRUCTURE))
 
     def structure_json(self, result: Optional[str]) -> Dict[str, Any]:
         """Synchronous implementation of structure_json for use with executor"""
@@ -22,30 +41,15 @@ class UtilityManager:
         if result is None:
             return {"error": "No response received", "raw_response": None}
 
-        # Try to extract JSON from the response
-        try:
-            # Find JSON pattern in the response
-            start_idx = result.find("{")
-            end_idx = result.rfind("}") + 1
-
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = result[start_idx:end_idx]
-                structured_result = json.loads(json_str)
-                return structured_result
-            else:
-                return {
-                    "error": "Could not extract JSON from response",
-                    "raw_response": result,
-                }
-        except json.JSONDecodeError:
-            return {"error": "Invalid JSON in response", "raw_response": result}
-        except AttributeError:
-            # This handles the case where result is not a string but some other type
+        if not isinstance(result, str):
             return {
                 "error": f"Expected string but got {type(result).__name__}",
                 "raw_response": str(result),
             }
 
+        # Balanced-brace scan (fences stripped), repair, then schema check
+        return self.json_extractor.extract(result)
+
     async def structure_json_async(self, result: Optional[str]) -> Dict[str, Any]:
         """
         Asynchronously structure a JSON string response.
@@ -115,18 +119,12 @@ class UtilityManager:
         return all_results
 
     def delete_folder_if_exists(self, folder_path: str):
-        if os.path.exists(folder_path):
-            try:
-                shutil.rmtree(folder_path)
-                print(f"Folder '{os.path.relpath(folder_path)}' deleted successfully.")
-            except Exception as e:
-                print(f"Error deleting folder '{folder_path}': {e}")
-        else:
-            print(f"Folder '{os.path.relpath(folder_path)}' does not exist.")
+        delete_folder_if_exists(folder_path)
 
     def close(self):
         """Clean up resources by shutting down the thread pool executor"""
-        self.executor.shutdown(wait=True)
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
 
     async def __aenter__(self):
         """Support for async context manager"""